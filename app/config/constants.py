@@ -1,5 +1,6 @@
 # constants.py
 
+import os
 from typing import Final
 import numpy as np
 
@@ -15,6 +16,13 @@ CAMERA_VIEWPORT_HEIGHT: Final[int] = int(CAMERA_HEIGHT * 0.9)
 FRAME_RESOLUTION: Final[tuple[int, int]] = (CAMERA_WIDTH, CAMERA_HEIGHT)
 BLACK_FRAME = np.zeros((CAMERA_VIEWPORT_HEIGHT, CAMERA_VIEWPORT_WIDTH, 3), dtype=np.uint8)
 BLUE_FRAME  = np.full((CAMERA_VIEWPORT_HEIGHT, CAMERA_VIEWPORT_WIDTH, 3), (255, 0, 0), dtype=np.uint8)
+DISPLAY_MAX_FPS: Final[float] = 30.0     # taxa máxima de atualização da pré-visualização
+CAPTURE_POOL_SIZE: Final[int] = 4              # buffers pré-alocados para a thread de captura
+CAPTURE_POLICY: Final[str]    = "drop_oldest"  # "drop_oldest" ou "block"
+STREAM_POOL_SIZE: Final[int]  = 3              # buffers de saída dos geradores em uso simultâneo
+CAMERA_BACKEND: Final[str]    = "auto"         # "auto", "dshow", "msmf", "v4l2", "avfoundation" ou "any"
+RECTIFY_CACHE_DIR: Final[str] = os.path.join(os.path.expanduser("~"), ".surfacex", "maps")
+RECTIFY_CACHE_ENTRIES: Final[int] = 4          # conjuntos de mapas mantidos em memória
 
 
 # --------------------------------------------- #
@@ -23,11 +31,104 @@ BLUE_FRAME  = np.full((CAMERA_VIEWPORT_HEIGHT, CAMERA_VIEWPORT_WIDTH, 3), (255,
 LSR_PIN_STR: Final[str] = "d:3:o"
 DIR_PIN_STR: Final[str] = "d:2:o"
 STP_PIN_STR: Final[str] = "d:4:o"
+FIRMATA_BAUDRATE: Final[int]        = 57600
+FIRMATA_BOOT_DELAY: Final[float]    = 2.0     # o Arduino reinicia ao abrir a porta serial
+FIRMATA_REPLY_TIMEOUT: Final[float] = 0.5     # espera máxima pela resposta SYSEX
+DEVICE_CACHE_PATH: Final[str] = os.path.join(os.path.expanduser("~"), ".surfacex", "devices.json")
 
 # --------------------------------------------- #
 # ----------------- DELAYS -------------------- #
 # --------------------------------------------- #
 LASER_TOGGLE_DELAY: Final[float] = 0.225
+STEP_PULSE_DELAY: Final[float]   = 0.001   # meia largura do pulso STEP do driver
+SETTLE_THRESHOLD: Final[float]   = 8.0     # maior variação (níveis de cinza) de um bloco 8x8 entre quadros estáveis
+SETTLE_FRAMES: Final[int]        = 1       # pares de quadros consecutivos abaixo do limiar
+SETTLE_TIMEOUT: Final[float]     = 1.0     # tempo máximo de espera pela estabilização
+
+
+# --------------------------------------------- #
+# ------------ EXTRAÇÃO DO LASER -------------- #
+# --------------------------------------------- #
+LASER_MIN_INTENSITY: Final[int]    = 20      # diferença mínima (fg - bg) para aceitar um pico
+LASER_PEAK_HALF_WINDOW: Final[int] = 3       # meia janela (px) do centro de massa
+LASER_SUBPIXEL_METHOD: Final[str]  = "com"   # "com", "gaussian" ou "parabolic"
+
+
+# --------------------------------------------- #
+# -------------- MODELO DE FUNDO -------------- #
+# --------------------------------------------- #
+BACKGROUND_SPACING: Final[int]           = 10    # posições de varredura entre capturas com laser desligado
+BACKGROUND_HISTORY: Final[int]           = 8     # quadros na média móvel de cada posição
+BACKGROUND_DRIFT_THRESHOLD: Final[float] = 4.0   # mediana de |fg - bg| que indica mudança no fundo
+
+
+# --------------------------------------------- #
+# -------- CALIBRAÇÃO DO PLANO LASER ---------- #
+# --------------------------------------------- #
+PLANE_RANSAC_THRESHOLD: Final[float] = 0.5       # distância máxima (mm) de um inlier ao plano
+PLANE_RANSAC_ITERATIONS: Final[int]  = 256       # hipóteses pontuadas em lote
+PLANE_RANSAC_CHUNK: Final[int]       = 1 << 24   # elementos por bloco da matriz de distâncias
+PLANE_CALIB_POSES: Final[int]        = 20        # poses do tabuleiro usadas na calibração
+PLANE_CALIB_MIN_POINTS: Final[int]   = 50        # pontos laser mínimos para aceitar uma pose
+PLANE_CALIB_MIN_SPREAD: Final[float] = 0.05      # espalhamento mínimo fora da linha laser (fração do comprimento)
+PLANE_CALIB_MIN_MOTION_MM: Final[float]   = 10.0   # deslocamento mínimo do marcador entre poses aceitas
+PLANE_CALIB_MIN_ROTATION_DEG: Final[float] = 5.0    # ou giro mínimo do marcador entre poses aceitas
+PLANE_CALIB_MAX_ATTEMPTS: Final[int] = 3 * PLANE_CALIB_POSES   # capturas antes de desistir de completar as poses
+
+
+# --------------------------------------------- #
+# -------------- MESA GIRATÓRIA --------------- #
+# --------------------------------------------- #
+TURNTABLE_STEPS_PER_REV: Final[int] = 3200   # 200 passos x 16 micropassos por volta da mesa
+AXIS_CALIB_POSITIONS: Final[int] = 12         # vistas do marcador na calibração do eixo
+AXIS_CALIB_STEPS_PER_POSITION: Final[int] = TURNTABLE_STEPS_PER_REV // 48   # 7,5° entre vistas (arco de 82,5°)
+
+
+# --------------------------------------------- #
+# -------------- ESCANEAMENTO ----------------- #
+# --------------------------------------------- #
+SCAN_STEPS_PER_POSITION: Final[int] = 16     # passos do motor entre perfis consecutivos
+SCAN_POSITIONS: Final[int] = TURNTABLE_STEPS_PER_REV // SCAN_STEPS_PER_POSITION   # perfis por varredura (uma volta)
+
+
+# --------------------------------------------- #
+# ---------- CALIBRAÇÃO DA CÂMERA ------------- #
+# --------------------------------------------- #
+CALIB_KEYFRAMES: Final[int]     = 30     # vistas usadas no calibrateCamera
+CALIB_MIN_CORNERS: Final[int]   = 12     # cantos ChArUco mínimos para aceitar uma imagem
+CALIB_CHUNK: Final[int]         = 8      # imagens por tarefa enviada a cada processo
+
+
+# --------------------------------------------- #
+# ------------ NUVEM DE PONTOS ---------------- #
+# --------------------------------------------- #
+POINT_CHUNK_SIZE: Final[int] = 1 << 20     # pontos por bloco em memória antes de ir para o disco
+VOXEL_SIZE: Final[float] = 0.5             # lado (mm) do voxel da nuvem subamostrada
+SCAN_VOLUME_MM: Final[tuple] = ((-1000.0, -1000.0, 0.0), (1000.0, 1000.0, 2000.0))   # (mín, máx) da nuvem no referencial da câmera
+SCAN_PREVIEW_INTERVAL: Final[float] = 0.5  # intervalo (s) entre atualizações da prévia da nuvem
+MESH_MAX_EDGE_MM: Final[float]   = 5.0     # aresta mais longa aceita entre pontos vizinhos
+MESH_MAX_DEPTH_JUMP: Final[float] = 2.0    # salto máximo de profundidade (mm) ao longo de uma aresta
+
+
+# --------------------------------------------- #
+# --------- GRAVAÇÃO DE SESSÕES --------------- #
+# --------------------------------------------- #
+SESSION_CHUNK_FRAMES: Final[int] = 64      # quadros por arquivo mapeado em memória
+SESSION_QUEUE_SIZE: Final[int]   = 8       # buffers de preparação entre a captura e o gravador
+SESSION_RECORD_TIMEOUT: Final[float] = 5.0 # espera máxima (s) por um buffer livre antes de acusar falha do gravador
+
+
+# --------------------------------------------- #
+# ------- PIPELINE MULTIPROCESSO (LIVE) ------- #
+# --------------------------------------------- #
+LIVE_SHM_SLOTS: Final[int] = 8             # quadros brutos em memória compartilhada
+
+
+# --------------------------------------------- #
+# ----------------- MÉTRICAS ------------------ #
+# --------------------------------------------- #
+METRICS_ENABLED: Final[bool] = True        # instrumentação das etapas do pipeline
+METRICS_WINDOW: Final[int]   = 1024        # amostras recentes por etapa (percentis)
 
 
 # --------------------------------------------- #
@@ -38,9 +139,12 @@ ARUCO_REFMK_LENGTH_MM: Final[float] = 200.0
 TARGET_MARKER_ID_42: Final[int]     = 42
 TARGET_MARKER_ID_43: Final[int]     = 43
 ROI_EXTEND_MM: Final[float]         = 60.0
+REFERENCE_MARKER_LENGTH_MM: Final[float] = 144.0   # lado do marcador de referência (TARGET_MARKER_ID_43)
+MARKER_DETECT_SCALE: Final[float]   = 0.5     # escala da pirâmide para a detecção grosseira
+MARKER_SEARCH_MARGIN: Final[float]  = 0.5     # margem da janela de rastreio (fração do lado do marcador)
+MARKER_REFINE_WIN: Final[int]       = 5       # meia janela do cornerSubPix na resolução cheia
 
 DEFAULT_CAMERA_FPS = 30
-VOXEL_SIZE = 0.0001
 SQUARE_SIZE = 0.058  # 58mm
 MARKER_SIZE = 0.043  # 43mm
 BAUD_RATE = 9600
@@ -0,0 +1,111 @@
+import bisect
+import numpy as np
+from app.config.constants import BACKGROUND_SPACING, BACKGROUND_HISTORY, BACKGROUND_DRIFT_THRESHOLD
+from app.config.logger import logger
+
+
+class BackgroundModel:
+    """
+    Modelo de fundo (laser desligado) por posição do motor.
+
+    Em vez de um quadro com laser desligado a cada posição, o fundo é capturado apenas a cada
+    ``spacing`` passos do motor e servido para qualquer posição a partir da captura mais
+    próxima. ``BACKGROUND_SPACING`` conta posições de varredura: quem avança mais de um passo
+    por posição passa ``BACKGROUND_SPACING * passos_por_posição``. Cada posição capturada mantém uma média móvel dos quadros recebidos (média exata até
+    ``history`` quadros, exponencial depois), o que também reduz o ruído do fundo.
+
+    :meth:`check_drift` compara um quadro com laser ligado ao fundo servido em uma grade
+    subamostrada; a mediana da diferença ignora a linha laser, que ocupa poucos pixels, e só
+    sobe quando a cena ou a iluminação mudam. Nesse caso todos os fundos ficam obsoletos: o
+    modelo é esvaziado e volta a pedir capturas a partir da posição seguinte.
+    """
+
+    def __init__(
+            self,
+            spacing: int = BACKGROUND_SPACING,
+            history: int = BACKGROUND_HISTORY,
+            drift_threshold: float = BACKGROUND_DRIFT_THRESHOLD,
+            grid_step: int = 8
+    ):
+        if spacing < 1 or history < 1:
+            raise ValueError("spacing e history devem ser positivos.")
+        self.spacing = spacing
+        self.history = history
+        self.drift_threshold = drift_threshold
+        self.grid_step = grid_step
+
+        self.positions: list[int] = []
+        self._mean: dict[int, np.ndarray] = {}
+        self._frame: dict[int, np.ndarray] = {}
+        self._count: dict[int, int] = {}
+
+        self.captures = 0
+        self.drift_events = 0
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def clear(self) -> None:
+        self.positions.clear()
+        self._mean.clear()
+        self._frame.clear()
+        self._count.clear()
+
+    def nearest(self, position: int) -> int | None:
+        """ Posição capturada mais próxima de ``position``, ou None se o modelo está vazio. """
+        if not self.positions:
+            return None
+        i = bisect.bisect_left(self.positions, position)
+        candidates = self.positions[max(i - 1, 0):i + 1]
+        return min(candidates, key=lambda p: abs(p - position))
+
+    def needs_capture(self, position: int) -> bool:
+        """ Indica se um quadro com laser desligado deve ser capturado nesta posição. """
+        key = self.nearest(position)
+        return key is None or abs(key - position) >= self.spacing
+
+    def update(self, position: int, frame: np.ndarray) -> None:
+        """ Incorpora um quadro com laser desligado capturado em ``position``. """
+        self.captures += 1
+        mean = self._mean.get(position)
+        if mean is None:
+            bisect.insort(self.positions, position)
+            self._mean[position] = frame.astype(np.float32)
+            self._frame[position] = frame.copy()
+            self._count[position] = 1
+        else:
+            n = min(self._count[position] + 1, self.history)
+            self._count[position] = n
+            mean += (frame - mean) / n
+            np.copyto(self._frame[position], mean + 0.5, casting="unsafe")
+
+    def get(self, position: int) -> np.ndarray | None:
+        """
+        Fundo para ``position``.
+
+        Returns:
+            np.ndarray | None: Quadro da posição capturada mais próxima (não deve ser
+            alterado pelo chamador), ou None se o modelo está vazio.
+        """
+        key = self.nearest(position)
+        return None if key is None else self._frame[key]
+
+    def check_drift(self, position: int, frame: np.ndarray) -> bool:
+        """
+        Compara um quadro (com laser ligado) ao fundo servido para ``position``.
+
+        Returns:
+            bool: True se a mediana da diferença absoluta na grade subamostrada passou de
+            ``drift_threshold``; nesse caso o modelo é esvaziado.
+        """
+        background = self.get(position)
+        if background is None:
+            return False
+        s = self.grid_step
+        diff = np.abs(frame[::s, ::s].astype(np.int16) - background[::s, ::s])
+        if float(np.median(diff)) <= self.drift_threshold:
+            return False
+        self.drift_events += 1
+        self.clear()
+        logger.info(f"Mudança no fundo detectada na posição {position}: nova captura agendada")
+        return True
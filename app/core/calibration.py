@@ -0,0 +1,190 @@
+import threading
+from typing import List
+import cv2
+import numpy as np
+from app.config.constants import (
+    FRAME_RESOLUTION, REFERENCE_MARKER_LENGTH_MM, TARGET_MARKER_ID_43, PLANE_RANSAC_THRESHOLD,
+    PLANE_CALIB_MIN_POINTS, PLANE_CALIB_MIN_SPREAD, PLANE_CALIB_MIN_MOTION_MM, PLANE_CALIB_MIN_ROTATION_DEG
+)
+from app.config.logger import logger
+from app.core.markers import MarkerTracker
+from app.core.proc import backproject, laser_peaks_roi, plane_from_np, rectify_gray, fit_plane_ransac
+from app.core.utils import roi_crop_mask, roi_polygon, roi_rect
+
+
+class LaserPlaneCalibrator:
+    """
+    Calibração do plano laser a partir de várias poses do marcador de referência.
+
+    Em cada pose o marcador ``target_id`` define o plano do tabuleiro no referencial da
+    câmera; os picos da linha laser (``fg - bg``) dentro do marcador, estendido ``margin`` mm
+    em +x como em ``get_roi``, são retroprojetados nesse plano e acumulados. Com o tabuleiro
+    em alturas e inclinações diferentes, os pontos de todas as poses pertencem ao plano
+    laser, que :meth:`fit` ajusta com :func:`fit_plane_ransac`; picos espúrios (reflexos,
+    ruído) caem fora do plano e são descartados pelo RANSAC. A primeira pose aceita fica em
+    ``reference``: é a pose de referência usada na ROI da varredura.
+
+    Uma pose cujo marcador não se deslocou ``min_motion`` mm nem girou ``min_rotation``
+    graus em relação a alguma pose já aceita é descartada: repeti-la não acrescenta
+    informação e deixa os pontos quase colineares.
+
+    As imagens recebidas são quadros brutos (BGR, sem espelhamento); ``map_one``/``map_two``
+    e ``k_opt`` são os de ``Scanner._load_maps``.
+    """
+
+    def __init__(
+            self,
+            k_opt: np.ndarray,
+            map_one: np.ndarray,
+            map_two: np.ndarray,
+            marker_length: float = REFERENCE_MARKER_LENGTH_MM,
+            target_id: int = TARGET_MARKER_ID_43,
+            margin: float = 0.0,
+            threshold: float = PLANE_RANSAC_THRESHOLD,
+            min_points: int = PLANE_CALIB_MIN_POINTS,
+            tracker: MarkerTracker | None = None,
+            min_motion: float = PLANE_CALIB_MIN_MOTION_MM,
+            min_rotation: float = PLANE_CALIB_MIN_ROTATION_DEG
+    ):
+        self.k_opt = np.asarray(k_opt, dtype=np.float64)
+        self.map_one = map_one
+        self.map_two = map_two
+        self.marker_length = marker_length
+        self.target_id = target_id
+        self.margin = margin
+        self.threshold = threshold
+        self.min_points = min_points
+        self.tracker = tracker or MarkerTracker()
+        self.min_motion = min_motion
+        self.min_rotation = np.radians(min_rotation)
+        self._accepted: List[tuple[np.ndarray, np.ndarray]] = []
+        self._zero_dist = np.zeros(5)
+        self._points: List[np.ndarray] = []
+        self._lock = threading.Lock()
+
+        self.poses = 0
+        self.rejected = 0
+        self.reference: tuple[np.ndarray, np.ndarray] | None = None
+        self.plane: np.ndarray | None = None
+        self.inliers: np.ndarray | None = None
+        self.rms: float | None = None
+
+    @property
+    def point_count(self) -> int:
+        return sum(len(p) for p in self._points)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._points.clear()
+        self._accepted.clear()
+        self.poses = self.rejected = 0
+        self.plane = self.inliers = self.rms = self.reference = None
+
+    def board_plane(self, rvec: np.ndarray, tvec: np.ndarray) -> np.ndarray:
+        """ Plano (a, b, c, d) do tabuleiro no referencial da câmera: normal = eixo z do marcador. """
+        r = cv2.Rodrigues(np.asarray(rvec, dtype=np.float64))[0]
+        return plane_from_np(r[:, 2], np.asarray(tvec, dtype=np.float64).ravel())
+
+    def is_repeated(self, rvec: np.ndarray, tvec: np.ndarray) -> bool:
+        """ Indica se a pose está perto demais (em posição e em ângulo) de uma já aceita. """
+        r = cv2.Rodrigues(np.asarray(rvec, dtype=np.float64))[0]
+        t = np.asarray(tvec, dtype=np.float64).ravel()
+        for r0, t0 in self._accepted:
+            angle = np.arccos(np.clip((np.trace(r0.T @ r) - 1.0) / 2.0, -1.0, 1.0))
+            if np.linalg.norm(t - t0) < self.min_motion and angle < self.min_rotation:
+                return True
+        return False
+
+    def add_points(self, pts2d: np.ndarray, rvec: np.ndarray, tvec: np.ndarray) -> int:
+        """
+        Acumula os picos do laser de uma pose já conhecida.
+
+        Args:
+            pts2d (np.ndarray): Picos (N, 2) na imagem retificada.
+            rvec (np.ndarray): Rotação do marcador de referência.
+            tvec (np.ndarray): Translação do marcador de referência.
+
+        Returns:
+            int: Pontos aceitos (0 se a pose tinha menos de ``min_points``).
+        """
+        if len(pts2d) < self.min_points:
+            self.rejected += 1
+            logger.debug(f"Pose descartada: {len(pts2d)} ponto(s) do laser")
+            return 0
+        xyz = backproject(np.asarray(pts2d, dtype=np.float64), self.board_plane(rvec, tvec), self.k_opt)
+        xyz = xyz[np.isfinite(xyz).all(axis=1)]
+        with self._lock:
+            self._points.append(xyz.astype(np.float32))
+        self.poses += 1
+        return len(xyz)
+
+    def add_pose(self, bg: np.ndarray, fg: np.ndarray, position: int = 0) -> int:
+        """
+        Processa um par de quadros (laser desligado/ligado) de uma pose do tabuleiro.
+
+        A assinatura segue o ``process`` do ``ScanScheduler``.
+
+        Returns:
+            int: Pontos aceitos (0 se o marcador não foi encontrado ou a linha é curta).
+        """
+        shape = (FRAME_RESOLUTION[1], FRAME_RESOLUTION[0])
+        gray_bg = np.empty(shape, dtype=np.uint8)
+        gray_fg = np.empty(shape, dtype=np.uint8)
+        rectify_gray(self.map_one, self.map_two, bg, gray_bg)
+        rectify_gray(self.map_one, self.map_two, fg, gray_fg)
+
+        poses = self.tracker.estimate_poses(
+            gray_bg, (self.target_id,), self.marker_length, self.k_opt, self._zero_dist
+        )
+        if self.target_id not in poses:
+            self.rejected += 1
+            logger.debug(f"Marcador {self.target_id} não encontrado na posição {position}")
+            return 0
+        rvec, tvec = poses[self.target_id]
+        if self.is_repeated(rvec, tvec):
+            self.rejected += 1
+            logger.info("Pose descartada: o tabuleiro não se moveu desde uma pose já aceita")
+            return 0
+        polygon = roi_polygon(rvec, tvec, self.k_opt, self._zero_dist, self.margin, self.marker_length)
+        rect = roi_rect(polygon, shape)
+        if rect is None:
+            self.rejected += 1
+            return 0
+        pts = laser_peaks_roi(gray_bg, gray_fg, rect, mask=roi_crop_mask(polygon, rect))
+        accepted = self.add_points(pts, rvec, tvec)
+        if accepted:
+            self._accepted.append((
+                cv2.Rodrigues(np.asarray(rvec, dtype=np.float64))[0],
+                np.asarray(tvec, dtype=np.float64).ravel()
+            ))
+            if self.reference is None:
+                self.reference = (rvec, tvec)
+        return accepted
+
+    def fit(self) -> np.ndarray:
+        """
+        Ajusta o plano laser aos pontos de todas as poses.
+
+        Returns:
+            np.ndarray: Plano (a, b, c, d) no referencial da câmera, com normal unitária.
+        """
+        with self._lock:
+            if not self._points:
+                raise RuntimeError("Nenhuma pose válida para calibrar o plano laser.")
+            points = np.concatenate(self._points)
+        plane, self.inliers = fit_plane_ransac(points, threshold=self.threshold)
+        # Com o tabuleiro sempre no mesmo lugar os pontos ficam quase colineares e o plano pela
+        # linha é indeterminado: exige espalhamento fora da direção principal.
+        inliers = points[self.inliers]
+        spread = np.linalg.svd(inliers - inliers.mean(axis=0), compute_uv=False)
+        if self.poses < 2 or spread[1] < PLANE_CALIB_MIN_SPREAD * spread[0]:
+            raise RuntimeError("Pontos quase colineares: mova o tabuleiro entre as poses.")
+
+        self.plane = plane
+        residuals = inliers @ plane[:3] + plane[3]
+        self.rms = float(np.sqrt(np.mean(residuals ** 2)))
+        logger.info(
+            f"Plano laser: {np.round(self.plane, 5)} ({self.poses} pose(s), "
+            f"{int(self.inliers.sum())}/{len(points)} inliers, RMS {self.rms:.3f} mm)"
+        )
+        return self.plane
@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque
+from typing import Tuple
+import cv2
+import numpy as np
+from app.config.constants import CAMERA_WIDTH, CAMERA_HEIGHT, CAPTURE_POOL_SIZE, CAPTURE_POLICY
+from app.config.exceptions import CameraReadError
+from app.config.logger import logger
+from app.core.metrics import metrics
+
+
+class FrameGrabber:
+    """
+    Thread dedicada de captura que lê a câmera em um conjunto fixo de buffers pré-alocados.
+
+    A captura nunca espera pelo processamento: com a política ``"drop_oldest"`` o quadro
+    pronto mais antigo é descartado para liberar um buffer e o consumidor sempre recebe o
+    quadro mais recente. Com ``"block"`` a captura aguarda um buffer livre e os quadros são
+    entregues em ordem, sem perdas.
+
+    Cada quadro obtido com :meth:`get` ocupa um buffer do pool até ser devolvido com
+    :meth:`release`; ``timestamps[idx]`` guarda o instante (``time.perf_counter``) em que a
+    câmera entregou o quadro daquele buffer, isto é, o fim da leitura.
+    """
+
+    DROP_OLDEST = "drop_oldest"
+    BLOCK = "block"
+
+    def __init__(
+            self,
+            camera,
+            pool_size: int = CAPTURE_POOL_SIZE,
+            policy: str = CAPTURE_POLICY,
+            shape: Tuple[int, int, int] = (CAMERA_HEIGHT, CAMERA_WIDTH, 3)
+    ):
+        if policy not in (self.DROP_OLDEST, self.BLOCK):
+            raise ValueError(f"Política de captura inválida: {policy}")
+        if pool_size < 2:
+            raise ValueError("O pool de captura precisa de pelo menos 2 buffers.")
+
+        self.camera = camera
+        self.policy = policy
+        self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(pool_size)]
+        self.timestamps = np.zeros(pool_size, dtype=np.float64)
+
+        self._free  = deque(range(pool_size))
+        self._ready = deque()
+        self._cond  = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._running = False
+        self._error: Exception | None = None
+
+        self.frames_captured  = 0
+        self.frames_dropped   = 0
+        self.frames_delivered = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+        logger.debug(f"FrameGrabber encerrado: {self.stats()}")
+
+    def _acquire_slot(self) -> int | None:
+        """ Obtém um buffer para a próxima leitura. Deve ser chamado com o lock adquirido. """
+        while self._running:
+            if self._free:
+                return self._free.popleft()
+            if self.policy == self.DROP_OLDEST and self._ready:
+                self.frames_dropped += 1
+                return self._ready.popleft()
+            self._cond.wait()
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                idx = self._acquire_slot()
+            if idx is None:
+                return
+
+            buf = self.buffers[idx]
+            t0 = time.perf_counter()
+            try:
+                ret, frame = self.camera.read(buf)
+            except Exception as e:
+                ret, frame = False, None
+                logger.error(f"Falha na leitura da câmera: {e}")
+            self.timestamps[idx] = t1 = time.perf_counter()
+            metrics.record("capture", t1 - t0)
+
+            if ret and frame is not None and frame is not buf:
+                # O backend alocou um novo array (resolução diferente do buffer).
+                if frame.shape == buf.shape:
+                    np.copyto(buf, frame)
+                else:
+                    cv2.resize(frame, (buf.shape[1], buf.shape[0]), dst=buf)
+
+            with self._cond:
+                if not ret:
+                    self._free.append(idx)
+                    self._error = CameraReadError("Error reading frame")
+                    self._running = False
+                    self._cond.notify_all()
+                    return
+                self._ready.append(idx)
+                self.frames_captured += 1
+                self._cond.notify_all()
+
+    def get(self, timeout: float | None = None) -> Tuple[int, np.ndarray] | None:
+        """
+        Retorna o próximo quadro disponível segundo a política configurada.
+
+        Args:
+            timeout (float | None): Tempo máximo de espera em segundos.
+
+        Returns:
+            Tuple[int, np.ndarray] | None: Índice do buffer e o quadro, ou None se não houver
+            quadro dentro do tempo limite ou se a captura foi encerrada.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._ready or self._error or not self._running, timeout):
+                return None
+            if not self._ready:
+                if self._error is not None:
+                    raise self._error
+                return None
+
+            if self.policy == self.DROP_OLDEST:
+                idx = self._ready.pop()
+                self.frames_dropped += len(self._ready)
+                self._free.extend(self._ready)
+                self._ready.clear()
+                self._cond.notify_all()
+            else:
+                idx = self._ready.popleft()
+            self.frames_delivered += 1
+            return idx, self.buffers[idx]
+
+    def release(self, idx: int) -> None:
+        """ Devolve ao pool o buffer entregue por :meth:`get`. """
+        with self._cond:
+            self._free.append(idx)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "captured":  self.frames_captured,
+            "dropped":   self.frames_dropped,
+            "delivered": self.frames_delivered,
+        }
@@ -1,14 +1,64 @@
 import cv2
+import json
+import os
 import serial
 import serial.tools.list_ports
+import sys
+import threading
 import time
-from cv2_enumerate_cameras import enumerate_cameras
+from concurrent.futures import ThreadPoolExecutor
+from app.config.constants import CAMERA_BACKEND, FIRMATA_BAUDRATE, FIRMATA_BOOT_DELAY, FIRMATA_REPLY_TIMEOUT, DEVICE_CACHE_PATH
 from app.config.logger import logger
 
-def get_camera_list():
+_CAMERA_BACKENDS = {
+    "dshow": cv2.CAP_DSHOW,
+    "msmf": cv2.CAP_MSMF,
+    "v4l2": cv2.CAP_V4L2,
+    "avfoundation": cv2.CAP_AVFOUNDATION,
+    "any": cv2.CAP_ANY,
+}
+
+
+def camera_backend(name: str = CAMERA_BACKEND) -> int:
+    """
+    Constante ``cv2.CAP_*`` do backend de captura.
+
+    Args:
+        name (str): Nome do backend; ``"auto"`` escolhe pela plataforma (DirectShow no
+            Windows, AVFoundation no macOS e V4L2 nos demais).
+
+    Returns:
+        int: Identificador para ``cv2.VideoCapture(index, backend)``.
+    """
+    if name == "auto":
+        if sys.platform.startswith("win"):
+            name = "dshow"
+        elif sys.platform == "darwin":
+            name = "avfoundation"
+        else:
+            name = "v4l2"
+    try:
+        return _CAMERA_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Backend de câmera desconhecido: {name}") from None
+
+
+def get_camera_list(backend: int | None = None, enumerate_fn=None):
+    """
+    Lista as câmeras do backend como pares ``(índice, nome)``.
+
+    Args:
+        backend (int | None): Constante ``cv2.CAP_*``; None usa :func:`camera_backend`.
+        enumerate_fn: Função com a assinatura de ``cv2_enumerate_cameras.enumerate_cameras``;
+            permite testar com uma lista de dispositivos simulada.
+    """
+    if enumerate_fn is None:
+        from cv2_enumerate_cameras import enumerate_cameras as enumerate_fn
+    backend = camera_backend() if backend is None else backend
+
     cameras_available = []
     logger.info('Running camera discovery')
-    fetched_cameras = enumerate_cameras(cv2.CAP_DSHOW)
+    fetched_cameras = enumerate_fn(backend)
     if len(fetched_cameras) == 0:
         logger.warning('No cameras found')
         return []
@@ -18,34 +68,226 @@ def get_camera_list():
         logger.info(f"Camera {camera_info}")
     return cameras_available
 
-def firmata_handshake(port):
-    try:
-        ser = serial.Serial(port, baudrate=57600, timeout=2)
-        time.sleep(2)  # Aguarda inicialização do Arduino
 
-        # Envia comando SYSEX vazio (Start + End)
-        ser.write(bytes([0xF0, 0xF7]))
-        time.sleep(0.5)
+class CameraEnumerator:
+    """
+    Enumeração de câmeras fora da thread da interface.
+
+    :meth:`refresh` devolve imediatamente a última lista conhecida e dispara (no máximo) uma
+    enumeração em segundo plano; ao terminar, ``callback(cameras)`` é chamado na thread de
+    enumeração, e cabe à interface reagendá-lo na sua própria thread (``after``).
+    """
+
+    def __init__(self, backend: int | None = None, enumerate_fn=None):
+        self.backend = camera_backend() if backend is None else backend
+        self.enumerate_fn = enumerate_fn
+        self.cameras: list[tuple[int, str]] = []
+        self.updated = 0.0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._callbacks: list = []
+
+    @property
+    def busy(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def refresh(self, callback=None) -> list[tuple[int, str]]:
+        with self._lock:
+            if callback is not None:
+                self._callbacks.append(callback)
+            if not self.busy:
+                self._thread = threading.Thread(target=self._run, name="CameraEnumerator", daemon=True)
+                self._thread.start()
+            return list(self.cameras)
+
+    def wait(self, timeout: float | None = None) -> list[tuple[int, str]]:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return list(self.cameras)
+
+    def _run(self) -> None:
+        try:
+            cameras = get_camera_list(self.backend, self.enumerate_fn)
+        except Exception as e:
+            logger.error(f"Falha na enumeração de câmeras: {e}")
+            cameras = list(self.cameras)
+        with self._lock:
+            self.cameras = cameras
+            self.updated = time.time()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(list(cameras))
+
+
+_enumerator: CameraEnumerator | None = None
+
+
+def get_camera_enumerator() -> CameraEnumerator:
+    global _enumerator
+    if _enumerator is None:
+        _enumerator = CameraEnumerator()
+    return _enumerator
+
+
+# Consulta REPORT_FIRMWARE: START_SYSEX, 0x79, END_SYSEX.
+_REPORT_FIRMWARE = bytes([0xF0, 0x79, 0xF7])
+
+
+def _is_firmata_reply(data: bytes) -> bool:
+    """
+    Verifica se ``data`` contém uma resposta REPORT_FIRMWARE (``F0 79 maior menor ... F7``).
+
+    Exigir os bytes de versão distingue o Firmata de um dispositivo que apenas ecoa a
+    consulta.
+    """
+    start = data.find(b'\xF0\x79')
+    if start < 0:
+        return False
+    end = data.find(b'\xF7', start)
+    return end - start - 2 >= 2
+
+
+def firmata_handshake(
+        port,
+        serial_factory=serial.Serial,
+        boot_delay: float = FIRMATA_BOOT_DELAY,
+        reply_timeout: float = FIRMATA_REPLY_TIMEOUT
+):
+    """
+    Testa se há um Firmata respondendo em ``port``.
 
-        response = ser.read(64)
-        ser.close()
+    Args:
+        port (str): Dispositivo serial (ex.: ``COM3`` ou ``/dev/ttyACM0``).
+        serial_factory: Construtor com a assinatura de ``serial.Serial``; permite substituir
+            a porta real por um dublê (ver ``app.sim.serial_loop``).
+        boot_delay (float): Espera após abrir a porta, enquanto o Arduino reinicia.
+        reply_timeout (float): Tempo máximo de espera pela resposta.
 
-        # Verifica se resposta contém SYSEX válido
-        return b'\xF0' in response and b'\xF7' in response
+    Returns:
+        bool: True se a resposta contém um REPORT_FIRMWARE válido.
+    """
+    try:
+        with serial_factory(port, baudrate=FIRMATA_BAUDRATE, timeout=reply_timeout) as ser:
+            time.sleep(boot_delay)  # Aguarda inicialização do Arduino
+            ser.write(_REPORT_FIRMWARE)
+            # O StandardFirmata também envia a versão ao iniciar: a primeira resposta completa basta.
+            response = ser.read_until(b'\xF7', 64)
+            if not _is_firmata_reply(response):
+                response += ser.read_until(b'\xF7', 64)
+        return _is_firmata_reply(response)
     except Exception as e:
-        print(f"Erro em {port}: {e}")
+        logger.info(f"Erro em {port}: {e}")
         return False
 
-def get_device_list():
-    firmata_ports = []
-    all_ports = serial.tools.list_ports.comports()
+
+def port_key(port) -> str:
+    """ Identificador estável de uma porta: ``VID:PID:serial`` ou, sem USB, o nome do dispositivo. """
+    if port.vid is None or port.pid is None:
+        return f"dev:{port.device}"
+    return f"{port.vid:04X}:{port.pid:04X}:{port.serial_number or ''}"
+
+
+class DeviceCache:
+    """
+    Cache em disco (JSON) das portas já identificadas, indexado por :func:`port_key`.
+
+    Cada entrada guarda o último dispositivo em que a placa apareceu, se respondeu como
+    Firmata e quando foi verificada; com isso a lista de portas pode ser exibida antes de
+    repetir os handshakes.
+    """
+
+    def __init__(self, path: str | None = DEVICE_CACHE_PATH):
+        self.path = path
+        self.entries: dict = {}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Cache de dispositivos ignorado ({path}): {e}")
+
+    def is_firmata(self, port) -> bool:
+        entry = self.entries.get(port_key(port))
+        return bool(entry and entry.get("firmata"))
+
+    def update(self, port, firmata: bool) -> None:
+        with self._lock:
+            self.entries[port_key(port)] = {
+                "device": port.device,
+                "description": port.description,
+                "firmata": firmata,
+                "checked": time.time(),
+            }
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(self.entries, f, indent=2)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                logger.warning(f"Falha ao gravar o cache de dispositivos: {e}")
+
+
+_cache: DeviceCache | None = None
+
+
+def get_device_cache() -> DeviceCache:
+    global _cache
+    if _cache is None:
+        _cache = DeviceCache()
+    return _cache
+
+
+def get_cached_device_list(list_ports=serial.tools.list_ports.comports, cache: DeviceCache | None = None):
+    """
+    Portas presentes que já responderam como Firmata, sem nenhum handshake.
+
+    Returns:
+        list[str]: Dispositivos, na ordem de ``list_ports``.
+    """
+    cache = cache or get_device_cache()
+    return [port.device for port in list_ports() if cache.is_firmata(port)]
+
+
+def get_device_list(
+        list_ports=serial.tools.list_ports.comports,
+        serial_factory=serial.Serial,
+        cache: DeviceCache | None = None,
+        max_workers: int | None = None
+):
+    """
+    Testa todas as portas seriais em paralelo e atualiza o cache de dispositivos.
+
+    Cada handshake passa a maior parte do tempo esperando o Arduino reiniciar, então o tempo
+    total fica próximo ao de uma única porta.
+
+    Returns:
+        list[str]: Dispositivos com Firmata, na ordem de ``list_ports``.
+    """
+    cache = cache or get_device_cache()
+    all_ports = list(list_ports())
+    if not all_ports:
+        return []
 
     for port in all_ports:
         logger.info(f"Testando: {port.device} - {port.description}")
-        if firmata_handshake(port.device):
+    with ThreadPoolExecutor(max_workers or len(all_ports), thread_name_prefix="FirmataProbe") as pool:
+        results = list(pool.map(lambda p: firmata_handshake(p.device, serial_factory), all_ports))
+
+    firmata_ports = []
+    for port, ok in zip(all_ports, results):
+        cache.update(port, ok)
+        if ok:
             logger.info(f"Firmata detectado via handshake em {port.device}")
             firmata_ports.append(port.device)
         else:
             logger.info(f"Sem resposta válida de Firmata em {port.device}")
-
+    cache.save()
     return firmata_ports
@@ -0,0 +1,128 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+import cv2
+import numpy as np
+from app.config.constants import CAMERA_VIEWPORT_WIDTH, CAMERA_VIEWPORT_HEIGHT, DISPLAY_MAX_FPS
+from app.config.logger import logger
+from app.core.metrics import metrics
+
+
+class DisplayPipeline:
+    """
+    Preparação dos quadros da pré-visualização fora da thread do Tk.
+
+    :meth:`submit` copia o quadro para um único buffer pendente e retorna imediatamente; se
+    ainda havia um quadro pendente, ele é substituído (e contado em ``frames_dropped``). Uma
+    thread de trabalho reduz o quadro com ``cv2.resize(INTER_AREA)`` e converte para RGB em
+    buffers reutilizados, publicando o resultado por troca de buffers. A interface consulta
+    :meth:`frame` no ritmo de ``interval_ms`` (limitado por ``max_fps``) e só recebe o quadro
+    mais recente, uma única vez.
+    """
+
+    def __init__(
+            self,
+            size: Tuple[int, int] = (CAMERA_VIEWPORT_WIDTH, CAMERA_VIEWPORT_HEIGHT),
+            max_fps: float = DISPLAY_MAX_FPS
+    ):
+        self.size = size
+        self.max_fps = max_fps
+        w, h = size
+        self._front = np.zeros((h, w, 3), dtype=np.uint8)
+        self._back  = np.zeros((h, w, 3), dtype=np.uint8)
+        self._small: dict = {}
+        self._inbox: np.ndarray | None = None
+        self._work:  np.ndarray | None = None
+        self._has_pending = False
+        self._seq = 0
+        self._shown = 0
+
+        self._cond = threading.Condition()
+        self._swap = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._running = False
+
+        self.frames_submitted = 0
+        self.frames_dropped   = 0
+        self.frames_shown     = 0
+
+    @property
+    def interval_ms(self) -> int:
+        return max(1, int(1000 / self.max_fps))
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="DisplayPipeline", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        logger.debug(
+            f"DisplayPipeline encerrado: {self.frames_submitted} recebido(s), "
+            f"{self.frames_dropped} descartado(s), {self.frames_shown} exibido(s)"
+        )
+
+    def submit(self, frame: np.ndarray) -> None:
+        """ Entrega um quadro (BGR ou tons de cinza) para exibição, sem bloquear. """
+        with self._cond:
+            if self._inbox is None or self._inbox.shape != frame.shape:
+                self._inbox = np.empty_like(frame)
+            np.copyto(self._inbox, frame)
+            if self._has_pending:
+                self.frames_dropped += 1
+            self._has_pending = True
+            self.frames_submitted += 1
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._has_pending or not self._running)
+                if not self._running:
+                    return
+                # O quadro pendente passa para esta thread; submit() segue no outro buffer.
+                self._inbox, self._work = self._work, self._inbox
+                self._has_pending = False
+            try:
+                self._prepare(self._work)
+            except cv2.error as e:
+                logger.error(f"Falha ao preparar quadro para exibição: {e}")
+
+    def _prepare(self, frame: np.ndarray) -> None:
+        t0 = time.perf_counter()
+        channels = 1 if frame.ndim == 2 else frame.shape[2]
+        small = self._small.get(channels)
+        if small is None:
+            w, h = self.size
+            small = self._small[channels] = np.empty((h, w) if channels == 1 else (h, w, channels), dtype=np.uint8)
+        cv2.resize(frame, self.size, dst=small, interpolation=cv2.INTER_AREA)
+        code = cv2.COLOR_GRAY2RGB if channels == 1 else cv2.COLOR_BGR2RGB
+        cv2.cvtColor(small, code, dst=self._back)
+        with self._swap:
+            self._front, self._back = self._back, self._front
+            self._seq += 1
+        metrics.record("display", time.perf_counter() - t0)
+
+    @contextmanager
+    def frame(self) -> Iterator[np.ndarray | None]:
+        """
+        Quadro RGB mais recente ainda não exibido, ou None.
+
+        O buffer só é válido dentro do bloco ``with``; enquanto isso a thread de trabalho não
+        o reutiliza.
+        """
+        with self._swap:
+            if self._seq == self._shown:
+                yield None
+                return
+            self._shown = self._seq
+            self.frames_shown += 1
+            yield self._front
@@ -0,0 +1,166 @@
+import numpy as np
+from app.config.constants import POINT_CHUNK_SIZE
+from app.core.storage import POINT_DTYPE
+
+_COUNT_DIGITS = 12
+_FACE_DTYPE = np.dtype([("n", "u1"), ("v", "<i4", (3,))])
+
+
+class PlyWriter:
+    """
+    Escritor de PLY binário little-endian em blocos de tamanho fixo.
+
+    O cabeçalho é gravado na abertura com a contagem de vértices reservada e corrigida no
+    fechamento, então os pontos podem ser gravados à medida que chegam, sem montar a nuvem
+    inteira em memória. Cada lote é copiado para um único buffer estruturado reutilizado.
+    Com ``faces=True`` o cabeçalho declara também os triângulos, gravados por
+    :meth:`write_faces` depois de todos os vértices.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            intensity: bool = False,
+            normals: bool = False,
+            chunk_size: int = POINT_CHUNK_SIZE,
+            faces: bool = False
+    ):
+        fields = [("x", "<f4"), ("y", "<f4"), ("z", "<f4")]
+        if normals:
+            fields += [("nx", "<f4"), ("ny", "<f4"), ("nz", "<f4")]
+        if intensity:
+            fields += [("intensity", "<f4")]
+        self.dtype = np.dtype(fields)
+        self.has_intensity = intensity
+        self.has_normals = normals
+        self.has_faces = faces
+        self.count = 0
+        self.face_count = 0
+
+        self._buf = np.empty(chunk_size, dtype=self.dtype)
+        self._file = open(path, "wb")
+        self._file.write(b"ply\nformat binary_little_endian 1.0\ncomment SurfaceX\n")
+        self._count_pos = self._file.tell() + len(b"element vertex ")
+        header = f"element vertex {0:0{_COUNT_DIGITS}d}\n"
+        header += "".join(f"property float {name}\n" for name in self.dtype.names)
+        self._face_count_pos = None
+        if faces:
+            self._face_count_pos = self._count_pos + len(header) - len(b"element vertex ") + len(b"element face ")
+            header += f"element face {0:0{_COUNT_DIGITS}d}\n"
+            header += "property list uchar int vertex_indices\n"
+            self._face_buf = np.empty(chunk_size, dtype=_FACE_DTYPE)
+            self._face_buf["n"] = 3
+        header += "end_header\n"
+        self._file.write(header.encode("ascii"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(
+            self,
+            xyz: np.ndarray,
+            intensity: np.ndarray | None = None,
+            normals: np.ndarray | None = None
+    ) -> None:
+        """
+        Grava um lote de pontos.
+
+        Args:
+            xyz (np.ndarray): Coordenadas (N, 3).
+            intensity (np.ndarray | None): Intensidade (N,), obrigatória se habilitada.
+            normals (np.ndarray | None): Normais (N, 3), obrigatórias se habilitadas.
+        """
+        if self.has_intensity and intensity is None:
+            raise ValueError("Arquivo configurado com intensidade, mas nenhuma foi fornecida.")
+        if self.has_normals and normals is None:
+            raise ValueError("Arquivo configurado com normais, mas nenhuma foi fornecida.")
+        if self.face_count:
+            raise ValueError("Vértices devem ser gravados antes dos triângulos.")
+
+        n, cap = len(xyz), len(self._buf)
+        for start in range(0, n, cap):
+            stop = min(start + cap, n)
+            buf = self._buf[:stop - start]
+            buf["x"] = xyz[start:stop, 0]
+            buf["y"] = xyz[start:stop, 1]
+            buf["z"] = xyz[start:stop, 2]
+            if self.has_normals:
+                buf["nx"] = normals[start:stop, 0]
+                buf["ny"] = normals[start:stop, 1]
+                buf["nz"] = normals[start:stop, 2]
+            if self.has_intensity:
+                buf["intensity"] = intensity[start:stop]
+            self._file.write(memoryview(buf).cast("B"))
+        self.count += n
+
+    def write_faces(self, faces: np.ndarray) -> None:
+        """
+        Grava um lote de triângulos, depois de todos os vértices.
+
+        Args:
+            faces (np.ndarray): Índices (F, 3) dos vértices de cada triângulo.
+        """
+        if not self.has_faces:
+            raise ValueError("Arquivo configurado sem triângulos.")
+        n, cap = len(faces), len(self._face_buf)
+        for start in range(0, n, cap):
+            stop = min(start + cap, n)
+            buf = self._face_buf[:stop - start]
+            buf["v"] = faces[start:stop]
+            self._file.write(memoryview(buf).cast("B"))
+        self.face_count += n
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.seek(self._count_pos)
+        self._file.write(f"{self.count:0{_COUNT_DIGITS}d}".encode("ascii"))
+        if self._face_count_pos is not None:
+            self._file.seek(self._face_count_pos)
+            self._file.write(f"{self.face_count:0{_COUNT_DIGITS}d}".encode("ascii"))
+        self._file.close()
+
+
+def export_ply(
+        path: str,
+        points: np.ndarray,
+        intensity: bool = False,
+        normals: np.ndarray | None = None,
+        chunk_size: int = POINT_CHUNK_SIZE,
+        faces: np.ndarray | None = None
+) -> int:
+    """
+    Exporta uma nuvem para PLY binário, lendo a origem em blocos.
+
+    Args:
+        path (str): Arquivo de destino.
+        points (np.ndarray): Coordenadas (N, 3) ou array estruturado ``POINT_DTYPE``
+            (por exemplo, ``PointStore.view()``).
+        intensity (bool): Grava a intensidade; requer ``points`` com ``POINT_DTYPE``.
+        normals (np.ndarray | None): Normais (N, 3) opcionais.
+        chunk_size (int): Pontos por bloco de escrita.
+        faces (np.ndarray | None): Triângulos (F, 3) opcionais, com índices em ``points``.
+
+    Returns:
+        int: Número de vértices gravados.
+    """
+    structured = points.dtype == POINT_DTYPE
+    if intensity and not structured:
+        raise ValueError("Intensidade requer pontos no formato POINT_DTYPE.")
+
+    with PlyWriter(
+            path, intensity=intensity, normals=normals is not None, chunk_size=chunk_size, faces=faces is not None
+    ) as ply:
+        for start in range(0, len(points), chunk_size):
+            block = points[start:start + chunk_size]
+            ply.write(
+                block["xyz"] if structured else block,
+                intensity=block["intensity"] if intensity else None,
+                normals=normals[start:start + chunk_size] if normals is not None else None
+            )
+        if faces is not None:
+            ply.write_faces(faces)
+        return ply.count
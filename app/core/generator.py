@@ -2,9 +2,21 @@ import threading
 import time
 import cv2
 import numpy as np
-from app.core.proc import precompute, rectify
-from app.core.stream import Stream
+from app.core.capture import FrameGrabber
+from app.core.mesh import ProfileMesher
+from app.core.metrics import metrics
+from app.core.proc import rectify_gray, laser_peaks, laser_peaks_roi, backproject_batch
+from app.core.rectify_cache import get_map_cache
+from app.core.stream import Stream, FramePool
+from app.core.turntable import TurntableMerger
+from app.core.utils import get_tracker
+from app.core.voxel import VoxelGrid
+from app.config.constants import (
+    CAMERA_WIDTH, CAMERA_HEIGHT, FRAME_RESOLUTION, REFERENCE_MARKER_LENGTH_MM, TARGET_MARKER_ID_43,
+    SCAN_PREVIEW_INTERVAL
+)
 from app.config.exceptions import CameraReadError
+from app.config.logger import logger
 from app.core.scanner_config import Scanner
 
 
@@ -17,44 +29,259 @@ def frame_generator(scanner: Scanner, stop_event: threading.Event):
     if scanner.firmata_instance is None:
         pass
 
-    scanner.plane_constants = None
-
-    k_opt, _, map1, map2 = precompute(scanner.camera_matrix, scanner.dist_coeffs, (1280, 720))
+    k_opt, _, map1, map2 = get_map_cache().get(
+        scanner.camera_matrix, scanner.dist_coeffs, scanner.calibration_size, flip=True
+    )
     if k_opt is None or map1 is None or map2 is None:
         raise IOError("Could not open camera calibration file")
 
-    start = time.time()
-    while not stop_event.is_set():
-        ret, frame = scanner.camera_instance.read()
-        if not ret:
-            stop_event.set()
-            raise CameraReadError("Error reading frame")
+    pool    = FramePool((CAMERA_HEIGHT, CAMERA_WIDTH))
+    scratch = np.empty((CAMERA_HEIGHT, CAMERA_WIDTH), dtype=np.uint8)
+
+    grabber = FrameGrabber(scanner.camera_instance, policy=scanner.capture_policy)
+    scanner.grabber = grabber
+    grabber.start()
+    try:
+        while not stop_event.is_set():
+            out = _next_buffer(pool, stop_event)
+            if out is None:
+                continue
+            out_idx, gray = out
+            slot = _next_frame(grabber, stop_event)
+            if slot is None:
+                pool.release(out_idx)
+                continue
+            idx, raw = slot
+            try:
+                _record(scanner, raw)
+                t0 = time.perf_counter()
+                cv2.cvtColor(raw, cv2.COLOR_BGR2GRAY, dst=scratch)
+                t1 = time.perf_counter()
+                rectify_gray(map1, map2, scratch, gray)
+                metrics.record("grayscale", t1 - t0)
+                metrics.record("rectify", time.perf_counter() - t1)
+            finally:
+                grabber.release(idx)
+
+            yield Stream(gray, 1, 0.0, 0.0, 0.0, pool=pool, slot=out_idx)
+    finally:
+        grabber.stop()
+
+
+def _next_buffer(pool: FramePool, stop_event: threading.Event):
+    """ Buffer de saída livre; só fica disponível depois que o consumidor liberar um Stream. """
+    out = pool.acquire(timeout=0.5)
+    if out is None and not stop_event.is_set():
+        logger.debug("Nenhum buffer de Stream livre: o consumidor chamou release()?")
+    return out
 
-        frame = rectify(map1, map2, frame)
-        frame = cv2.flip(frame, 1)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-        if time.time() - start > 10.0:
-            scanner.plane_constants = np.array([1.,1.,2.1,-1.0])
+def _next_frame(grabber: FrameGrabber, stop_event: threading.Event):
+    try:
+        return grabber.get(timeout=0.5)
+    except CameraReadError:
+        stop_event.set()
+        raise
 
-        yield Stream(gray, 1, 0.0, 0.0, 0.0, np.zeros((1, 5)))
-        time.sleep(0.01)  # ~20 FPS de leitura, mas atualiza 10 FPS
 
+def _record(scanner: Scanner, raw):
+    """ Grava o quadro na sessão ativa; se o gravador falhou, encerra a gravação e segue. """
+    if scanner.recorder is not None:
+        try:
+            scanner.recorder.record(raw, scanner.stepper_position, scanner.laser_on)
+        except RuntimeError as e:
+            logger.error(f"Gravação da sessão interrompida: {e}")
+            try:
+                scanner.stop_recording()
+            except Exception:
+                logger.exception("Falha ao fechar a sessão")
+            scanner.recorder = None
+
+
+def find_refs(frame, camera_matrix, dist_coeffs, target_id=TARGET_MARKER_ID_43, tracker=None):
+    """
+    Pose do marcador de referência no quadro.
+
+    Args:
+        frame (np.ndarray): Quadro BGR ou em tons de cinza.
+        camera_matrix (np.ndarray): Matriz da câmera do quadro (``k_opt`` se já retificado).
+        dist_coeffs (np.ndarray): Coeficientes de distorção (zeros se já retificado).
+        target_id (int): ID do marcador de referência.
+        tracker (MarkerTracker | None): Rastreador; None usa o compartilhado.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray] | None: (rvec, tvec) do marcador, ou None se não encontrado.
+    """
+    tracker = tracker if tracker is not None else get_tracker()
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    poses = tracker.estimate_poses(
+        gray, (target_id,), REFERENCE_MARKER_LENGTH_MM, camera_matrix, dist_coeffs
+    )
+    return poses.get(target_id)
 
-def find_refs(frame, camera_matrix, dist_coeffs):
-    pass
 
 def scan(scanner: Scanner, stop_event=None):
     if scanner.camera_instance is None or not scanner.camera_instance.isOpened():
         raise CameraReadError("Camera is not opened")
 
+    pool = FramePool((CAMERA_HEIGHT, CAMERA_WIDTH, 3))
+    grabber = FrameGrabber(scanner.camera_instance, policy=scanner.capture_policy)
+    scanner.grabber = grabber
+    grabber.start()
     start = time.time()
-    while not stop_event.is_set():
-        ret, frame = scanner.camera_instance.read()
-        if not ret:
-            stop_event.set()
-            raise CameraReadError("Error reading frame")
-
-        frame = cv2.flip(frame, 1)
-        yield Stream(frame, 1, time.time() - start, 0.0, 0.0, np.zeros((1, 5)))
-        time.sleep(0.01)  # ~20 FPS de leitura, mas atualiza 10 FPS
+    try:
+        while not stop_event.is_set():
+            out = _next_buffer(pool, stop_event)
+            if out is None:
+                continue
+            out_idx, frame = out
+            slot = _next_frame(grabber, stop_event)
+            if slot is None:
+                pool.release(out_idx)
+                continue
+            idx, raw = slot
+            try:
+                _record(scanner, raw)
+                cv2.flip(raw, 1, dst=frame)
+            finally:
+                grabber.release(idx)
+            yield Stream(frame, 1, time.time() - start, 0.0, 0.0, pool=pool, slot=out_idx)
+    finally:
+        grabber.stop()
+
+
+class ScanProcessor:
+    """
+    Processamento de cada posição da varredura, no formato ``process`` do ``ScanScheduler``.
+
+    O par laser desligado/ligado (quadros brutos, sem espelhamento) é retificado em tons de
+    cinza com os mapas de ``Scanner._load_maps``; diferença, limiar e extração dos picos
+    rodam só no retângulo da ROI de referência (``Scanner.roi_rect``/``roi_mask``, definidos
+    uma vez em ``set_references``) e os pontos, já em coordenadas da imagem completa, são
+    triangulados com ``plane_constants`` no referencial da câmera. O escalonador chama o
+    processamento de uma única thread, então os buffers são reaproveitados entre posições.
+
+    Os pontos vão para o ``PointStore`` (nuvem completa, no referencial da câmera, com o
+    passo do motor de cada perfil) e para um ``VoxelGrid`` (nuvem subamostrada, de tamanho
+    limitado), que é o que a prévia e a exportação leem. Com o eixo da mesa calibrado
+    (``Scanner.axis_origin``/``axis_direction``) os pontos da grade são levados ao
+    referencial do objeto com ``TurntableMerger``, juntando as vistas de todos os passos. Os
+    mesmos pontos, com a coluna da imagem de cada um, alimentam um ``ProfileMesher``; a
+    faixa da malha é interrompida quando o passo entre perfis muda (inversão de sentido ou
+    lacuna). A cada
+    ``preview_interval`` segundos, ``on_preview`` recebe o último quadro com laser
+    (espelhado, como na pré-visualização) com os centroides da grade projetados em verde;
+    tudo isso roda na mesma thread do processamento, sem disputar a grade com outra.
+    """
+
+    def __init__(
+            self,
+            scanner: Scanner,
+            store=None,
+            grid: VoxelGrid | None = None,
+            on_preview=None,
+            preview_interval: float = SCAN_PREVIEW_INTERVAL
+    ):
+        if scanner.plane_constants is None or scanner.k_opt is None:
+            raise RuntimeError("Calibre a câmera e o plano laser antes de escanear.")
+        self.scanner = scanner
+        self.store = store
+        self.grid = grid if grid is not None else VoxelGrid()
+        self.on_preview = on_preview
+        self.preview_interval = preview_interval
+        self._last_preview = 0.0
+        self.plane = np.asarray(scanner.plane_constants, dtype=np.float64).reshape(1, 4)
+        self.mesher = ProfileMesher()
+        self._last_delta: int | None = None
+        self.merger = None
+        if scanner.axis_origin is not None and scanner.axis_direction is not None:
+            self.merger = TurntableMerger(scanner.axis_origin, scanner.axis_direction)
+        self._position = 0
+        shape = (FRAME_RESOLUTION[1], FRAME_RESOLUTION[0])
+        self._bg = np.empty(shape, dtype=np.uint8)
+        self._fg = np.empty(shape, dtype=np.uint8)
+        self._mirror = np.empty(shape, dtype=np.uint8)
+        self._preview = np.empty(shape + (3,), dtype=np.uint8)
+        self._raw_gray = (np.empty(0, dtype=np.uint8), np.empty(0, dtype=np.uint8))
+        self._offsets = np.zeros(2, dtype=np.int64)
+        self.profiles = 0
+        self.points = 0
+
+    def extract(self, bg: np.ndarray, fg: np.ndarray) -> np.ndarray:
+        """ Picos do laser (N, 2), restritos à ROI de referência quando definida. """
+        rect = self.scanner.roi_rect
+        if rect is None:
+            return laser_peaks(bg, fg)
+        return laser_peaks_roi(bg, fg, rect, mask=self.scanner.roi_mask)
+
+    def _grayscale(self, bg: np.ndarray, fg: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """ Par em tons de cinza na resolução da câmera, em buffers realocados só se ela mudar. """
+        if bg.ndim == 2:
+            return bg, fg
+        if self._raw_gray[0].shape != bg.shape[:2]:
+            self._raw_gray = (np.empty(bg.shape[:2], dtype=np.uint8), np.empty(bg.shape[:2], dtype=np.uint8))
+        cv2.cvtColor(bg, cv2.COLOR_BGR2GRAY, dst=self._raw_gray[0])
+        cv2.cvtColor(fg, cv2.COLOR_BGR2GRAY, dst=self._raw_gray[1])
+        return self._raw_gray
+
+    def __call__(self, bg: np.ndarray, fg: np.ndarray, position: int) -> int:
+        t0 = time.perf_counter()
+        bg, fg = self._grayscale(bg, fg)
+        t1 = time.perf_counter()
+        rectify_gray(self.scanner.map_one, self.scanner.map_two, bg, self._bg)
+        rectify_gray(self.scanner.map_one, self.scanner.map_two, fg, self._fg)
+        t2 = time.perf_counter()
+        pts = self.extract(self._bg, self._fg)
+        t3 = time.perf_counter()
+        self._offsets[1] = len(pts)
+        xyz = backproject_batch(pts, self._offsets, self.plane, self.scanner.k_opt)
+        valid = np.isfinite(xyz).all(axis=1)
+        xyz, columns = xyz[valid], pts[valid, 0]
+        t4 = time.perf_counter()
+        metrics.record("grayscale", t1 - t0)
+        metrics.record("rectify", t2 - t1)
+        metrics.record("extraction", t3 - t2)
+        metrics.record("triangulation", t4 - t3)
+
+        if self.store is not None:
+            self.store.append(xyz, frame=self.profiles, step=position)
+        if self.merger is not None:
+            self._offsets[1] = len(xyz)
+            merged = self.merger.merge(xyz, self._offsets, np.array([position]))
+        else:
+            merged = xyz
+        self.grid.add(merged)
+
+        if self.profiles:
+            delta = position - self._position
+            if self._last_delta is not None and delta != self._last_delta:
+                self.mesher.break_strip()
+            self._last_delta = delta
+        self.mesher.add_profile(merged, columns)
+        t5 = time.perf_counter()
+        metrics.record("accumulation", t5 - t4)
+        self._position = position
+        self.profiles += 1
+        self.points += len(xyz)
+
+        if self.on_preview is not None and t5 - self._last_preview >= self.preview_interval:
+            self._last_preview = t5
+            self.on_preview(self.render_preview())
+        return len(xyz)
+
+    def render_preview(self) -> np.ndarray:
+        """ Último quadro com laser (BGR, espelhado) com os centroides da grade projetados. """
+        cv2.flip(self._fg, 1, dst=self._mirror)
+        cv2.cvtColor(self._mirror, cv2.COLOR_GRAY2BGR, dst=self._preview)
+        pts = self.grid.centroids()
+        if self.merger is not None:
+            pts = self.merger.to_view(pts, self._position)
+        pts = pts[pts[:, 2] > 0]
+        if len(pts):
+            k = self.scanner.k_opt
+            u = np.rint(k[0, 0] * pts[:, 0] / pts[:, 2] + k[0, 2]).astype(np.intp)
+            v = np.rint(k[1, 1] * pts[:, 1] / pts[:, 2] + k[1, 2]).astype(np.intp)
+            h, w = self._mirror.shape
+            inside = (u >= 0) & (u < w) & (v >= 0) & (v < h)
+            self._preview[v[inside], w - 1 - u[inside]] = (0, 255, 0)
+        return self._preview
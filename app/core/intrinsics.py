@@ -0,0 +1,279 @@
+"""
+Calibração intrínseca com tabuleiro ChArUco.
+
+A detecção dos cantos roda em um ``ProcessPoolExecutor`` (um ``CharucoDetector`` por
+processo, imagens enviadas em blocos); das imagens aceitas, :func:`select_keyframes` escolhe
+gulosamente as vistas mais diferentes entre si e só elas entram no ``calibrateCamera``. O
+resultado é gravado no formato lido por ``Scanner.set_calibration``.
+"""
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Sequence, Tuple
+import cv2
+import numpy as np
+from app.config.constants import (
+    ARUCO_DICT_NAME, BOARD_COLS, BOARD_ROWS, SQUARE_SIZE, MARKER_SIZE,
+    CALIB_KEYFRAMES, CALIB_MIN_CORNERS, CALIB_CHUNK
+)
+from app.config.logger import logger
+from app.core.session import SessionReplay
+
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.bmp", "*.tif", "*.tiff")
+
+_ctx: dict = {}
+
+
+def make_board() -> cv2.aruco.CharucoBoard:
+    """ Tabuleiro ChArUco definido por ``BOARD_COLS``, ``BOARD_ROWS``, ``SQUARE_SIZE`` e ``MARKER_SIZE``. """
+    dictionary = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, ARUCO_DICT_NAME))
+    return cv2.aruco.CharucoBoard((BOARD_COLS, BOARD_ROWS), SQUARE_SIZE, MARKER_SIZE, dictionary)
+
+
+@dataclass
+class CharucoView:
+    """ Cantos ChArUco de uma imagem e o descritor da pose usado na seleção de vistas. """
+    index: int
+    corners: np.ndarray     # (N, 2) float32, pixels
+    ids: np.ndarray         # (N,) int32
+    features: np.ndarray    # (6,) float64, ver _pose_features
+
+
+def list_images(source: str) -> List[str]:
+    """ Imagens de uma pasta, em ordem alfabética. """
+    return sorted(f for p in IMAGE_PATTERNS for f in glob.glob(os.path.join(source, p)))
+
+
+def _init_worker(source: str, files: Sequence[str] | None, min_corners: int) -> None:
+    """ Prepara, uma vez por processo, o detector e a fonte das imagens. """
+    _ctx.clear()
+    board = make_board()
+    _ctx["board"] = board
+    _ctx["detector"] = cv2.aruco.CharucoDetector(board)
+    _ctx["chessboard"] = board.getChessboardCorners()[:, :2].astype(np.float32)
+    _ctx["files"] = files
+    _ctx["replay"] = SessionReplay(source) if files is None else None
+    _ctx["min_corners"] = min_corners
+
+
+def _load_gray(index: int) -> np.ndarray:
+    if _ctx["replay"] is not None:
+        img = _ctx["replay"].frame(index)[0]
+    else:
+        img = cv2.imread(_ctx["files"][index], cv2.IMREAD_COLOR)
+        if img is None:
+            raise IOError(f"Não foi possível ler {_ctx['files'][index]}")
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+
+def _pose_features(corners: np.ndarray, ids: np.ndarray, size: Tuple[int, int]) -> np.ndarray | None:
+    """
+    Descritor da pose do tabuleiro que não depende da calibração: centro e escala na imagem,
+    perspectiva (inclinação) e rotação no plano, tirados da homografia tabuleiro -> imagem.
+    """
+    obj = _ctx["chessboard"][ids]
+    H, _ = cv2.findHomography(obj, corners)
+    if H is None:
+        return None
+    w, h = size
+    extent = float(np.ptp(_ctx["chessboard"], axis=0).max())
+    center = obj.mean(axis=0)
+    p = H @ np.array([center[0], center[1], 1.0])
+    cx, cy = p[:2] / p[2]
+    hull = cv2.convexHull(corners.reshape(-1, 1, 2))
+    scale = np.sqrt(cv2.contourArea(hull) / (w * h))
+    # Componentes projetivas normalizadas: zero com o tabuleiro paralelo ao sensor.
+    tilt = H[2, :2] / H[2, 2] * extent
+    angle = np.arctan2(H[1, 0], H[0, 0])
+    return np.array([cx / w, cy / h, scale, tilt[0], tilt[1], np.sin(2 * angle)])
+
+
+def detect_chunk(indices: Sequence[int]) -> Tuple[List[CharucoView], Tuple[int, int] | None]:
+    """
+    Detecta os cantos ChArUco de um bloco de imagens (executado nos processos de trabalho).
+
+    Returns:
+        Tuple[List[CharucoView], Tuple[int, int] | None]: Vistas aceitas (com pelo menos
+        ``min_corners`` cantos) e a resolução (largura, altura) das imagens do bloco.
+    """
+    views, size = [], None
+    for index in indices:
+        gray = _load_gray(index)
+        size = (gray.shape[1], gray.shape[0])
+        corners, ids, _, _ = _ctx["detector"].detectBoard(gray)
+        if ids is None or len(ids) < _ctx["min_corners"]:
+            continue
+        corners = corners.reshape(-1, 2).astype(np.float32)
+        ids = ids.ravel().astype(np.int32)
+        features = _pose_features(corners, ids, size)
+        if features is not None:
+            views.append(CharucoView(int(index), corners, ids, features))
+    return views, size
+
+
+def detect_views(
+        source: str,
+        workers: int | None = None,
+        chunk: int = CALIB_CHUNK,
+        min_corners: int = CALIB_MIN_CORNERS,
+        progress: Callable[[int, int], None] | None = None
+) -> Tuple[List[CharucoView], Tuple[int, int] | None, int]:
+    """
+    Detecta os cantos ChArUco de todas as imagens de ``source`` em paralelo.
+
+    Args:
+        source (str): Pasta de imagens ou diretório de uma sessão gravada.
+        workers (int | None): Número de processos (padrão: todos os núcleos).
+        chunk (int): Imagens por tarefa.
+        min_corners (int): Cantos mínimos para aceitar uma imagem.
+        progress (Callable[[int, int], None] | None): Chamado com (processadas, total) a cada bloco.
+
+    Returns:
+        Tuple[List[CharucoView], Tuple[int, int] | None, int]: Vistas aceitas em ordem,
+        resolução das imagens e total de imagens.
+    """
+    if os.path.exists(os.path.join(source, "session.npz")):
+        replay = SessionReplay(source)
+        files, total = None, replay.count
+        replay.release()
+    else:
+        files = list_images(source)
+        total = len(files)
+    if total == 0:
+        return [], None, 0
+
+    chunks = [range(i, min(i + chunk, total)) for i in range(0, total, chunk)]
+    workers = workers or os.cpu_count() or 1
+    views: List[CharucoView] = []
+    size, done = None, 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(source, files, min_corners)) as pool:
+        for block, (found, block_size) in zip(chunks, pool.map(detect_chunk, chunks)):
+            views.extend(found)
+            if size is None:
+                size = block_size
+            elif block_size is not None and block_size != size:
+                raise ValueError(f"Imagens com resoluções diferentes: {size} e {block_size}")
+            done += len(block)
+            if progress is not None:
+                progress(done, total)
+    return views, size, total
+
+
+def select_keyframes(features: np.ndarray, count: int = CALIB_KEYFRAMES, first: int = 0) -> np.ndarray:
+    """
+    Seleção gulosa por ponto mais distante (farthest point sampling).
+
+    Os descritores são padronizados por coluna; a cada passo entra a vista mais distante de
+    todas as já escolhidas. Mantém-se a menor distância de cada vista ao conjunto, então o
+    custo é O(N * count).
+
+    Args:
+        features (np.ndarray): Descritores (N, F).
+        count (int): Número de vistas desejado.
+        first (int): Índice da vista inicial.
+
+    Returns:
+        np.ndarray: Índices (min(count, N),) das vistas escolhidas, na ordem de escolha.
+    """
+    n = len(features)
+    if n <= count:
+        return np.arange(n)
+    std = features.std(axis=0)
+    z = (features - features.mean(axis=0)) / np.where(std > 0, std, 1.0)
+
+    chosen = np.empty(count, dtype=np.intp)
+    chosen[0] = first
+    dist = np.linalg.norm(z - z[first], axis=1)
+    for k in range(1, count):
+        chosen[k] = nxt = int(dist.argmax())
+        np.minimum(dist, np.linalg.norm(z - z[nxt], axis=1), out=dist)
+    return chosen
+
+
+def calibrate(
+        views: Sequence[CharucoView],
+        size: Tuple[int, int],
+        board: cv2.aruco.CharucoBoard | None = None
+) -> Tuple[float, np.ndarray, np.ndarray]:
+    """
+    Executa ``cv2.calibrateCamera`` sobre as vistas informadas.
+
+    Returns:
+        Tuple[float, np.ndarray, np.ndarray]: Erro RMS de reprojeção (pixels), matriz da
+        câmera e coeficientes de distorção.
+    """
+    board = board or make_board()
+    obj_points, img_points = [], []
+    for view in views:
+        obj, img = board.matchImagePoints(view.corners.reshape(-1, 1, 2), view.ids.reshape(-1, 1))
+        obj_points.append(obj.astype(np.float32))
+        img_points.append(img.astype(np.float32))
+    rms, camera_matrix, dist_coeffs, _, _ = cv2.calibrateCamera(obj_points, img_points, size, None, None)
+    return float(rms), camera_matrix, dist_coeffs.ravel()
+
+
+def save_calibration(path: str, camera_matrix: np.ndarray, dist_coeffs: np.ndarray, **extra) -> str:
+    """
+    Grava ``{"camera_matrix", "dist_coeffs", ...}`` com ``np.save``, como lê ``Scanner.set_calibration``,
+    e devolve o caminho efetivamente gravado (``np.save`` acrescenta ``.npy`` quando falta).
+    """
+    if not path.endswith(".npy"):
+        path += ".npy"
+    np.save(path, {"camera_matrix": camera_matrix, "dist_coeffs": dist_coeffs, **extra}, allow_pickle=True)
+    return path
+
+
+def calibrate_from_source(
+        source: str,
+        output: str | None = None,
+        keyframes: int = CALIB_KEYFRAMES,
+        workers: int | None = None,
+        progress: Callable[[int, int], None] | None = None
+) -> dict:
+    """
+    Detecção paralela, seleção de vistas e calibração de uma pasta de imagens ou sessão.
+
+    Args:
+        source (str): Pasta de imagens ou diretório de uma sessão gravada.
+        output (str | None): Arquivo ``.npy`` de saída; None não grava.
+        keyframes (int): Número de vistas usadas no ``calibrateCamera``.
+        workers (int | None): Número de processos da detecção.
+        progress (Callable[[int, int], None] | None): Progresso da detecção.
+
+    Returns:
+        dict: ``camera_matrix``, ``dist_coeffs``, ``rms``, ``image_size``, ``images``,
+        ``detected``, ``keyframes`` (índices das imagens usadas) e ``path`` (arquivo
+        gravado, ou None).
+    """
+    start = time.perf_counter()
+    views, size, total = detect_views(source, workers, progress=progress)
+    if len(views) < 3:
+        raise RuntimeError(f"Tabuleiro ChArUco detectado em {len(views)} de {total} imagem(ns); são necessárias ao menos 3.")
+    t_detect = time.perf_counter() - start
+
+    # Começa pela vista com mais cantos: é a referência mais confiável.
+    first = int(np.argmax([len(v.ids) for v in views]))
+    chosen = select_keyframes(np.stack([v.features for v in views]), keyframes, first)
+    selected = [views[i] for i in sorted(chosen)]
+    rms, camera_matrix, dist_coeffs = calibrate(selected, size)
+
+    result = {
+        "camera_matrix": camera_matrix,
+        "dist_coeffs": dist_coeffs,
+        "rms": rms,
+        "image_size": size,
+        "images": total,
+        "detected": len(views),
+        "keyframes": [v.index for v in selected],
+        "path": None,
+    }
+    logger.info(
+        f"Calibração: {len(selected)} de {len(views)} vista(s) ({total} imagem(ns)), RMS {rms:.3f} px; "
+        f"detecção {t_detect:.2f}s, total {time.perf_counter() - start:.2f}s"
+    )
+    if output is not None:
+        result["path"] = save_calibration(output, camera_matrix, dist_coeffs, rms=rms, image_size=size)
+        logger.info(f"Calibração gravada em {result['path']}")
+    return result
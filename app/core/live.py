@@ -0,0 +1,359 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Tuple
+import cv2
+import numpy as np
+from app.config.constants import CAMERA_WIDTH, CAMERA_HEIGHT, LIVE_SHM_SLOTS
+from app.config.logger import logger
+from app.core.metrics import metrics
+from app.core.proc import rectify_gray, laser_peaks, laser_peaks_roi, backproject_batch
+from app.core.session import SessionReplay
+
+_STOP = None
+_FAILED = "failed"
+
+
+def _open_source(source, backend: int | None):
+    if isinstance(source, str):
+        return SessionReplay(source)
+    return cv2.VideoCapture(source) if backend is None else cv2.VideoCapture(source, backend)
+
+
+def _attach(name: str, shape: Tuple[int, ...]) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+
+def _capture_main(source, backend, raw_name, slots, shape, free_slots, tasks, n_workers, block, stop, dropped):
+    """ Processo de captura: lê a câmera direto nos slots de memória compartilhada. """
+    shm, raw = _attach(raw_name, (slots, *shape))
+    cap = _open_source(source, backend)
+    spare = np.empty(shape, dtype=np.uint8)
+    seq = 0
+    try:
+        if not cap.isOpened():
+            logger.error(f"LivePipeline: não foi possível abrir a fonte {source}")
+            return
+        if not isinstance(source, str):
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, shape[1])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, shape[0])
+
+        while not stop.is_set():
+            try:
+                slot = free_slots.get(timeout=0.1) if block else free_slots.get_nowait()
+            except queue.Empty:
+                if block:
+                    continue
+                # Sem slot livre: a câmera continua sendo drenada e o quadro é descartado.
+                if not cap.read(spare)[0]:
+                    break
+                with dropped.get_lock():
+                    dropped.value += 1
+                continue
+
+            ret, frame = cap.read(raw[slot])
+            if not ret:
+                free_slots.put(slot)
+                break
+            if frame is not None and frame is not raw[slot] and frame.shape == shape:
+                np.copyto(raw[slot], frame)
+            tasks.put((seq, slot, time.perf_counter()))
+            seq += 1
+    finally:
+        cap.release()
+        for _ in range(n_workers):
+            tasks.put(_STOP)
+        del raw
+        shm.close()
+
+
+def _worker_main(raw_name, bg_name, slots, shape, bg_index, free_slots, tasks, results, params):
+    """
+    Processo de trabalho: retifica, extrai o laser e triangula a partir dos slots.
+
+    Sempre termina publicando ``_STOP``, mesmo com erro, para o coletor não esperar por ele.
+    A falha de um quadro publica ``(_FAILED, seq, mensagem)`` e o processo segue; uma falha
+    fora do processamento de um quadro publica ``(_FAILED, None, mensagem)`` e encerra.
+    """
+    shm_raw = shm_bg = raw = bg = background = None
+    try:
+        shm_raw, raw = _attach(raw_name, (slots, *shape))
+        shm_bg, bg = _attach(bg_name, (2, shape[0], shape[1]))
+        fg = np.empty(shape[:2], dtype=np.uint8)
+        scratch = np.empty(shape[:2], dtype=np.uint8)
+        offsets = np.zeros(2, dtype=np.int64)
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                break
+            seq, slot, t_capture = task
+            try:
+                t0 = time.perf_counter()
+                try:
+                    rectify_gray(params["map1"], params["map2"], raw[slot], fg, scratch)
+                finally:
+                    free_slots.put(slot)
+
+                t1 = time.perf_counter()
+                background = bg[bg_index.value]
+                if params["roi"] is not None:
+                    pts = laser_peaks_roi(background, fg, params["roi"], mask=params["roi_mask"])
+                else:
+                    pts = laser_peaks(background, fg)
+                t2 = time.perf_counter()
+                offsets[1] = len(pts)
+                xyz = backproject_batch(
+                    pts, offsets, params["plane"][None], params["k_opt"], params["rvec"], params["tvec"]
+                )
+                t3 = time.perf_counter()
+            except Exception as e:
+                results.put((_FAILED, seq, f"{type(e).__name__}: {e}"))
+                continue
+            # As métricas ficam no processo principal: os tempos de cada etapa seguem com o resultado.
+            timings = (("rectify", t1 - t0), ("extraction", t2 - t1), ("triangulation", t3 - t2))
+            results.put((seq, xyz[np.isfinite(xyz).all(axis=1)], t3 - t_capture, timings))
+    except BaseException as e:
+        results.put((_FAILED, None, f"{type(e).__name__}: {e}"))
+    finally:
+        results.put(_STOP)
+        del raw, bg, background
+        for shm in (shm_raw, shm_bg):
+            if shm is not None:
+                shm.close()
+
+
+class LivePipeline:
+    """
+    Pipeline de escaneamento ao vivo distribuído em vários processos.
+
+    Um processo de captura lê a câmera diretamente em slots de ``multiprocessing.shared_memory``
+    e publica apenas o índice do slot; um grupo de processos de trabalho retifica, extrai o
+    laser e triangula a partir desses slots, sem serializar quadros. Os pontos voltam por uma
+    fila, são reordenados pelo número de sequência em uma thread coletora e entregues em
+    ordem ao acumulador (``PointStore``/``VoxelGrid``) e ao callback ``on_points``. Apenas
+    os pequenos arrays de pontos chegam ao processo principal.
+
+    O fundo (laser desligado) fica em um bloco compartilhado com buffer duplo e é trocado
+    com :meth:`set_background`.
+
+    Um quadro que falha em um processo de trabalho é pulado na reordenação e contado em
+    ``failed_frames``; a primeira mensagem fica em ``error``. Uma falha que derruba um
+    processo de trabalho é relançada por :meth:`wait`.
+    """
+
+    def __init__(
+            self,
+            source: int | str,
+            k_opt: np.ndarray,
+            map_one: np.ndarray,
+            map_two: np.ndarray,
+            plane: np.ndarray,
+            rvec: np.ndarray | None = None,
+            tvec: np.ndarray | None = None,
+            roi: Tuple[int, int, int, int] | None = None,
+            roi_mask: np.ndarray | None = None,
+            backend: int | None = None,
+            workers: int | None = None,
+            slots: int = LIVE_SHM_SLOTS,
+            block: bool | None = None,
+            store=None,
+            grid=None,
+            on_points: Callable[[int, np.ndarray], None] | None = None
+    ):
+        self.source = source
+        self.backend = backend
+        self.shape = (CAMERA_HEIGHT, CAMERA_WIDTH, 3)
+        self.slots = slots
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        # Uma sessão gravada deve ser processada por inteiro; uma câmera não pode esperar.
+        self.block = isinstance(source, str) if block is None else block
+        self.store, self.grid, self.on_points = store, grid, on_points
+        self.params = {
+            "k_opt": k_opt, "map1": map_one, "map2": map_two,
+            "plane": np.asarray(plane, dtype=np.float64),
+            "rvec": None if rvec is None else np.asarray(rvec, dtype=np.float64).reshape(1, 3),
+            "tvec": None if tvec is None else np.asarray(tvec, dtype=np.float64).reshape(1, 3),
+            "roi": roi, "roi_mask": roi_mask,
+        }
+
+        self.frames_processed = 0
+        self.points_total = 0
+        self.last_latency = 0.0
+        self.failed_frames = 0
+        self.error: str | None = None
+        self._fatal: str | None = None
+
+        self._ctx = mp.get_context("spawn")
+        self._shm_raw: shared_memory.SharedMemory | None = None
+        self._shm_bg: shared_memory.SharedMemory | None = None
+        self._bg: np.ndarray | None = None
+        self._bg_index = self._ctx.Value("i", 0)
+        self._dropped = self._ctx.Value("i", 0)
+        self._stop = self._ctx.Event()
+        self._procs: list = []
+        self._queues: tuple = ()
+        self._collector: threading.Thread | None = None
+
+    @property
+    def frames_dropped(self) -> int:
+        return self._dropped.value
+
+    @property
+    def running(self) -> bool:
+        return self._collector is not None and self._collector.is_alive()
+
+    def set_background(self, gray: np.ndarray) -> None:
+        """ Publica um novo fundo retificado em tons de cinza para os processos de trabalho. """
+        if self._bg is None:
+            raise RuntimeError("LivePipeline não iniciado.")
+        nxt = 1 - self._bg_index.value
+        np.copyto(self._bg[nxt], gray)
+        self._bg_index.value = nxt
+
+    def start(self, background: np.ndarray | None = None) -> None:
+        """ Cria a memória compartilhada e os processos; em caso de falha, desfaz o que já foi criado. """
+        try:
+            self._start(background)
+        except BaseException:
+            logger.exception("LivePipeline: falha ao iniciar")
+            self._stop.set()
+            for p in self._procs:
+                if p.is_alive():
+                    p.terminate()
+                    p.join(1.0)
+            self._release()
+            raise
+        logger.info(f"LivePipeline iniciado com {self.workers} processo(s) de trabalho")
+
+    def _start(self, background: np.ndarray | None) -> None:
+        h, w, _ = self.shape
+        self.failed_frames, self.error, self._fatal = 0, None, None
+        self._shm_raw = shared_memory.SharedMemory(create=True, size=self.slots * h * w * 3)
+        self._shm_bg = shared_memory.SharedMemory(create=True, size=2 * h * w)
+        self._bg = np.ndarray((2, h, w), dtype=np.uint8, buffer=self._shm_bg.buf)
+        self._bg[:] = 0
+        if background is not None:
+            self.set_background(background)
+
+        # As filas ficam referenciadas pelo objeto até o fim: os filhos em spawn as reconstroem
+        # depois que start() retorna.
+        self._queues = free_slots, tasks, results = self._ctx.Queue(), self._ctx.Queue(), self._ctx.Queue()
+        for i in range(self.slots):
+            free_slots.put(i)
+        self._stop.clear()
+
+        self._procs = []
+        for i in range(self.workers):
+            self._procs.append(self._ctx.Process(
+                target=_worker_main, name=f"LiveWorker-{i}", daemon=True,
+                args=(self._shm_raw.name, self._shm_bg.name, self.slots, self.shape,
+                      self._bg_index, free_slots, tasks, results, self.params)
+            ))
+            self._procs[-1].start()
+        self._procs.append(self._ctx.Process(
+            target=_capture_main, name="LiveCapture", daemon=True,
+            args=(self.source, self.backend, self._shm_raw.name, self.slots, self.shape,
+                  free_slots, tasks, self.workers, self.block, self._stop, self._dropped)
+        ))
+        self._procs[-1].start()
+
+        self._collector = threading.Thread(target=self._collect, args=(results,), name="LiveCollector", daemon=True)
+        self._collector.start()
+
+    def _collect(self, results) -> None:
+        pending: dict = {}
+        failed: set = set()
+        expected, finished = 0, 0
+        workers = self._procs[:self.workers]
+        while finished < self.workers:
+            try:
+                item = results.get(timeout=0.5)
+            except queue.Empty:
+                # Um processo morto sem chegar ao finally (ex.: sinal) não publica _STOP.
+                if not any(p.is_alive() for p in workers):
+                    self._fail(None, "processos de trabalho encerrados sem aviso")
+                    break
+                continue
+            if item is _STOP:
+                finished += 1
+                continue
+            if item[0] == _FAILED:
+                _, seq, message = item
+                self._fail(seq, message)
+                if seq is not None:
+                    failed.add(seq)
+            else:
+                seq, xyz, latency, timings = item
+                for stage, seconds in timings:
+                    metrics.record(stage, seconds)
+                pending[seq] = (xyz, latency)
+            while expected in pending or expected in failed:
+                if expected in failed:
+                    failed.discard(expected)
+                else:
+                    xyz, self.last_latency = pending.pop(expected)
+                    self._deliver(expected, xyz)
+                expected += 1
+        for seq in sorted(pending):
+            self._deliver(seq, pending[seq][0])
+
+    def _fail(self, seq: int | None, message: str) -> None:
+        if seq is None:
+            logger.error(f"LivePipeline: processo de trabalho interrompido: {message}")
+            self._fatal = self._fatal or message
+        else:
+            logger.error(f"LivePipeline: falha no quadro {seq}: {message}")
+            self.failed_frames += 1
+        self.error = self.error or message
+
+    def _deliver(self, seq: int, xyz: np.ndarray) -> None:
+        self.frames_processed += 1
+        self.points_total += len(xyz)
+        t0 = time.perf_counter()
+        if self.store is not None:
+            self.store.append(xyz, frame=seq)
+        if self.grid is not None:
+            self.grid.add(xyz)
+        metrics.record("accumulation", time.perf_counter() - t0)
+        if self.on_points is not None:
+            self.on_points(seq, xyz)
+
+    def wait(self, timeout: float | None = None) -> None:
+        """
+        Aguarda o fim da fonte (útil para sessões gravadas).
+
+        Raises:
+            RuntimeError: Se um processo de trabalho foi interrompido por erro.
+        """
+        if self._collector is not None:
+            self._collector.join(timeout)
+        if self._fatal is not None:
+            raise RuntimeError(f"LivePipeline interrompido: {self._fatal}")
+
+    def _release(self) -> None:
+        self._procs = []
+        self._queues = ()
+        self._bg = None
+        for shm in (self._shm_raw, self._shm_bg):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        self._shm_raw = self._shm_bg = None
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._collector is not None:
+            self._collector.join(timeout)
+        for p in self._procs:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
+        self._release()
+        logger.info(
+            f"LivePipeline encerrado: {self.frames_processed} quadro(s), "
+            f"{self.frames_dropped} descartado(s), {self.points_total} ponto(s)"
+        )
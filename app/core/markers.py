@@ -0,0 +1,130 @@
+from typing import Dict, Iterable, Tuple
+import cv2
+import numpy as np
+from app.config.constants import (
+    ARUCO_DICT_NAME, MARKER_DETECT_SCALE, MARKER_SEARCH_MARGIN, MARKER_REFINE_WIN
+)
+
+_SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+
+
+class MarkerTracker:
+    """
+    Detector ArUco reutilizável com detecção grosseira em pirâmide e rastreio temporal.
+
+    O dicionário e o ``ArucoDetector`` são criados uma única vez. Marcadores ainda não
+    travados são procurados em uma versão reduzida do quadro e os cantos são refinados em
+    resolução cheia apenas ao redor das detecções. Depois de travado, cada marcador é
+    procurado somente em uma janela em torno da última posição conhecida.
+    """
+
+    def __init__(
+            self,
+            dict_name: str = ARUCO_DICT_NAME,
+            scale: float = MARKER_DETECT_SCALE,
+            margin: float = MARKER_SEARCH_MARGIN,
+            refine_win: int = MARKER_REFINE_WIN
+    ):
+        self.dictionary = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, dict_name))
+        self.detector   = cv2.aruco.ArucoDetector(self.dictionary, cv2.aruco.DetectorParameters())
+        self.scale      = scale
+        self.margin     = margin
+        self.refine_win = refine_win
+        self._last: Dict[int, np.ndarray] = {}
+
+    def reset(self) -> None:
+        """ Descarta os marcadores travados, forçando uma nova busca no quadro inteiro. """
+        self._last.clear()
+
+    def _detect(self, gray: np.ndarray, wanted: set | None) -> Dict[int, np.ndarray]:
+        corners, ids, _ = self.detector.detectMarkers(gray)
+        if ids is None:
+            return {}
+        return {
+            int(i): c.reshape(4, 2).astype(np.float32)
+            for i, c in zip(ids.ravel(), corners)
+            if wanted is None or int(i) in wanted
+        }
+
+    def _search_window(self, gray: np.ndarray, ids: Iterable[int]) -> Dict[int, np.ndarray]:
+        pts  = np.concatenate([self._last[i] for i in ids])
+        size = np.ptp(pts, axis=0).max() * self.margin
+        x0, y0 = np.maximum(pts.min(axis=0) - size, 0).astype(int)
+        x1, y1 = np.minimum(pts.max(axis=0) + size, (gray.shape[1], gray.shape[0])).astype(int)
+        found = self._detect(gray[y0:y1, x0:x1], set(ids))
+        offset = np.array([x0, y0], dtype=np.float32)
+        return {i: c + offset for i, c in found.items()}
+
+    def _search_coarse(self, gray: np.ndarray, wanted: set | None) -> Dict[int, np.ndarray]:
+        if self.scale >= 1.0:
+            return self._detect(gray, wanted)
+        small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        found = self._detect(small, wanted)
+        if not found:
+            # Marcadores pequenos podem desaparecer na pirâmide.
+            return self._detect(gray, wanted)
+
+        pts = np.concatenate(list(found.values())).reshape(-1, 1, 2) / self.scale
+        win = max(self.refine_win, int(round(1.0 / self.scale)) + 1)
+        cv2.cornerSubPix(gray, pts, (win, win), (-1, -1), _SUBPIX_CRITERIA)
+        pts = pts.reshape(-1, 4, 2)
+        return {i: pts[n] for n, i in enumerate(found)}
+
+    def detect(self, gray: np.ndarray, ids: Iterable[int] | None = None) -> Dict[int, np.ndarray]:
+        """
+        Detecta marcadores no quadro em tons de cinza.
+
+        Args:
+            gray (np.ndarray): Quadro em tons de cinza em resolução cheia.
+            ids (Iterable[int] | None): IDs de interesse; None aceita qualquer marcador.
+
+        Returns:
+            Dict[int, np.ndarray]: Cantos (4, 2) float32 em resolução cheia, por ID.
+        """
+        wanted = set(ids) if ids is not None else None
+        found: Dict[int, np.ndarray] = {}
+
+        locked = [i for i in (wanted or ()) if i in self._last]
+        if locked:
+            found = self._search_window(gray, locked)
+        if wanted is None or not wanted.issubset(found):
+            coarse = self._search_coarse(gray, wanted)
+            found.update({i: c for i, c in coarse.items() if i not in found})
+
+        for i in (wanted or set(self._last)) - set(found):
+            self._last.pop(i, None)
+        self._last.update(found)
+        return found
+
+    def estimate_poses(
+            self,
+            gray: np.ndarray,
+            ids: Iterable[int],
+            marker_length: float,
+            camera_matrix: np.ndarray,
+            dist_coeffs: np.ndarray
+    ) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Estima a pose somente dos marcadores solicitados.
+
+        Usa a mesma convenção de cantos de ``aruco.estimatePoseSingleMarkers``.
+
+        Returns:
+            Dict[int, Tuple[np.ndarray, np.ndarray]]: (rvec, tvec) por ID encontrado.
+        """
+        half = marker_length / 2.0
+        obj = np.array([
+            [-half,  half, 0.0],
+            [ half,  half, 0.0],
+            [ half, -half, 0.0],
+            [-half, -half, 0.0]
+        ], dtype=np.float32)
+
+        poses = {}
+        for i, corners in self.detect(gray, ids).items():
+            ok, rvec, tvec = cv2.solvePnP(
+                obj, corners, camera_matrix, dist_coeffs, flags=cv2.SOLVEPNP_IPPE_SQUARE
+            )
+            if ok:
+                poses[i] = (rvec.ravel(), tvec.ravel())
+        return poses
@@ -0,0 +1,158 @@
+"""
+Malha triangular da varredura, montada à medida que os perfis chegam.
+
+Os perfis do laser já vêm ordenados (um por posição do motor, no máximo um ponto por
+coluna da imagem), então a conectividade sai da própria ordem: cada perfil é ligado ao
+anterior coluna a coluna, sem busca de vizinhos. O ``ScanProcessor`` alimenta o
+:class:`ProfileMesher` a cada quadro e a exportação grava a malha junto com a nuvem.
+"""
+from typing import List
+import numpy as np
+from app.config.constants import FRAME_RESOLUTION, MESH_MAX_EDGE_MM, MESH_MAX_DEPTH_JUMP
+from app.core.export import export_ply
+
+
+class ProfileMesher:
+    """
+    Malha triangular construída direto dos perfis ordenados da varredura.
+
+    Cada perfil tem no máximo um ponto por coluna da imagem (ver ``laser_peaks``), e perfis
+    consecutivos são varreduras vizinhas. O perfil é espalhado em uma linha densa indexada
+    pela coluna; entre duas linhas, cada par de colunas vizinhas forma um quadrilátero
+    ``(a0, a1, b1, b0)`` dividido pela diagonal mais curta. Arestas mais longas que
+    ``max_edge`` ou com salto de profundidade (coordenada ``depth_axis``) maior que
+    ``max_depth_jump`` são rejeitadas, e só entram triângulos com as três arestas válidas.
+    Tudo é vetorizado sobre as colunas: custo O(largura) por perfil, O(N) na varredura.
+
+    :meth:`add_profile` pode ser chamado à medida que os quadros chegam; ``vertices`` e
+    ``faces`` são arrays indexados prontos para exportar.
+    """
+
+    def __init__(
+            self,
+            width: int = FRAME_RESOLUTION[0],
+            max_edge: float = MESH_MAX_EDGE_MM,
+            max_depth_jump: float = MESH_MAX_DEPTH_JUMP,
+            depth_axis: int = 2
+    ):
+        self.width = width
+        self.max_edge = max_edge
+        self.max_depth_jump = max_depth_jump
+        self.depth_axis = depth_axis
+
+        self._vertices: List[np.ndarray] = []
+        self._faces: List[np.ndarray] = []
+        self._cache: tuple | None = None
+        self.vertex_count = 0
+        self.face_count = 0
+        self.profiles = 0
+
+        # Linha densa do perfil anterior e do atual: índice global do vértice (-1 se ausente) e coordenadas.
+        self._prev_idx = np.full(width, -1, dtype=np.int64)
+        self._prev_xyz = np.full((width, 3), np.nan, dtype=np.float32)
+        self._cur_idx = np.full(width, -1, dtype=np.int64)
+        self._cur_xyz = np.full((width, 3), np.nan, dtype=np.float32)
+        self._has_prev = False
+
+    def break_strip(self) -> None:
+        """ O próximo perfil não é ligado ao anterior (ex.: mudança de sentido ou lacuna). """
+        self._has_prev = False
+
+    def _edge_ok(self, p: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """ Validade das arestas p[i]-q[i]; pontos ausentes (NaN) dão False. """
+        d = p - q
+        length2 = np.einsum("ij,ij->i", d, d)
+        with np.errstate(invalid="ignore"):
+            return (length2 <= self.max_edge ** 2) & (np.abs(d[:, self.depth_axis]) <= self.max_depth_jump)
+
+    def add_profile(self, xyz: np.ndarray, columns: np.ndarray) -> int:
+        """
+        Acrescenta um perfil e o liga ao anterior.
+
+        Args:
+            xyz (np.ndarray): Pontos (n, 3) do perfil.
+            columns (np.ndarray): Coluna da imagem (n,) de cada ponto, por exemplo
+                ``pts2d[:, 0]`` de ``laser_peaks``; colunas repetidas ficam com o último ponto.
+
+        Returns:
+            int: Triângulos criados.
+        """
+        xyz = np.asarray(xyz, dtype=np.float32).reshape(-1, 3)
+        cols = np.rint(np.asarray(columns)).astype(np.intp)
+        keep = (cols >= 0) & (cols < self.width) & np.isfinite(xyz).all(axis=1)
+        xyz, cols = xyz[keep], cols[keep]
+
+        self._cur_idx.fill(-1)
+        self._cur_xyz.fill(np.nan)
+        self._cur_idx[cols] = self.vertex_count + np.arange(len(cols))
+        self._cur_xyz[cols] = xyz
+
+        created = 0
+        if self._has_prev and len(cols):
+            faces = self._stitch(self._prev_idx, self._prev_xyz, self._cur_idx, self._cur_xyz)
+            if len(faces):
+                self._faces.append(faces)
+                self.face_count += len(faces)
+                created = len(faces)
+
+        self._vertices.append(xyz)
+        self.vertex_count += len(xyz)
+        self.profiles += 1
+        self._cache = None
+        self._prev_idx, self._cur_idx = self._cur_idx, self._prev_idx
+        self._prev_xyz, self._cur_xyz = self._cur_xyz, self._prev_xyz
+        self._has_prev = len(cols) > 0
+        return created
+
+    def _stitch(self, ia: np.ndarray, pa: np.ndarray, ib: np.ndarray, pb: np.ndarray) -> np.ndarray:
+        """ Triângulos entre a linha ``a`` (perfil anterior) e ``b`` (perfil atual). """
+        # Só colunas com algum ponto em uma das linhas interessam.
+        present = (ia >= 0) | (ib >= 0)
+        quad = np.flatnonzero(present[:-1] | present[1:])
+        if quad.size == 0:
+            return np.empty((0, 3), dtype=np.int64)
+        a0, a1, b0, b1 = ia[quad], ia[quad + 1], ib[quad], ib[quad + 1]
+        pa0, pa1, pb0, pb1 = pa[quad], pa[quad + 1], pb[quad], pb[quad + 1]
+
+        top, bottom = self._edge_ok(pa0, pa1), self._edge_ok(pb0, pb1)
+        left, right = self._edge_ok(pa0, pb0), self._edge_ok(pa1, pb1)
+        diag1, diag2 = self._edge_ok(pa0, pb1), self._edge_ok(pa1, pb0)
+
+        # Diagonal a0-b1 se for a única válida ou a mais curta das duas.
+        d1, d2 = pa0 - pb1, pa1 - pb0
+        shorter = np.einsum("ij,ij->i", d1, d1) <= np.einsum("ij,ij->i", d2, d2)
+        split1 = diag1 & (~diag2 | shorter)
+        split2 = diag2 & ~split1
+
+        candidates = (
+            (split1 & top & right,   (a0, a1, b1)),
+            (split1 & left & bottom, (a0, b1, b0)),
+            (split2 & top & left,    (a0, a1, b0)),
+            (split2 & right & bottom, (a1, b1, b0)),
+        )
+        faces = [np.column_stack(tri)[mask] for mask, tri in candidates if mask.any()]
+        return np.concatenate(faces) if faces else np.empty((0, 3), dtype=np.int64)
+
+    def _concat(self) -> tuple:
+        if self._cache is None:
+            vertices = np.concatenate(self._vertices) if self._vertices else np.empty((0, 3), dtype=np.float32)
+            faces = np.concatenate(self._faces).astype(np.int32) if self._faces else np.empty((0, 3), dtype=np.int32)
+            self._vertices, self._faces = [vertices], [faces]
+            self._cache = (vertices, faces)
+        return self._cache
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """ Vértices (V, 3) float32, na ordem de chegada. """
+        return self._concat()[0]
+
+    @property
+    def faces(self) -> np.ndarray:
+        """ Triângulos (F, 3) int32 com índices em ``vertices``. """
+        return self._concat()[1]
+
+    def export(self, path: str) -> int:
+        """ Grava a malha em PLY binário; retorna o número de triângulos. """
+        vertices, faces = self._concat()
+        export_ply(path, vertices, faces=faces)
+        return len(faces)
@@ -0,0 +1,139 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+import numpy as np
+from app.config.constants import METRICS_ENABLED, METRICS_WINDOW
+
+# Histograma com escala logarítmica de 1 µs a 10 s (8 classes por década).
+_HIST_EDGES = np.logspace(-6, 1, 7 * 8 + 1)
+_HIST_EDGES_LIST = _HIST_EDGES.tolist()
+
+STAGES = ("capture", "grayscale", "rectify", "extraction", "triangulation", "accumulation", "display")
+
+
+class StageTimer:
+    """
+    Amostras de duração de uma etapa do pipeline.
+
+    As últimas ``window`` amostras ficam em um buffer circular (de onde saem os percentis
+    recentes) e todas as amostras alimentam um histograma de classes fixas, em escala
+    logarítmica, com o histórico completo. Registrar uma amostra custa uma escrita no buffer
+    e um incremento no histograma, sob um lock.
+    """
+
+    def __init__(self, name: str, window: int = METRICS_WINDOW):
+        self.name = name
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.histogram = np.zeros(len(_HIST_EDGES) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.samples[self.count % len(self.samples)] = seconds
+            self.histogram[bisect.bisect_right(_HIST_EDGES_LIST, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def percentiles(self, q=(50, 95, 99)) -> np.ndarray:
+        """ Percentis (segundos) das amostras no buffer circular. """
+        with self._lock:
+            recent = self.samples[:min(self.count, len(self.samples))].copy()
+        if recent.size == 0:
+            return np.full(len(q), np.nan)
+        return np.percentile(recent, q)
+
+    def snapshot(self) -> dict:
+        p50, p95, p99 = self.percentiles() * 1e3
+        with self._lock:
+            count, total = self.count, self.total
+            nonzero = np.flatnonzero(self.histogram)
+            histogram = {
+                f"{_HIST_EDGES[i - 1] * 1e3 if i else 0.0:.4g}": int(self.histogram[i]) for i in nonzero
+            }
+        return {
+            "count": count,
+            "mean_ms": total / count * 1e3 if count else None,
+            "p50_ms": None if np.isnan(p50) else float(p50),
+            "p95_ms": None if np.isnan(p95) else float(p95),
+            "p99_ms": None if np.isnan(p99) else float(p99),
+            "histogram_ms": histogram,
+        }
+
+
+class Metrics:
+    """
+    Registro das etapas instrumentadas.
+
+    Nos caminhos quentes use ``t0 = time.perf_counter()`` e :meth:`record`; :meth:`time`
+    (gerenciador de contexto) é conveniente fora deles. Com ``enabled=False`` as chamadas não
+    fazem nada.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, window: int = METRICS_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.stages: Dict[str, StageTimer] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> StageTimer:
+        timer = self.stages.get(name)
+        if timer is None:
+            with self._lock:
+                timer = self.stages.setdefault(name, StageTimer(name, self.window))
+        return timer
+
+    def record(self, name: str, seconds: float) -> None:
+        if self.enabled:
+            self.stage(name).record(seconds)
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+
+    def _ordered(self):
+        known = [self.stages[s] for s in STAGES if s in self.stages]
+        return known + [t for n, t in sorted(self.stages.items()) if n not in STAGES]
+
+    def snapshot(self) -> dict:
+        return {timer.name: timer.snapshot() for timer in self._ordered()}
+
+    def dump(self, path: str | None = None) -> str:
+        """
+        Serializa :meth:`snapshot` em JSON.
+
+        Args:
+            path (str | None): Se informado, o JSON também é gravado neste arquivo.
+
+        Returns:
+            str: O JSON gerado.
+        """
+        text = json.dumps({"timestamp": time.time(), "stages": self.snapshot()}, indent=2)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def summary(self) -> str:
+        """ Linha curta com p50/p95/p99 (ms) de cada etapa, para a barra de status. """
+        parts = []
+        for timer in self._ordered():
+            if timer.count:
+                p50, p95, p99 = timer.percentiles() * 1e3
+                parts.append(f"{timer.name} {p50:.1f}/{p95:.1f}/{p99:.1f}")
+        return ("p50/p95/p99 ms: " + " · ".join(parts)) if parts else ""
+
+
+metrics = Metrics()
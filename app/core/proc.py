@@ -1,13 +1,17 @@
 import cv2
 from typing import Tuple
 import numpy as np
-from app.config.constants import FRAME_RESOLUTION
+from app.config.constants import (
+    FRAME_RESOLUTION, LASER_MIN_INTENSITY, LASER_PEAK_HALF_WINDOW, LASER_SUBPIXEL_METHOD,
+    PLANE_RANSAC_THRESHOLD, PLANE_RANSAC_ITERATIONS, PLANE_RANSAC_CHUNK
+)
 
 
 def precompute(
         camera_matrix:  np.ndarray | None,
         dist_coeffs:    np.ndarray | None,
-        orig_size: Tuple[int, int] | None
+        orig_size: Tuple[int, int] | None,
+        flip: bool = False
         ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     """
     Calcula previamente os mapas de retificação para imagens capturadas pela câmera e
@@ -17,6 +21,8 @@ def precompute(
         camera_matrix (np.ndarray): Matriz intrínseca da câmera.
         dist_coeffs (np.ndarray): Coeficientes de distorção da câmera.
         orig_size (Tuple[int, int]): Resolução original da imagem (largura, altura).
+        flip (bool): Se True, incorpora o espelhamento horizontal (equivalente a
+            ``cv2.flip(img, 1)`` após a retificação) aos mapas.
 
     Returns:
         matrix_opt (np.ndarray): Matriz de câmera otimizada.
@@ -41,6 +47,10 @@ def precompute(
     mp1, mp2 = cv2.initUndistortRectifyMap(
         k, d0, np.array([]), k_opt, FRAME_RESOLUTION, cv2.CV_16SC2
     )
+    if flip:
+        # remap é um lookup por pixel de destino: espelhar o destino é inverter as colunas dos mapas.
+        mp1 = np.ascontiguousarray(mp1[:, ::-1])
+        mp2 = np.ascontiguousarray(mp2[:, ::-1])
     return k_opt, d_opt, mp1, mp2
 
 def rectify(
@@ -60,8 +70,44 @@ def rectify(
     """
     if img is None or img.size == 0:
         raise ValueError("Imagem inválida ou vazia para retificação.")
-    tmp = cv2.resize(img, FRAME_RESOLUTION)
-    return cv2.remap(tmp, map_one, map_two, interpolation=cv2.INTER_LINEAR)
+    if (img.shape[1], img.shape[0]) != FRAME_RESOLUTION:
+        img = cv2.resize(img, FRAME_RESOLUTION)
+    return cv2.remap(img, map_one, map_two, interpolation=cv2.INTER_LINEAR)
+
+def rectify_gray(
+        map_one, map_two,
+        img: np.ndarray,
+        out: np.ndarray,
+        scratch: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Retifica a imagem diretamente em um buffer monocanal fornecido pelo chamador.
+
+    A conversão para tons de cinza é feita antes do remap, que passa a interpolar um único
+    canal. O redimensionamento só ocorre quando a imagem não está em ``FRAME_RESOLUTION``.
+    Com mapas gerados por ``precompute(..., flip=True)`` o espelhamento já sai no resultado.
+
+    Args:
+        map_one (np.ndarray): Mapa de retificação 1.
+        map_two (np.ndarray): Mapa de retificação 2.
+        img (np.ndarray): Imagem BGR ou em tons de cinza a ser retificada.
+        out (np.ndarray): Buffer de saída uint8 (altura, largura) em ``FRAME_RESOLUTION``.
+        scratch (np.ndarray | None): Buffer uint8 (altura, largura) com a resolução de ``img``
+            para a conversão em tons de cinza. Alocado a cada chamada se omitido.
+
+    Returns:
+        np.ndarray: O próprio buffer ``out``.
+    """
+    if img is None or img.size == 0:
+        raise ValueError("Imagem inválida ou vazia para retificação.")
+    if out.shape != (FRAME_RESOLUTION[1], FRAME_RESOLUTION[0]):
+        raise ValueError("Buffer de saída deve ser monocanal em FRAME_RESOLUTION.")
+
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=scratch)
+    if (img.shape[1], img.shape[0]) != FRAME_RESOLUTION:
+        img = cv2.resize(img, FRAME_RESOLUTION)
+    return cv2.remap(img, map_one, map_two, interpolation=cv2.INTER_LINEAR, dst=out)
 
 '''
 def detect_aruco_pose(
@@ -124,11 +170,102 @@ def laser_skeleton(bg: np.ndarray, fg: np.ndarray) -> np.ndarray:
     mop = cv2.morphologyEx(mor, cv2.MORPH_OPEN, ker)
     return cv2.ximgproc.thinning(mop)
 
-def laser_skeleton_roi(bg: np.ndarray, fg: np.ndarray, roi_mask) -> np.ndarray:
-    diff = cv2.absdiff(bg, fg)
-    diff_roi = cv2.bitwise_and(diff, diff, mask=roi_mask)
-    _, th = cv2.threshold(diff_roi, 20, 255, cv2.THRESH_BINARY)
-    return th
+def laser_peaks(
+        bg: np.ndarray,
+        fg: np.ndarray,
+        min_intensity: int = LASER_MIN_INTENSITY,
+        half_window: int = LASER_PEAK_HALF_WINDOW,
+        method: str = LASER_SUBPIXEL_METHOD,
+        mask: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Localiza o centro da linha laser em cada coluna da imagem com precisão sub-pixel.
+
+    Substitui a cadeia Otsu/morfologia/thinning de ``laser_skeleton``: a diferença
+    ``fg - bg`` é reduzida por coluna com um argmax e o pico é refinado por centro de
+    massa (``"com"``) ou por ajuste gaussiano/parabólico em três pontos.
+
+    Args:
+        bg (np.ndarray): Quadro com o laser desligado (BGR ou tons de cinza).
+        fg (np.ndarray): Quadro com o laser ligado, mesmo formato de ``bg``.
+        min_intensity (int): Intensidade mínima do pico para que a coluna seja aceita.
+        half_window (int): Meia janela (em linhas) usada pelo centro de massa.
+        method (str): ``"com"``, ``"gaussian"`` ou ``"parabolic"``.
+        mask (np.ndarray | None): Máscara uint8 (0/255) opcional limitando a busca.
+
+    Returns:
+        np.ndarray: Pontos (N, 2) float32 no formato (x, y), prontos para ``backproject``.
+    """
+    diff = cv2.absdiff(fg, bg)
+    if diff.ndim == 3:
+        diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+    if mask is not None:
+        cv2.bitwise_and(diff, mask, dst=diff)
+
+    height, width = diff.shape
+    cols = np.arange(width)
+    rows = diff.argmax(axis=0)
+    valid = diff[rows, cols] >= min_intensity
+    cols, rows = cols[valid], rows[valid]
+    if cols.size == 0:
+        return np.empty((0, 2), dtype=np.float32)
+
+    if method == "com":
+        # Linhas da janela fora da imagem têm peso zero (em vez de repetir a borda); sem peso
+        # nenhum (min_intensity=0 em coluna vazia) fica o argmax.
+        win = rows[:, None] + np.arange(-half_window, half_window + 1)
+        w = diff[np.clip(win, 0, height - 1), cols[:, None]].astype(np.float32)
+        w[(win < 0) | (win >= height)] = 0.0
+        total = w.sum(axis=1)
+        y = rows.astype(np.float64)
+        np.divide((w * win).sum(axis=1), total, out=y, where=total > 0)
+    elif method in ("gaussian", "parabolic"):
+        a = diff[np.maximum(rows - 1, 0), cols].astype(np.float32)
+        b = diff[rows, cols].astype(np.float32)
+        c = diff[np.minimum(rows + 1, height - 1), cols].astype(np.float32)
+        if method == "gaussian":
+            a, b, c = np.log1p(a), np.log1p(b), np.log1p(c)
+        den = a - 2.0 * b + c
+        # Na primeira/última linha falta um vizinho: o pico fica na linha inteira, sem
+        # extrapolar meio pixel para fora da imagem.
+        inner = (rows > 0) & (rows < height - 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delta = np.where(inner & (den < 0.0), 0.5 * (a - c) / den, 0.0)
+        y = rows + np.clip(delta, -0.5, 0.5)
+    else:
+        raise ValueError(f"Método sub-pixel desconhecido: {method}")
+
+    return np.column_stack((cols, y)).astype(np.float32)
+
+def laser_peaks_roi(
+        bg: np.ndarray,
+        fg: np.ndarray,
+        rect: Tuple[int, int, int, int],
+        mask: np.ndarray | None = None,
+        **kwargs
+) -> np.ndarray:
+    """
+    Executa ``laser_peaks`` apenas dentro do retângulo da ROI e devolve os pontos em
+    coordenadas da imagem completa.
+
+    Os recortes são views de ``bg``/``fg``: diferença, limiar e extração de picos operam só
+    sobre a área da ROI, sem cópias do quadro inteiro.
+
+    Args:
+        bg (np.ndarray): Quadro com o laser desligado.
+        fg (np.ndarray): Quadro com o laser ligado.
+        rect (Tuple[int, int, int, int]): Retângulo (x, y, w, h) da ROI, ver ``utils.roi_rect``.
+        mask (np.ndarray | None): Máscara do polígono no tamanho do recorte, ver ``utils.roi_crop_mask``.
+        **kwargs: Parâmetros repassados a ``laser_peaks``.
+
+    Returns:
+        np.ndarray: Pontos (N, 2) float32 no formato (x, y) da imagem completa.
+    """
+    x, y, w, h = rect
+    pts = laser_peaks(bg[y:y + h, x:x + w], fg[y:y + h, x:x + w], mask=mask, **kwargs)
+    pts[:, 0] += x
+    pts[:, 1] += y
+    return pts
 
 def fit_laser_line(skel: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     pts = cv2.findNonZero(skel)
@@ -167,10 +304,138 @@ def backproject(pts2d: np.ndarray, plane: np.ndarray, k_opt: np.ndarray) -> np.n
 def camera_to_board(
         pts_cam: np.ndarray, rvec: np.ndarray, tvec: np.ndarray
 ) -> np.ndarray:
-    r, _ = cv2.Rodrigues(rvec)
+    # Aceita a matriz de rotação já calculada para evitar um Rodrigues a cada chamada.
+    r = rvec if rvec.shape == (3, 3) else cv2.Rodrigues(rvec)[0]
     shifted = pts_cam - tvec.reshape(1, 3)
     return (r.T @ shifted.T).T
 
+def rodrigues_batch(rvecs: np.ndarray) -> np.ndarray:
+    """
+    Versão vetorizada de ``cv2.Rodrigues`` para um lote de vetores de rotação.
+
+    Args:
+        rvecs (np.ndarray): Vetores de rotação (F, 3).
+
+    Returns:
+        np.ndarray: Matrizes de rotação (F, 3, 3) no mesmo dtype de ponto flutuante da entrada.
+    """
+    rvecs = np.asarray(rvecs).reshape(-1, 3)
+    if not np.issubdtype(rvecs.dtype, np.floating):
+        rvecs = rvecs.astype(np.float64)
+    theta = np.linalg.norm(rvecs, axis=1)
+    small = theta < 1e-12
+    k = rvecs / np.where(small, 1.0, theta)[:, None]
+
+    kx, ky, kz = k[:, 0], k[:, 1], k[:, 2]
+    zero = np.zeros_like(kx)
+    skew = np.stack([
+        zero, -kz,   ky,
+        kz,   zero, -kx,
+        -ky,  kx,   zero
+    ], axis=1).reshape(-1, 3, 3)
+
+    sin = np.sin(theta)[:, None, None]
+    cos = np.cos(theta)[:, None, None]
+    eye = np.eye(3, dtype=rvecs.dtype)
+    r = eye + sin * skew + (1.0 - cos) * (skew @ skew)
+    r[small] = eye
+    return r
+
+def _frame_maps(
+        planes: np.ndarray,
+        k_opt: np.ndarray,
+        rvecs: np.ndarray | None,
+        tvecs: np.ndarray | None
+) -> np.ndarray:
+    """
+    Coeficientes (F, 15) float32 do mapa pixel -> ponto 3D de cada quadro.
+
+    Com ``q = (u, v, 1)``, o ponto no plano ``(n, d)`` é ``p = -d K⁻¹q / (n·K⁻¹q)`` e, na
+    pose ``(R, t)``, ``Rᵀ(p - t) = M q / (w·q) + e`` com ``M = -d RᵀK⁻¹``, ``w = nᵀK⁻¹`` e
+    ``e = -Rᵀt``: colunas 0-8 são ``M`` (por linha), 9-11 ``w`` e 12-14 ``e``. Calculados
+    em float64 e convertidos uma vez por quadro.
+    """
+    planes = np.asarray(planes, dtype=np.float64).reshape(-1, 4)
+    k_inv = np.linalg.inv(np.asarray(k_opt, dtype=np.float64))
+    maps = np.zeros((len(planes), 15))
+    maps[:, 9:12] = planes[:, :3] @ k_inv
+    if rvecs is None:
+        maps[:, :9] = (-planes[:, 3, None, None] * k_inv).reshape(-1, 9)
+    else:
+        rvecs = np.asarray(rvecs, dtype=np.float64)
+        rt = (rvecs if rvecs.ndim == 3 else rodrigues_batch(rvecs)).transpose(0, 2, 1)
+        maps[:, :9] = (-planes[:, 3, None, None] * (rt @ k_inv)).reshape(-1, 9)
+        maps[:, 12:] = -(rt @ np.asarray(tvecs, dtype=np.float64).reshape(-1, 3, 1))[..., 0]
+    return maps.astype(np.float32)
+
+def backproject_batch(
+        pts2d: np.ndarray,
+        offsets: np.ndarray,
+        planes: np.ndarray,
+        k_opt: np.ndarray,
+        rvecs: np.ndarray | None = None,
+        tvecs: np.ndarray | None = None,
+        out: np.ndarray | None = None,
+        block: int = 1 << 15
+) -> np.ndarray:
+    """
+    Triangula e transforma os pontos de vários quadros de uma só vez, em float32.
+
+    Equivale a chamar ``backproject`` e ``camera_to_board`` para cada quadro. Plano,
+    intrínsecos e pose de cada quadro são combinados em um único mapa projetivo
+    (``_frame_maps``), cujos 15 coeficientes são expandidos por ponto com ``np.repeat`` e
+    aplicados com operações vetorizadas. O lote é percorrido em blocos de quadros com cerca
+    de ``block`` pontos, para que os coeficientes expandidos e os temporários caibam em cache.
+    O desvio em relação ao caminho float64 é medido em ``app.sim.bench``.
+
+    Args:
+        pts2d (np.ndarray): Pontos (N, 2) de todos os quadros concatenados.
+        offsets (np.ndarray): Índices (F + 1,) delimitando os pontos de cada quadro:
+            o quadro f ocupa ``pts2d[offsets[f]:offsets[f + 1]]``.
+        planes (np.ndarray): Planos do laser (F, 4) no referencial da câmera.
+        k_opt (np.ndarray): Matriz de câmera otimizada.
+        rvecs (np.ndarray | None): Rotações (F, 3) ou matrizes (F, 3, 3) da pose de cada quadro.
+            Se None, os pontos ficam no referencial da câmera.
+        tvecs (np.ndarray | None): Translações (F, 3) da pose de cada quadro.
+        out (np.ndarray | None): Buffer (N, 3) float32 pré-alocado para o resultado.
+        block (int): Pontos aproximados por bloco.
+
+    Returns:
+        np.ndarray: Pontos 3D (N, 3) float32.
+    """
+    offsets = np.asarray(offsets)
+    n = int(offsets[-1])
+    if pts2d.shape[0] != n:
+        raise ValueError("offsets não correspondem ao número de pontos.")
+    if out is None:
+        out = np.empty((n, 3), dtype=np.float32)
+    elif out.shape != (n, 3) or out.dtype != np.float32:
+        raise ValueError("Buffer de saída deve ser (N, 3) float32.")
+    if n == 0:
+        return out
+
+    counts = np.diff(offsets)
+    maps = _frame_maps(planes, k_opt, rvecs, tvecs)
+    uv = pts2d.T.astype(np.float32, order="C")
+    # Quadros em que começa cada bloco; um quadro maior que o bloco fica sozinho.
+    firsts = np.unique(np.searchsorted(offsets, np.arange(0, n, block), side="right") - 1)
+    for f0, f1 in zip(firsts, np.append(firsts[1:], len(counts))):
+        s0, s1 = offsets[f0], offsets[f1]
+        c = np.repeat(maps[f0:f1].T, counts[f0:f1], axis=1)
+        u, v = uv[0, s0:s1], uv[1, s0:s1]
+        den = c[9] * u
+        den += c[10] * v
+        den += c[11]
+        np.reciprocal(den, out=den)
+        for j in range(3):
+            col = c[3 * j] * u
+            col += c[3 * j + 1] * v
+            col += c[3 * j + 2]
+            col *= den
+            col += c[12 + j]
+            out[s0:s1, j] = col
+    return out
+
 def fit_line_from_points(points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     """
     Ajusta uma reta 3D via PCA. Retorna direção normalizada + ponto médio.
@@ -181,3 +446,102 @@ def fit_line_from_points(points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     direction = vecs[:, np.argmax(vals)]
     direction /= np.linalg.norm(direction)
     return direction, centroid
+
+def fit_plane_svd(points: np.ndarray) -> np.ndarray:
+    """
+    Plano de mínimos quadrados totais: normal = vetor singular de menor valor dos pontos
+    centrados.
+
+    Returns:
+        np.ndarray: Plano (a, b, c, d) com normal unitária.
+    """
+    pts = np.asarray(points, dtype=np.float64)
+    centroid = pts.mean(axis=0)
+    _, _, vt = np.linalg.svd(pts - centroid, full_matrices=False)
+    return plane_from_np(vt[-1], centroid)
+
+def fit_plane_ransac(
+        points: np.ndarray,
+        threshold: float = PLANE_RANSAC_THRESHOLD,
+        iterations: int = PLANE_RANSAC_ITERATIONS,
+        confidence: float = 0.999,
+        chunk: int = PLANE_RANSAC_CHUNK,
+        refine: int = 2,
+        seed: int | None = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ajusta um plano robusto a uma nuvem (N, 3) com RANSAC vetorizado.
+
+    As hipóteses (planos por três pontos sorteados) são geradas de uma vez e pontuadas
+    contra todos os pontos com um produto de matrizes (H, 4) x (4, N) em coordenadas
+    homogêneas e float32, em blocos de no máximo ``chunk`` elementos. Após cada bloco o
+    número de hipóteses necessário para ``confidence`` é reestimado a partir da melhor taxa
+    de inliers, encerrando o sorteio cedo quando o plano domina a nuvem. O melhor consenso é
+    refinado por SVD sobre os inliers, ``refine`` vezes, recalculando os inliers a cada passo.
+
+    Args:
+        points (np.ndarray): Pontos (N, 3).
+        threshold (float): Distância máxima ao plano para um inlier (unidade dos pontos).
+        iterations (int): Número máximo de hipóteses.
+        confidence (float): Probabilidade desejada de sortear ao menos uma amostra só de inliers.
+        chunk (int): Elementos por bloco da matriz de distâncias.
+        refine (int): Passos de refinamento por SVD.
+        seed (int | None): Semente do sorteio.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Plano (a, b, c, d) com normal unitária e máscara
+        booleana (N,) dos inliers sobre ``points``.
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    finite = np.isfinite(pts).all(axis=1)
+    valid = pts[finite]
+    n = len(valid)
+    if n < 3:
+        raise RuntimeError("Poucos pontos para ajustar um plano")
+
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, n, (iterations, 3))
+    p0, p1, p2 = valid[idx[:, 0]], valid[idx[:, 1]], valid[idx[:, 2]]
+    normals = np.cross(p1 - p0, p2 - p0)
+    norm = np.linalg.norm(normals, axis=1)
+    ok = norm > 1e-9
+    if not ok.any():
+        raise RuntimeError("Pontos degenerados (colineares) para ajuste de plano")
+    normals = normals[ok] / norm[ok, None]
+    offsets = -(normals * p0[ok]).sum(axis=1)
+
+    # Pontos centrados (precisão em float32) e homogêneos: a distância sai direto do produto.
+    center = valid.mean(axis=0)
+    homog = np.ones((4, n), dtype=np.float32)
+    homog[:3] = (valid - center).T
+    hyp = np.column_stack((normals, offsets + normals @ center)).astype(np.float32)
+
+    best, best_score = 0, -1
+    needed = len(hyp)
+    step = max(1, chunk // n)
+    for i in range(0, len(hyp), step):
+        dist = hyp[i:i + step] @ homog
+        np.abs(dist, out=dist)
+        scores = np.count_nonzero(dist <= threshold, axis=1)
+        j = int(scores.argmax())
+        if scores[j] > best_score:
+            best, best_score = i + j, int(scores[j])
+            w = best_score / n
+            if w >= 1.0:
+                needed = 0
+            elif w > 0.0:
+                needed = int(np.ceil(np.log(1.0 - confidence) / np.log(1.0 - w ** 3)))
+        if i + step >= needed:
+            break
+
+    plane = np.hstack((normals[best], offsets[best]))
+    inliers = np.abs(valid @ plane[:3] + plane[3]) <= threshold
+    for _ in range(refine):
+        if inliers.sum() < 3:
+            break
+        plane = fit_plane_svd(valid[inliers])
+        inliers = np.abs(valid @ plane[:3] + plane[3]) <= threshold
+
+    mask = np.zeros(len(pts), dtype=bool)
+    mask[finite] = inliers
+    return plane, mask
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple
+import numpy as np
+from app.config.constants import FRAME_RESOLUTION, RECTIFY_CACHE_DIR, RECTIFY_CACHE_ENTRIES
+from app.config.logger import logger
+from app.core.proc import precompute
+
+
+def calibration_key(
+        camera_matrix: np.ndarray,
+        dist_coeffs: np.ndarray,
+        orig_size: Tuple[int, int],
+        flip: bool = False
+) -> str:
+    """ Hash SHA-1 dos parâmetros que determinam os mapas de retificação. """
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(camera_matrix, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(np.ravel(dist_coeffs), dtype=np.float64).tobytes())
+    h.update(np.array([*orig_size, *FRAME_RESOLUTION, int(flip)], dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+class RectifyMapCache:
+    """
+    Cache dos resultados de :func:`precompute` indexado por :func:`calibration_key`.
+
+    As entradas ficam em memória (LRU com ``max_entries`` itens) e em ``directory``: a matriz
+    otimizada em ``<chave>.npz`` e cada mapa em ``<chave>_map1.npy``/``<chave>_map2.npy``,
+    reabertos com ``mmap_mode="r"``. Reconectar ou reiniciar o programa com a mesma
+    calibração não recalcula os mapas, e as páginas só são lidas do disco quando o
+    ``remap`` as toca. Os mapas devolvidos são somente leitura.
+    """
+
+    def __init__(self, directory: str | None = RECTIFY_CACHE_DIR, max_entries: int = RECTIFY_CACHE_ENTRIES):
+        self.directory = directory
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, key: str) -> Tuple[str, str, str]:
+        base = os.path.join(self.directory, key)
+        return f"{base}.npz", f"{base}_map1.npy", f"{base}_map2.npy"
+
+    def _load(self, key: str):
+        if self.directory is None:
+            return None
+        meta_path, map1_path, map2_path = self._paths(key)
+        if not all(os.path.exists(p) for p in (meta_path, map1_path, map2_path)):
+            return None
+        try:
+            with np.load(meta_path) as meta:
+                k_opt, d_opt = meta["k_opt"], meta["d_opt"]
+            return k_opt, d_opt, np.load(map1_path, mmap_mode="r"), np.load(map2_path, mmap_mode="r")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Mapas de retificação em cache ignorados ({key}): {e}")
+            return None
+
+    def _store(self, key: str, entry) -> None:
+        if self.directory is None:
+            return
+        k_opt, d_opt, map1, map2 = entry
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Os mapas são gravados antes do .npz: a entrada só é válida quando este existe.
+            for path, data in zip(self._paths(key)[1:], (map1, map2)):
+                tmp = f"{path}.tmp.npy"
+                np.save(tmp, data)
+                os.replace(tmp, path)
+            meta_path = self._paths(key)[0]
+            tmp = f"{meta_path}.tmp.npz"
+            np.savez(tmp, k_opt=k_opt, d_opt=d_opt)
+            os.replace(tmp, meta_path)
+        except OSError as e:
+            logger.warning(f"Falha ao gravar mapas de retificação em cache: {e}")
+
+    def get(
+            self,
+            camera_matrix: np.ndarray,
+            dist_coeffs: np.ndarray,
+            orig_size: Tuple[int, int],
+            flip: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Mesmo resultado de ``precompute(camera_matrix, dist_coeffs, orig_size, flip)``.
+
+        Args:
+            camera_matrix (np.ndarray): Matriz intrínseca original (não otimizada).
+            dist_coeffs (np.ndarray): Coeficientes de distorção originais.
+            orig_size (Tuple[int, int]): Resolução da calibração (largura, altura).
+            flip (bool): Espelhamento horizontal incorporado aos mapas.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: ``k_opt``, ``d_opt``,
+            ``map_one`` e ``map_two``.
+        """
+        if camera_matrix is None or dist_coeffs is None or orig_size is None:
+            raise ValueError("Matriz da câmera, resolução ou coeficientes de distorção não fornecidos.")
+        key = calibration_key(camera_matrix, dist_coeffs, orig_size, flip)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            entry = self._load(key)
+            if entry is None:
+                self.misses += 1
+                entry = precompute(camera_matrix, dist_coeffs, orig_size, flip=flip)
+                self._store(key, entry)
+                entry = self._load(key) or entry
+                logger.info(f"Mapas de retificação calculados ({key[:12]})")
+            else:
+                self.hits += 1
+
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache: RectifyMapCache | None = None
+
+
+def get_map_cache() -> RectifyMapCache:
+    global _cache
+    if _cache is None:
+        _cache = RectifyMapCache()
+    return _cache
@@ -4,7 +4,12 @@ from numpy import ndarray
 from pyfirmata2 import Arduino, util
 import logging
 from app.config.exceptions import CameraReadError
-from app.core.proc import precompute, rectify
+from app.core.proc import rectify
+from app.core.rectify_cache import get_map_cache
+from app.core.capture import FrameGrabber
+from app.core.session import SessionRecorder, SessionReplay
+from app.core.utils import roi_rect, roi_crop_mask
+from app.config.constants import CAMERA_WIDTH, CAMERA_HEIGHT, CAPTURE_POLICY
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -18,15 +23,28 @@ class Scanner:
         self.calibration_file:    str | None = None
         self.camera_matrix:   ndarray | None = None
         self.dist_coeffs:     ndarray | None = None
+        self.image_size: tuple[int, int] | None = None
+        self.k_opt:           ndarray | None = None
         self.plane_constants: ndarray | None = None
+        self.axis_origin:     ndarray | None = None
+        self.axis_direction:  ndarray | None = None
         self.map_one:         ndarray | None = None
         self.map_two:         ndarray | None = None
+        self.roi_rect: tuple[int, int, int, int] | None = None
+        self.roi_mask:        ndarray | None = None
 
         self.firmata_connected = False
         self.firmata_instance  = None
 
         self.camera_connected  = False
         self.camera_instance   = None
+        self.camera_backend    = cv2.CAP_ANY
+        self.grabber           = None
+        self.capture_policy    = CAPTURE_POLICY
+        self.recorder          = None
+        self._live_policy      = None
+        self.stepper_position  = 0
+        self.laser_on          = False
         self.lock = False
 
     def set_calibration(self, file_path):
@@ -40,12 +58,58 @@ class Scanner:
                 raise ValueError("Arquivo de calibração não contém camera_matrix ou dist_coeffs")
             self.camera_matrix = np.asarray(cm, dtype=np.float64)
             self.dist_coeffs = np.asarray(dc).ravel().astype(np.float64)
-            self.camera_matrix, self.dist_coeffs, self.map_one, self.map_two = precompute(
-                self.camera_matrix, self.dist_coeffs, (1280, 720)
-            )
+            size = calib_data.get("image_size")
+            self.image_size = (int(size[0]), int(size[1])) if size is not None else None
+            self._load_maps()
         except Exception as e:
             raise RuntimeError(f"Falha ao carregar arquivo de calibração: {e}")
 
+    @property
+    def calibration_size(self) -> tuple[int, int]:
+        """ Resolução (largura, altura) das imagens da calibração; a da câmera se não gravada. """
+        return self.image_size or (CAMERA_WIDTH, CAMERA_HEIGHT)
+
+    def _load_maps(self):
+        """
+        Obtém do cache os mapas de retificação da calibração original. ``camera_matrix`` e
+        ``dist_coeffs`` continuam sendo os valores calibrados, na resolução ``image_size``
+        das imagens da calibração; ``k_opt`` é a matriz das imagens já retificadas (sem
+        distorção) em ``FRAME_RESOLUTION``.
+        """
+        self.k_opt, _, self.map_one, self.map_two = get_map_cache().get(
+            self.camera_matrix, self.dist_coeffs, self.calibration_size
+        )
+
+    def set_roi(self, polygon, frame_shape=(CAMERA_HEIGHT, CAMERA_WIDTH)):
+        """ Recorte e máscara da ROI, calculados uma vez por pose de referência. """
+        self.roi_rect = roi_rect(polygon, frame_shape) if polygon is not None else None
+        self.roi_mask = roi_crop_mask(polygon, self.roi_rect) if self.roi_rect is not None else None
+
+    def start_recording(self, path):
+        """ Passa a gravar os quadros brutos dos geradores em uma sessão em ``path``. """
+        self.stop_recording()
+        self.recorder = SessionRecorder(path, self.camera_matrix, self.dist_coeffs, image_size=self.image_size)
+
+    def load_session(self, path):
+        """
+        Usa uma sessão gravada como câmera, entregando todos os quadros em ordem. A política
+        de captura anterior volta quando a sessão é liberada (``release_camera``).
+        """
+        self.release_camera()
+        self.camera_instance = SessionReplay(path)
+        self._live_policy = self.capture_policy
+        self.capture_policy = FrameGrabber.BLOCK
+        if self.camera_instance.camera_matrix is not None:
+            self.camera_matrix = self.camera_instance.camera_matrix
+            self.dist_coeffs = self.camera_instance.dist_coeffs
+            self.image_size = self.camera_instance.image_size
+            self._load_maps()
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
     def load_firmata(self):
         self.lock = True
         # noinspection PyBroadException
@@ -68,7 +132,7 @@ class Scanner:
         self.camera_instance, cap = None, None
 
         cam_index = getattr(self, "camera_index", 0)
-        cap = cv2.VideoCapture(cam_index)
+        cap = cv2.VideoCapture(cam_index, self.camera_backend)
         feedback_cb(text="Câmera conectada! Verificando...")
         if not cap.isOpened():
             raise CameraReadError("Erro ao inicializar camera")
@@ -108,4 +172,5 @@ class Scanner:
                 else:
                     logger.debug("Objeto cap não possui método release().")
             finally:
-                pass
+                if isinstance(self.camera_instance, SessionReplay) and self._live_policy is not None:
+                    self.capture_policy, self._live_policy = self._live_policy, None
@@ -0,0 +1,264 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, List
+import cv2
+import numpy as np
+from app.config.constants import (
+    CAMERA_WIDTH, CAMERA_HEIGHT, LSR_PIN_STR, DIR_PIN_STR, STP_PIN_STR,
+    STEP_PULSE_DELAY, SETTLE_THRESHOLD, SETTLE_FRAMES, SETTLE_TIMEOUT
+)
+from app.config.logger import logger
+from app.core.background import BackgroundModel
+from app.core.capture import FrameGrabber
+from app.core.generator import _record
+from app.core.scanner_config import Scanner
+
+
+class ScanScheduler:
+    """
+    Escaneamento "para e vai" em pipeline.
+
+    Em cada posição o escalonador captura o par de quadros laser desligado/ligado e, assim
+    que o par está capturado, já começa a mover o motor para a próxima posição enquanto o
+    par é processado em outra thread. A espera fixa de ``LASER_TOGGLE_DELAY`` é substituída
+    por detecção de estabilização: após cada comando (laser ou motor) são aceitos apenas
+    quadros entregues pela câmera depois do comando, e o quadro é usado quando a maior
+    diferença entre quadros consecutivos, reduzidos a médias de blocos 8x8 (o que atenua o
+    ruído do sensor sem esconder a linha laser), fica abaixo de ``threshold``.
+
+    Quadros antigos ainda no buffer do driver são iguais entre si e passariam por estáveis;
+    por isso, antes da verificação de estabilidade, exige-se uma mudança maior que
+    ``threshold`` em relação ao último quadro aceito, anterior ao comando. Essa comparação
+    usa blocos 4x4, finos o bastante para enxergar a linha andar um ou dois pixels. A mudança é
+    exigida após trocar o laser e após mover o motor com o laser ligado (a linha se
+    desloca); ``require_change_on_move=False`` dispensa o segundo caso quando o passo pode
+    não alterar a imagem (ex.: objeto simétrico em mesa giratória, ou passos tão curtos que
+    a linha mal se move). Sem mudança até
+    ``timeout``, o quadro mais recente é usado e conta em ``settle_timeouts``.
+
+    Com ``gate``, cada posição só é capturada depois que ``gate(k, quadro)`` devolve True;
+    até lá a função recebe os quadros ao vivo (ex.: para mostrá-los enquanto o usuário
+    reposiciona o tabuleiro e confirma a pose). A estabilização conta a partir da liberação.
+
+    Com uma sessão em gravação (``Scanner.start_recording``), cada quadro aceito é gravado
+    com o estado do laser e a posição do motor, e a sessão pode ser reprocessada com
+    ``python -m app.offline``.
+
+    Cada posição começa pelo estado atual do laser, de modo que há no máximo uma troca por
+    posição. Com um :class:`BackgroundModel` o quadro com laser desligado só é capturado
+    quando o modelo pede (a cada ``spacing`` passos ou após mudança no fundo); nas demais
+    posições o laser fica ligado e basta uma captura por passo.
+    """
+
+    def __init__(
+            self,
+            scanner: Scanner,
+            process: Callable[[np.ndarray, np.ndarray, int], Any],
+            positions: int,
+            steps_per_position: int = 1,
+            threshold: float = SETTLE_THRESHOLD,
+            settle_frames: int = SETTLE_FRAMES,
+            timeout: float = SETTLE_TIMEOUT,
+            max_inflight: int = 2,
+            on_result: Callable[[int, Any], None] | None = None,
+            background: BackgroundModel | None = None,
+            require_change_on_move: bool = True,
+            gate: Callable[[int, np.ndarray], bool] | None = None
+    ):
+        if scanner.camera_instance is None or scanner.firmata_instance is None:
+            raise RuntimeError("Câmera e Firmata precisam estar conectadas.")
+        self.scanner = scanner
+        self.process = process
+        self.positions = positions
+        self.steps_per_position = steps_per_position
+        self.threshold = threshold
+        self.settle_frames = settle_frames
+        self.timeout = timeout
+        self.max_inflight = max(1, max_inflight)
+        self.on_result = on_result
+        self.background = background
+        self.require_change_on_move = require_change_on_move
+        self.gate = gate
+
+        board = scanner.firmata_instance
+        self._laser = board.get_pin(LSR_PIN_STR)
+        self._dir = board.get_pin(DIR_PIN_STR)
+        self._step = board.get_pin(STP_PIN_STR)
+
+        shape = (CAMERA_HEIGHT, CAMERA_WIDTH, 3)
+        self._thumb_size = (CAMERA_WIDTH // 8, CAMERA_HEIGHT // 8)
+        self._change_size = (CAMERA_WIDTH // 4, CAMERA_HEIGHT // 4)
+        self._pairs = [
+            (np.empty(shape, dtype=np.uint8), np.empty(shape, dtype=np.uint8))
+            for _ in range(self.max_inflight + 1)
+        ]
+        self._last_change = 0.0
+        self._last_sample: np.ndarray | None = None   # último quadro aceito, em blocos 4x4
+        self._expect_change = False
+        self.settle_timeouts = 0
+        self.captures = 0
+        self.elapsed = 0.0
+
+    def _set_laser(self, on: bool) -> None:
+        if self.scanner.laser_on == on:
+            return
+        self._laser.write(1 if on else 0)
+        self.scanner.laser_on = on
+        self._last_change = time.perf_counter()
+        self._expect_change = True
+
+    def _move(self, steps: int) -> None:
+        if steps == 0:
+            return
+        self._dir.write(1 if steps >= 0 else 0)
+        for _ in range(abs(steps)):
+            self._step.write(1)
+            time.sleep(STEP_PULSE_DELAY)
+            self._step.write(0)
+            time.sleep(STEP_PULSE_DELAY)
+        self.scanner.stepper_position += steps
+        self._last_change = time.perf_counter()
+        self._expect_change = self._expect_change or (self.require_change_on_move and self.scanner.laser_on)
+
+    def _capture_settled(self, grabber: FrameGrabber, dst: np.ndarray) -> None:
+        """
+        Copia para ``dst`` o primeiro quadro estável obtido após o último comando e, se o
+        comando deve alterar a imagem, depois de ela ter mudado em relação ao último
+        quadro aceito.
+        """
+        since = self._last_change
+        deadline = time.perf_counter() + self.timeout
+        reference = self._last_sample if self._expect_change else None
+        changed = reference is None
+        prev, stable = None, 0
+        while True:
+            slot = grabber.get(timeout=self.timeout)
+            if slot is None:
+                if time.perf_counter() > deadline:
+                    raise RuntimeError("Sem quadros da câmera durante o escaneamento.")
+                continue
+            idx, frame = slot
+            try:
+                if grabber.timestamps[idx] < since:
+                    continue
+                if not changed:
+                    fine = cv2.resize(frame, self._change_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+                    changed = np.abs(fine - reference).max() >= self.threshold
+                sample = cv2.resize(frame, self._thumb_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+                if changed:
+                    if prev is not None and np.abs(sample - prev).max() < self.threshold:
+                        stable += 1
+                    else:
+                        stable = 0
+                    prev = sample
+                timed_out = time.perf_counter() > deadline
+                if stable >= self.settle_frames or timed_out:
+                    if timed_out:
+                        self.settle_timeouts += 1
+                        logger.debug(
+                            "Estabilização não detectada dentro do tempo limite" if changed else
+                            "Imagem inalterada após o comando dentro do tempo limite"
+                        )
+                    np.copyto(dst, frame)
+                    # laser_on e stepper_position já refletem o último comando.
+                    _record(self.scanner, frame)
+                    self._last_sample = cv2.resize(frame, self._change_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+                    self._expect_change = False
+                    self.captures += 1
+                    return
+            finally:
+                grabber.release(idx)
+
+    def _wait_gate(self, grabber: FrameGrabber, k: int, stop_event: threading.Event | None) -> bool:
+        """ Repassa quadros a ``gate`` até a liberação da posição ``k``; False se interrompido. """
+        while stop_event is None or not stop_event.is_set():
+            slot = grabber.get(timeout=self.timeout)
+            if slot is None:
+                continue
+            idx, frame = slot
+            try:
+                released = self.gate(k, frame)
+            finally:
+                grabber.release(idx)
+            if released:
+                self._last_change = time.perf_counter()
+                return stop_event is None or not stop_event.is_set()
+        return False
+
+    def _capture_position(self, grabber: FrameGrabber, position: int, bg: np.ndarray, fg: np.ndarray) -> None:
+        model = self.background
+        if model is not None and not model.needs_capture(position):
+            self._set_laser(True)
+            self._capture_settled(grabber, fg)
+            if not model.check_drift(position, fg):
+                np.copyto(bg, model.get(position))
+                return
+            # Fundo obsoleto: captura o quadro desligado desta posição e segue com o mesmo fg.
+            self._set_laser(False)
+            self._capture_settled(grabber, bg)
+            model.update(position, bg)
+            return
+
+        order = (True, False) if self.scanner.laser_on else (False, True)
+        for on in order:
+            self._set_laser(on)
+            self._capture_settled(grabber, fg if on else bg)
+        if model is not None:
+            model.update(position, bg)
+
+    def run(self, stop_event: threading.Event | None = None) -> List[Any]:
+        """
+        Executa a varredura e devolve os resultados de ``process`` na ordem das posições.
+        """
+        grabber = FrameGrabber(self.scanner.camera_instance)
+        self.scanner.grabber = grabber
+        results: List[Any] = []
+        pending: deque[tuple[int, Future]] = deque()
+
+        def collect():
+            position, future = pending.popleft()
+            result = future.result()
+            results.append(result)
+            if self.on_result is not None:
+                self.on_result(position, result)
+
+        start = time.perf_counter()
+        grabber.start()
+        with ThreadPoolExecutor(1, thread_name_prefix="ScanMotion") as motion, \
+                ThreadPoolExecutor(1, thread_name_prefix="ScanProcess") as processing:
+            moving: Future | None = None
+            try:
+                for k in range(self.positions):
+                    if stop_event is not None and stop_event.is_set():
+                        break
+                    if moving is not None:
+                        moving.result()
+                    if len(pending) >= self.max_inflight:
+                        collect()
+
+                    if self.gate is not None and not self._wait_gate(grabber, k, stop_event):
+                        break
+
+                    bg, fg = self._pairs[k % len(self._pairs)]
+                    position = self.scanner.stepper_position
+                    self._capture_position(grabber, position, bg, fg)
+                    if k + 1 < self.positions:
+                        moving = motion.submit(self._move, self.steps_per_position)
+                    pending.append((position, processing.submit(self.process, bg, fg, position)))
+
+                while pending:
+                    collect()
+            finally:
+                if moving is not None:
+                    moving.result()
+                self._set_laser(False)
+                grabber.stop()
+
+        self.elapsed = time.perf_counter() - start
+        logger.info(
+            f"Varredura concluída: {len(results)} posição(ões) em {self.elapsed:.2f}s "
+            f"({self.captures} captura(s), {self.settle_timeouts} estabilização(ões) por tempo limite)"
+        )
+        return results
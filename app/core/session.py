@@ -0,0 +1,255 @@
+import os
+import queue
+import threading
+import time
+from typing import Tuple
+import cv2
+import numpy as np
+from app.config.constants import (
+    CAMERA_WIDTH, CAMERA_HEIGHT, SESSION_CHUNK_FRAMES, SESSION_QUEUE_SIZE, SESSION_RECORD_TIMEOUT
+)
+from app.config.logger import logger
+
+FRAME_META_DTYPE = np.dtype([
+    ("timestamp", np.float64),
+    ("step",      np.int32),
+    ("laser",     np.uint8),
+])
+
+_MANIFEST = "session.npz"
+
+
+def _chunk_paths(path: str, chunk: int) -> Tuple[str, str]:
+    return (
+        os.path.join(path, f"frames_{chunk:05d}.npy"),
+        os.path.join(path, f"meta_{chunk:05d}.npy"),
+    )
+
+
+class SessionRecorder:
+    """
+    Grava os quadros brutos de um escaneamento para reprocessamento sem o hardware.
+
+    Cada quadro é copiado para um buffer de preparação pré-alocado e entregue a uma thread
+    gravadora, que o escreve em arquivos ``.npy`` mapeados em memória de
+    ``chunk_frames`` quadros, junto com o instante monotônico, a posição do motor e o
+    estado do laser. A calibração ativa é salva no manifesto ``session.npz``.
+
+    Se a thread gravadora falhar (ex.: disco cheio), a exceção fica em ``error`` e é
+    relançada por :meth:`record` como ``RuntimeError``, em vez de deixar a captura esperando
+    por um buffer que nunca volta.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            camera_matrix: np.ndarray | None,
+            dist_coeffs: np.ndarray | None,
+            shape: Tuple[int, int, int] = (CAMERA_HEIGHT, CAMERA_WIDTH, 3),
+            chunk_frames: int = SESSION_CHUNK_FRAMES,
+            queue_size: int = SESSION_QUEUE_SIZE,
+            timeout: float = SESSION_RECORD_TIMEOUT,
+            image_size: Tuple[int, int] | None = None
+    ):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.shape = tuple(shape)
+        self.chunk_frames = chunk_frames
+        self.camera_matrix = camera_matrix
+        self.dist_coeffs = dist_coeffs
+        self.image_size = image_size
+        self.count = 0
+        self.timeout = timeout
+        self.error: BaseException | None = None
+
+        self._staging = [np.empty(self.shape, dtype=np.uint8) for _ in range(queue_size)]
+        self._free = queue.Queue()
+        for i in range(queue_size):
+            self._free.put(i)
+        self._pending = queue.Queue()
+        self._frames: np.ndarray | None = None
+        self._meta: np.ndarray | None = None
+        self._thread = threading.Thread(target=self._run, name="SessionRecorder", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def record(self, frame: np.ndarray, step: int = 0, laser: bool = False) -> None:
+        """
+        Enfileira um quadro bruto para gravação.
+
+        Bloqueia apenas se todos os buffers de preparação estiverem ocupados, isto é, se o
+        disco não acompanhar a taxa de captura, e por no máximo ``timeout`` segundos.
+
+        Raises:
+            RuntimeError: Se a thread gravadora falhou ou não liberou nenhum buffer a tempo.
+        """
+        self._check()
+        if frame.shape != self.shape:
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+        timestamp = time.monotonic()
+        try:
+            idx = self._free.get(timeout=self.timeout)
+        except queue.Empty:
+            self._check()
+            raise RuntimeError(f"Gravador da sessão parado: nenhum buffer liberado em {self.timeout:.1f}s")
+        np.copyto(self._staging[idx], frame)
+        self._pending.put((idx, timestamp, step, laser))
+
+    def _check(self) -> None:
+        if self.error is not None:
+            raise RuntimeError(f"Falha na gravação da sessão: {self.error}") from self.error
+        if not self._thread.is_alive():
+            raise RuntimeError("Gravador da sessão encerrado.")
+
+    def _open_chunk(self, chunk: int) -> None:
+        frames_path, meta_path = _chunk_paths(self.path, chunk)
+        self._frames = np.lib.format.open_memmap(
+            frames_path, mode="w+", dtype=np.uint8, shape=(self.chunk_frames, *self.shape)
+        )
+        self._meta = np.lib.format.open_memmap(
+            meta_path, mode="w+", dtype=FRAME_META_DTYPE, shape=(self.chunk_frames,)
+        )
+
+    def _close_chunk(self) -> None:
+        if self._frames is not None:
+            self._frames.flush()
+            self._meta.flush()
+        self._frames, self._meta = None, None
+
+    def _run(self) -> None:
+        try:
+            while True:
+                item = self._pending.get()
+                if item is None:
+                    return
+                idx, timestamp, step, laser = item
+                chunk, slot = divmod(self.count, self.chunk_frames)
+                if slot == 0:
+                    self._close_chunk()
+                    self._open_chunk(chunk)
+                np.copyto(self._frames[slot], self._staging[idx])
+                self._meta[slot] = (timestamp, step, laser)
+                self._free.put(idx)
+                self.count += 1
+        except BaseException as e:
+            self.error = e
+            logger.exception(f"Falha na gravação da sessão em {self.path}")
+        finally:
+            try:
+                self._close_chunk()
+            except Exception:
+                logger.exception("Falha ao fechar o bloco da sessão")
+
+    def close(self) -> None:
+        """
+        Aguarda a gravação dos quadros pendentes e grava o manifesto da sessão. Com o
+        gravador já encerrado por falha, o manifesto cobre só os quadros gravados até ela.
+        """
+        if self._thread.is_alive():
+            self._pending.put(None)
+            self._thread.join()
+        elif self.error is None:
+            return
+        np.savez(
+            os.path.join(self.path, _MANIFEST),
+            count=self.count,
+            chunk_frames=self.chunk_frames,
+            shape=np.array(self.shape),
+            camera_matrix=self.camera_matrix if self.camera_matrix is not None else np.empty(0),
+            dist_coeffs=self.dist_coeffs if self.dist_coeffs is not None else np.empty(0),
+            image_size=np.array(self.image_size if self.image_size is not None else (), dtype=np.int64),
+        )
+        self.error, error = None, self.error
+        if error is not None:
+            logger.warning(f"Sessão em {self.path} interrompida por falha: {self.count} quadro(s) gravado(s)")
+        else:
+            logger.info(f"Sessão gravada em {self.path}: {self.count} quadro(s)")
+
+
+class SessionReplay:
+    """
+    Fonte de quadros a partir de uma sessão gravada, com a interface de ``cv2.VideoCapture``.
+
+    Os arquivos da sessão são abertos com ``mmap_mode="r"``, e ``read()`` devolve views do
+    mapeamento, de modo que os geradores existentes rodam sobre a gravação na velocidade do
+    disco. Os metadados do último quadro lido ficam em ``timestamp``, ``step`` e ``laser``.
+    """
+
+    def __init__(self, path: str, loop: bool = False):
+        with np.load(os.path.join(path, _MANIFEST)) as manifest:
+            self.count = int(manifest["count"])
+            self.chunk_frames = int(manifest["chunk_frames"])
+            self.shape = tuple(int(v) for v in manifest["shape"])
+            cm, dc = manifest["camera_matrix"], manifest["dist_coeffs"]
+            size = manifest["image_size"] if "image_size" in manifest.files else np.empty(0)
+        self.camera_matrix = cm if cm.size else None
+        self.dist_coeffs = dc if dc.size else None
+        self.image_size = (int(size[0]), int(size[1])) if size.size else None
+        self.path = path
+        self.loop = loop
+        self.position = 0
+        self.timestamp = 0.0
+        self.step = 0
+        self.laser = False
+        self._chunk = -1
+        self._frames: np.ndarray | None = None
+        self._meta: np.ndarray | None = None
+        self._opened = True
+
+    def _load_chunk(self, chunk: int) -> None:
+        if chunk != self._chunk:
+            frames_path, meta_path = _chunk_paths(self.path, chunk)
+            self._frames = np.load(frames_path, mmap_mode="r")
+            self._meta = np.load(meta_path, mmap_mode="r")
+            self._chunk = chunk
+
+    def frame(self, index: int) -> Tuple[np.ndarray, np.void]:
+        """ Quadro e metadados (``FRAME_META_DTYPE``) de um índice arbitrário. """
+        if not 0 <= index < self.count:
+            raise IndexError(f"Quadro {index} fora da sessão ({self.count} quadros)")
+        chunk, slot = divmod(index, self.chunk_frames)
+        self._load_chunk(chunk)
+        return self._frames[slot], self._meta[slot]
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def read(self, image: np.ndarray | None = None) -> Tuple[bool, np.ndarray | None]:
+        if not self._opened:
+            return False, None
+        if self.position >= self.count:
+            if not self.loop or self.count == 0:
+                return False, None
+            self.position = 0
+
+        frame, meta = self.frame(self.position)
+        self.position += 1
+        self.timestamp, self.step, self.laser = float(meta["timestamp"]), int(meta["step"]), bool(meta["laser"])
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame
+
+    def get(self, prop_id: int) -> float:
+        return {
+            cv2.CAP_PROP_FRAME_WIDTH:  self.shape[1],
+            cv2.CAP_PROP_FRAME_HEIGHT: self.shape[0],
+            cv2.CAP_PROP_FRAME_COUNT:  self.count,
+            cv2.CAP_PROP_POS_FRAMES:   self.position,
+        }.get(prop_id, 0.0)
+
+    def set(self, prop_id: int, value: float) -> bool:
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(value)
+            return True
+        return False
+
+    def release(self) -> None:
+        self._opened = False
+        self._frames, self._meta = None, None
+        self._chunk = -1
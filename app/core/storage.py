@@ -0,0 +1,114 @@
+import os
+import tempfile
+import numpy as np
+from app.config.constants import POINT_CHUNK_SIZE
+from app.config.logger import logger
+
+POINT_DTYPE = np.dtype([
+    ("xyz",       np.float32, (3,)),
+    ("frame",     np.uint32),
+    ("step",      np.int32),
+    ("intensity", np.float32),
+])
+
+
+class PointStore:
+    """
+    Armazenamento append-only da nuvem de pontos de um escaneamento.
+
+    Os pontos são acumulados em um bloco pré-alocado em memória; cada bloco cheio é
+    despejado no arquivo de apoio, de modo que o uso de memória fica limitado a um bloco
+    independentemente da duração do escaneamento. A nuvem completa é lida de volta como um
+    ``np.memmap`` estruturado (``POINT_DTYPE``), sem cópia.
+    """
+
+    def __init__(self, path: str | None = None, chunk_size: int = POINT_CHUNK_SIZE):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="surfacex_", suffix=".pts")
+            os.close(fd)
+            self._owns_file = True
+        else:
+            self._owns_file = False
+        self.path = path
+        self._file = open(path, "wb+")
+        self._chunk = np.empty(chunk_size, dtype=POINT_DTYPE)
+        self._fill = 0
+        self._on_disk = 0
+
+    def __len__(self) -> int:
+        return self._on_disk + self._fill
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(
+            self,
+            xyz: np.ndarray,
+            frame: int | np.ndarray = 0,
+            step: int | np.ndarray = 0,
+            intensity: float | np.ndarray = 0.0
+    ) -> None:
+        """
+        Acrescenta um lote de pontos.
+
+        Args:
+            xyz (np.ndarray): Coordenadas (N, 3).
+            frame (int | np.ndarray): Índice do quadro, escalar ou (N,).
+            step (int | np.ndarray): Posição do motor de passo, escalar ou (N,).
+            intensity (float | np.ndarray): Intensidade do laser, escalar ou (N,).
+        """
+        n = len(xyz)
+        frame, step, intensity = (np.broadcast_to(v, (n,)) for v in (frame, step, intensity))
+
+        done = 0
+        while done < n:
+            take = min(n - done, len(self._chunk) - self._fill)
+            dst = self._chunk[self._fill:self._fill + take]
+            dst["xyz"]       = xyz[done:done + take]
+            dst["frame"]     = frame[done:done + take]
+            dst["step"]      = step[done:done + take]
+            dst["intensity"] = intensity[done:done + take]
+            self._fill += take
+            done += take
+            if self._fill == len(self._chunk):
+                self._spill()
+
+    def _spill(self) -> None:
+        if self._fill == 0:
+            return
+        self._file.write(memoryview(self._chunk[:self._fill]).cast("B"))
+        self._on_disk += self._fill
+        self._fill = 0
+
+    def flush(self) -> None:
+        """ Grava o bloco parcial em disco. """
+        self._spill()
+        self._file.flush()
+
+    def view(self) -> np.ndarray:
+        """
+        Retorna todos os pontos como um array estruturado mapeado do disco.
+
+        Returns:
+            np.ndarray: ``np.memmap`` (N,) com ``POINT_DTYPE``; campos ``xyz``, ``frame``,
+            ``step`` e ``intensity``.
+        """
+        self.flush()
+        if self._on_disk == 0:
+            return np.empty(0, dtype=POINT_DTYPE)
+        return np.memmap(self.path, dtype=POINT_DTYPE, mode="r", shape=(self._on_disk,))
+
+    def close(self, remove: bool | None = None) -> None:
+        """ Fecha o arquivo; por padrão remove-o apenas se foi criado como temporário. """
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        if remove if remove is not None else self._owns_file:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                logger.warning(f"Não foi possível remover {self.path}: {e}")
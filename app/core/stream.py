@@ -1,15 +1,111 @@
-from dataclasses import dataclass
+import threading
+from collections import deque
+from typing import Tuple
 import cv2
 import numpy as np
+from app.config.constants import STREAM_POOL_SIZE
+
+GRAY = "gray"
+BGR  = "bgr"
+
+# Recurso padrão dos quadros sem resultado associado; somente leitura e compartilhado.
+EMPTY_RESOURCE = np.zeros((1, 5))
+EMPTY_RESOURCE.flags.writeable = False
+
+
+class FramePool:
+    """
+    Conjunto fixo de buffers de quadro reutilizados pelos geradores.
+
+    :meth:`acquire` entrega um buffer livre (ou None se nenhum foi devolvido dentro do tempo
+    limite) e :meth:`release` o devolve; em regime permanente nenhum quadro é alocado.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], size: int = STREAM_POOL_SIZE, dtype=np.uint8):
+        if size < 1:
+            raise ValueError("O pool precisa de pelo menos 1 buffer.")
+        self.buffers = [np.empty(shape, dtype=dtype) for _ in range(size)]
+        self._free = deque(range(size))
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float | None = None) -> Tuple[int, np.ndarray] | None:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._free, timeout):
+                return None
+            idx = self._free.popleft()
+            return idx, self.buffers[idx]
+
+    def release(self, idx: int) -> None:
+        with self._cond:
+            self._free.append(idx)
+            self._cond.notify()
+
+    @property
+    def available(self) -> int:
+        return len(self._free)
+
 
-@dataclass
 class Stream:
-    frame: np.ndarray
-    mode: int
-    exec_time: float
-    progress_capt: float
-    progress_proc: float
-    resource: np.ndarray
+    """
+    Registro compacto de um quadro produzido pelos geradores.
+
+    ``frame`` é uma view do buffer do ``FramePool`` no formato ``color`` (``GRAY`` ou
+    ``BGR``); nenhuma conversão é feita na criação. :meth:`bgr` converte sob demanda (uma vez
+    por registro) para quem precisa de três canais. O consumidor deve chamar :meth:`release`
+    (ou usar o registro em um bloco ``with``) ao terminar, devolvendo o buffer ao pool; depois
+    disso ``frame`` não deve mais ser usado.
+    """
+
+    __slots__ = (
+        "frame", "mode", "exec_time", "progress_capt", "progress_proc", "resource",
+        "color", "_pool", "_slot", "_bgr"
+    )
+
+    def __init__(
+            self,
+            frame: np.ndarray,
+            mode: int,
+            exec_time: float,
+            progress_capt: float,
+            progress_proc: float,
+            resource: np.ndarray = EMPTY_RESOURCE,
+            color: str | None = None,
+            pool: FramePool | None = None,
+            slot: int | None = None
+    ):
+        self.frame = frame
+        self.mode = mode
+        self.exec_time = exec_time
+        self.progress_capt = progress_capt
+        self.progress_proc = progress_proc
+        self.resource = resource
+        self.color = color or (GRAY if frame.ndim == 2 else BGR)
+        self._pool = pool
+        self._slot = slot
+        self._bgr: np.ndarray | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def bgr(self, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Quadro em BGR. Para ``GRAY`` a conversão é feita só na primeira chamada (em ``out``,
+        se fornecido); para ``BGR`` retorna o próprio ``frame``.
+        """
+        if self.color == BGR:
+            return self.frame
+        if self._bgr is None:
+            self._bgr = cv2.cvtColor(self.frame, cv2.COLOR_GRAY2BGR, dst=out)
+        return self._bgr
+
+    def release(self) -> None:
+        """ Devolve o buffer ao pool (idempotente). """
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.release(self._slot)
 
     def __str__(self):
         """ Return a string representation of the stream object """
@@ -24,8 +120,3 @@ class Stream:
             f"Progresso de processamento: {_proc:.2f}\n"
             f"Resource: {self.resource}\n"
         )
-
-    def __post_init__(self):
-        """ Ensure the frame is in BGR format """
-        if len(self.frame.shape) == 2:
-            self.frame = cv2.cvtColor(self.frame, cv2.COLOR_GRAY2BGR)
\ No newline at end of file
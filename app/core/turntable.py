@@ -0,0 +1,223 @@
+"""
+Junção das vistas de uma varredura em mesa giratória.
+
+Cada perfil é medido com o objeto girado de ``passo * 2π / steps_per_rev`` em torno do eixo
+da mesa; levar todos os perfis ao referencial do objeto é desfazer essa rotação. O eixo
+(ponto e direção, no mesmo referencial dos pontos) vem de uma calibração única,
+:func:`calibrate_axis`, feita com um marcador preso à mesa (:class:`AxisCalibrator`).
+"""
+from typing import Iterable, List, Tuple
+import numpy as np
+from app.config.constants import (
+    FRAME_RESOLUTION, REFERENCE_MARKER_LENGTH_MM, TARGET_MARKER_ID_43, TURNTABLE_STEPS_PER_REV
+)
+from app.config.logger import logger
+from app.core.markers import MarkerTracker
+from app.core.proc import fit_plane_svd, rectify_gray, rodrigues_batch
+
+
+def _fit_circle_2d(xy: np.ndarray) -> Tuple[np.ndarray, float]:
+    """ Círculo por mínimos quadrados algébricos (Kåsa): x² + y² + D x + E y + F = 0. """
+    a = np.column_stack((xy, np.ones(len(xy))))
+    b = -(xy ** 2).sum(axis=1)
+    (d, e, f), *_ = np.linalg.lstsq(a, b, rcond=None)
+    center = -0.5 * np.array([d, e])
+    return center, float(np.sqrt(max(center @ center - f, 0.0)))
+
+
+def calibrate_axis(
+        centers: np.ndarray,
+        steps: np.ndarray,
+        steps_per_rev: int = TURNTABLE_STEPS_PER_REV
+) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Calibra o eixo da mesa a partir das posições de um ponto fixo no objeto (ex.: o ``tvec``
+    de um marcador sobre a mesa) observado em vários passos.
+
+    O ponto descreve um círculo em torno do eixo: o plano do círculo dá a direção e o centro
+    dá o ponto do eixo. O sentido da direção é escolhido de forma que um passo positivo seja
+    uma rotação positiva (regra da mão direita) em torno dela.
+
+    Args:
+        centers (np.ndarray): Posições (M, 3) do ponto, M >= 3, cobrindo um arco razoável.
+        steps (np.ndarray): Passo do motor (M,) em que cada posição foi medida.
+        steps_per_rev (int): Passos por volta completa da mesa.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, float]: Ponto do eixo (3,), direção unitária (3,) e
+        RMS (mesma unidade dos pontos) do ajuste do círculo.
+    """
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+    steps = np.asarray(steps).ravel()
+    if len(centers) < 3 or len(centers) != len(steps):
+        raise ValueError("São necessárias ao menos 3 posições, uma por passo.")
+
+    plane = fit_plane_svd(centers)
+    normal = plane[:3]
+    # Base ortonormal (e1, e2) do plano do círculo.
+    e1 = np.cross(normal, [1.0, 0.0, 0.0] if abs(normal[0]) < 0.9 else [0.0, 1.0, 0.0])
+    e1 /= np.linalg.norm(e1)
+    e2 = np.cross(normal, e1)
+    origin_plane = centers.mean(axis=0)
+    origin_plane -= (origin_plane @ normal + plane[3]) * normal
+    local = np.column_stack(((centers - origin_plane) @ e1, (centers - origin_plane) @ e2))
+    center2d, radius = _fit_circle_2d(local)
+    origin = origin_plane + center2d[0] * e1 + center2d[1] * e2
+
+    # Sentido: ângulo percorrido no plano contra os passos dados.
+    angles = np.unwrap(np.arctan2(local[:, 1] - center2d[1], local[:, 0] - center2d[0]))
+    order = np.argsort(steps)
+    slope = np.polyfit(steps[order], angles[order], 1)[0]
+    direction = normal if slope >= 0 else -normal
+
+    residual = np.linalg.norm(local - center2d, axis=1) - radius
+    rms = float(np.sqrt(np.mean(residual ** 2)))
+    expected = 2 * np.pi / steps_per_rev
+    if abs(abs(slope) - expected) > 0.1 * expected:
+        logger.warning(
+            f"Ângulo por passo medido ({np.degrees(abs(slope)):.4f}°) difere do esperado "
+            f"({np.degrees(expected):.4f}°): verifique TURNTABLE_STEPS_PER_REV"
+        )
+    logger.info(f"Eixo da mesa: ponto {np.round(origin, 3)}, direção {np.round(direction, 5)}, RMS {rms:.3f}")
+    return origin, direction, rms
+
+
+class AxisCalibrator:
+    """
+    Coleta as posições de um marcador preso à mesa ao longo de uma varredura de calibração.
+
+    :meth:`add_view` segue o ``process`` do ``ScanScheduler``: no quadro com laser desligado
+    (retificado com os mapas de ``Scanner._load_maps``) estima a pose do marcador
+    ``target_id`` e guarda o ``tvec`` com o passo do motor. :meth:`fit` passa tudo a
+    :func:`calibrate_axis`; o eixo resultante fica no referencial da câmera, o mesmo dos
+    pontos do ``ScanProcessor``.
+    """
+
+    def __init__(
+            self,
+            k_opt: np.ndarray,
+            map_one: np.ndarray,
+            map_two: np.ndarray,
+            marker_length: float = REFERENCE_MARKER_LENGTH_MM,
+            target_id: int = TARGET_MARKER_ID_43,
+            steps_per_rev: int = TURNTABLE_STEPS_PER_REV,
+            tracker: MarkerTracker | None = None
+    ):
+        self.k_opt = np.asarray(k_opt, dtype=np.float64)
+        self.map_one = map_one
+        self.map_two = map_two
+        self.marker_length = marker_length
+        self.target_id = target_id
+        self.steps_per_rev = steps_per_rev
+        self.tracker = tracker or MarkerTracker()
+        self._gray = np.empty((FRAME_RESOLUTION[1], FRAME_RESOLUTION[0]), dtype=np.uint8)
+        self._zero_dist = np.zeros(5)
+        self.centers: List[np.ndarray] = []
+        self.steps: List[int] = []
+        self.rejected = 0
+
+    def add_view(self, bg: np.ndarray, fg: np.ndarray, position: int) -> bool:
+        """ Registra a posição do marcador no passo ``position``; False se não encontrado. """
+        rectify_gray(self.map_one, self.map_two, bg, self._gray)
+        poses = self.tracker.estimate_poses(
+            self._gray, (self.target_id,), self.marker_length, self.k_opt, self._zero_dist
+        )
+        if self.target_id not in poses:
+            self.rejected += 1
+            logger.debug(f"Marcador {self.target_id} não encontrado no passo {position}")
+            return False
+        self.centers.append(np.asarray(poses[self.target_id][1], dtype=np.float64).ravel())
+        self.steps.append(int(position))
+        return True
+
+    def fit(self) -> Tuple[np.ndarray, np.ndarray, float]:
+        """ Ponto do eixo (3,), direção unitária (3,) e RMS do ajuste; ver :func:`calibrate_axis`. """
+        return calibrate_axis(np.array(self.centers), np.array(self.steps), self.steps_per_rev)
+
+
+class TurntableMerger:
+    """
+    Leva os perfis de todos os passos ao referencial do objeto.
+
+    As matrizes que desfazem a rotação de cada passo, ``R(-θ_k)`` em torno de ``direction``,
+    são calculadas uma única vez com :func:`rodrigues_batch` para uma volta inteira (e
+    guardadas transpostas, para a forma de vetor-linha ``p @ R.T``). A junção aplica
+    ``p' = R[k] (p - origin) + origin`` com ``matmul`` em float32: perfis do mesmo tamanho
+    viram um único produto em lote (F, P, 3) x (F, 3, 3); perfis de tamanhos diferentes são
+    percorridos bloco a bloco, cada um contíguo, como em ``backproject_batch``. Expandir a
+    matriz de cada ponto para um ``einsum`` (N, 3, 3) seria bem mais lento.
+    """
+
+    def __init__(
+            self,
+            origin: np.ndarray,
+            direction: np.ndarray,
+            steps_per_rev: int = TURNTABLE_STEPS_PER_REV
+    ):
+        direction = np.asarray(direction, dtype=np.float64).ravel()
+        self.origin = np.asarray(origin, dtype=np.float64).ravel()
+        self.direction = direction / np.linalg.norm(direction)
+        self.steps_per_rev = int(steps_per_rev)
+
+        angles = -2 * np.pi * np.arange(self.steps_per_rev) / self.steps_per_rev
+        self.rotations = rodrigues_batch(angles[:, None] * self.direction).astype(np.float32)
+        self._rotations_t = np.ascontiguousarray(self.rotations.transpose(0, 2, 1))
+        self._origin32 = self.origin.astype(np.float32)
+
+    def merge(
+            self,
+            points: np.ndarray,
+            offsets: np.ndarray,
+            steps: np.ndarray,
+            out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Transforma os perfis concatenados para o referencial do objeto.
+
+        Args:
+            points (np.ndarray): Pontos (N, 3) de todos os perfis, no referencial do eixo.
+            offsets (np.ndarray): Índices (F + 1,) delimitando os pontos de cada perfil,
+                como em ``backproject_batch``.
+            steps (np.ndarray): Passo do motor (F,) de cada perfil; qualquer inteiro,
+                reduzido módulo ``steps_per_rev``.
+            out (np.ndarray | None): Buffer (N, 3) float32 pré-alocado para o resultado.
+
+        Returns:
+            np.ndarray: Pontos (N, 3) float32 no referencial do objeto.
+        """
+        offsets = np.asarray(offsets)
+        n = int(offsets[-1])
+        if len(points) != n:
+            raise ValueError("offsets não correspondem ao número de pontos.")
+        if out is None:
+            out = np.empty((n, 3), dtype=np.float32)
+        elif out.shape != (n, 3) or out.dtype != np.float32:
+            raise ValueError("Buffer de saída deve ser (N, 3) float32.")
+
+        counts = np.diff(offsets)
+        index = np.mod(steps, self.steps_per_rev)
+        centered = np.subtract(points, self._origin32, dtype=np.float32)
+        if len(counts) and counts[0] and (counts == counts[0]).all():
+            shape = (len(counts), int(counts[0]), 3)
+            np.matmul(centered.reshape(shape), self._rotations_t[index], out=out.reshape(shape))
+        else:
+            for f in np.flatnonzero(counts):
+                seg = slice(offsets[f], offsets[f + 1])
+                np.matmul(centered[seg], self._rotations_t[index[f]], out=out[seg])
+        out += self._origin32
+        return out
+
+    def to_view(self, points: np.ndarray, step: int) -> np.ndarray:
+        """ Inverso de :meth:`merge`: leva pontos (N, 3) do referencial do objeto para o passo ``step``. """
+        rotation = self._rotations_t[(-int(step)) % self.steps_per_rev]
+        return (np.subtract(points, self._origin32, dtype=np.float32) @ rotation) + self._origin32
+
+    def merge_profiles(self, profiles: Iterable[Tuple[np.ndarray, int]]) -> np.ndarray:
+        """ Atalho para uma lista de ``(pontos (n, 3), passo)``, um item por perfil. """
+        profiles = list(profiles)
+        if not profiles:
+            return np.empty((0, 3), dtype=np.float32)
+        counts = [len(p) for p, _ in profiles]
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        steps = np.array([s for _, s in profiles], dtype=np.int64)
+        return self.merge(np.concatenate([p for p, _ in profiles]), offsets, steps)
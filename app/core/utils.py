@@ -1,6 +1,7 @@
 import cv2
-import cv2.aruco as aruco
 import numpy as np
+from app.config.constants import REFERENCE_MARKER_LENGTH_MM, TARGET_MARKER_ID_43
+from app.core.markers import MarkerTracker
 
 
 def write_text_to_frame(frame, texto):
@@ -24,43 +25,60 @@ def write_text_to_frame(frame, texto):
     y_texto = y_inicio + (altura_faixa + altura_texto) // 2
     cv2.putText(frame, texto, (x_texto, y_texto), fonte, escala_fonte, cor_texto, espessura, cv2.LINE_AA)
 
-def get_roi(frame, camera_matrix, dist_coeffs, length_exp=50, target_id=43):
+def roi_rect(polygon: np.ndarray, frame_shape) -> tuple[int, int, int, int] | None:
+    """ Retângulo (x, y, w, h) que envolve o polígono da ROI, recortado aos limites do quadro. """
+    if polygon is None or len(polygon) == 0:
+        return None
+    x, y, w, h = cv2.boundingRect(np.asarray(polygon, dtype=np.int32))
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, frame_shape[1]), min(y + h, frame_shape[0])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
 
-    aruco_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
-    detector   = cv2.aruco.ArucoDetector(
-        aruco_dict,
-        cv2.aruco.DetectorParameters()
-    )
+def roi_crop_mask(polygon: np.ndarray, rect: tuple[int, int, int, int]) -> np.ndarray:
+    """ Máscara uint8 (0/255) do polígono no sistema de coordenadas do recorte ``rect``. """
+    x, y, w, h = rect
+    mask = np.zeros((h, w), dtype=np.uint8)
+    local = np.asarray(polygon, dtype=np.int32) - np.array([x, y], dtype=np.int32)
+    cv2.fillPoly(mask, [local], 255)
+    return mask
+
+_tracker: MarkerTracker | None = None
+
+def get_tracker() -> MarkerTracker:
+    """ Rastreador de marcadores compartilhado, criado na primeira chamada. """
+    global _tracker
+    if _tracker is None:
+        _tracker = MarkerTracker()
+    return _tracker
 
-    aruco_lenght = 144
+def roi_polygon(rvec, tvec, camera_matrix, dist_coeffs, length_exp=50, marker_length=REFERENCE_MARKER_LENGTH_MM):
+    """ Projeta na imagem o quadrado do marcador de referência, estendido ``length_exp`` mm em +x. """
+    half = marker_length / 2
     obj_corners = np.array([
-        [-aruco_lenght/2,  aruco_lenght/2,              0.0],
-        [-aruco_lenght/2, -aruco_lenght/2,              0.0],
-        [ aruco_lenght/2 + length_exp, -aruco_lenght/2, 0.0],
-        [ aruco_lenght/2 + length_exp,  aruco_lenght/2, 0.0]
+        [-half,  half,              0.0],
+        [-half, -half,              0.0],
+        [ half + length_exp, -half, 0.0],
+        [ half + length_exp,  half, 0.0]
     ], dtype=np.float32)
 
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    corners, ids, _ = detector.detectMarkers(gray)
+    img_pts, _ = cv2.projectPoints(
+        obj_corners, rvec, tvec,
+        camera_matrix, dist_coeffs
+    )
+    return img_pts.reshape(-1, 2).astype(int)
 
-    if ids is None:
-        return None
+def get_roi(frame, camera_matrix, dist_coeffs, length_exp=50, target_id=TARGET_MARKER_ID_43, tracker=None):
 
-    ids = ids.flatten()
-    matches = np.where(ids == target_id)[0]
-    if matches.size == 0:
-        return None
+    tracker = tracker if tracker is not None else get_tracker()
 
-    rvecs, tvecs, _ = aruco.estimatePoseSingleMarkers(
-        corners, aruco_lenght, camera_matrix, dist_coeffs
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    poses = tracker.estimate_poses(
+        gray, (target_id,), REFERENCE_MARKER_LENGTH_MM, camera_matrix, dist_coeffs
     )
+    if target_id not in poses:
+        return None
 
-    idx = matches[0]
-    rvec, tvec = rvecs[idx][0], tvecs[idx][0]
-
-    img_pts, _ = cv2.projectPoints(
-        obj_corners, rvec, tvec,
-        camera_matrix, dist_coeffs
-    )
-    flat = img_pts.reshape(-1, 2).astype(int)
-    return flat
+    rvec, tvec = poses[target_id]
+    return roi_polygon(rvec, tvec, camera_matrix, dist_coeffs, length_exp)
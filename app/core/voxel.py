@@ -0,0 +1,109 @@
+from typing import List, Tuple
+import numpy as np
+from app.config.constants import VOXEL_SIZE, SCAN_VOLUME_MM
+from app.config.logger import logger
+
+
+class VoxelGrid:
+    """
+    Subamostragem incremental por grade de voxels.
+
+    Cada ponto é quantizado para um voxel de lado ``voxel_size`` (na mesma unidade dos
+    pontos) dentro do volume ``bounds``; os três índices viram uma chave int64 linear, com o
+    alcance dimensionado pelo volume. Cada lote é reduzido por chave (``np.unique`` +
+    ``np.bincount``) e guardado como um bloco pendente; os blocos só são fundidos à grade
+    ordenada (soma das coordenadas e contagem por chave) quando somam tanto quanto a própria
+    grade, então cada fusão custa no máximo o dobro do que já existia e o custo por lote é
+    amortizado, sem copiar a grade a cada quadro. O tamanho de :meth:`centroids` é limitado
+    pelo número de voxels ocupados, não pela duração do escaneamento.
+    """
+
+    def __init__(
+            self,
+            voxel_size: float = VOXEL_SIZE,
+            bounds: Tuple[Tuple[float, float, float], Tuple[float, float, float]] = SCAN_VOLUME_MM,
+            merge_min: int = 1 << 16
+    ):
+        if voxel_size <= 0:
+            raise ValueError("O tamanho do voxel deve ser positivo.")
+        lo, hi = (np.asarray(b, dtype=np.float64) for b in bounds)
+        dims = np.ceil((hi - lo) / voxel_size).astype(np.int64)
+        if (dims <= 0).any():
+            raise ValueError("Volume da grade vazio.")
+        if np.prod(dims.astype(np.float64)) >= 2.0 ** 63:
+            raise ValueError("Volume grande demais para o tamanho de voxel: as chaves não cabem em int64.")
+        self.voxel_size = voxel_size
+        self.bounds = (lo, hi)
+        self.merge_min = merge_min
+        self._lo = lo
+        self._dims = dims
+        self._strides = np.array([dims[1] * dims[2], dims[2], 1], dtype=np.int64)
+
+        self.keys   = np.empty(0, dtype=np.int64)
+        self.sums   = np.empty((0, 3), dtype=np.float64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self._pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._pending_size = 0
+        self.points_added    = 0
+        self.points_rejected = 0
+
+    def __len__(self) -> int:
+        self._merge()
+        return len(self.keys)
+
+    def clear(self) -> None:
+        self.__init__(self.voxel_size, self.bounds, self.merge_min)
+
+    def _keys(self, pts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        q = np.floor((pts - self._lo) / self.voxel_size).astype(np.int64)
+        valid = ((q >= 0) & (q < self._dims)).all(axis=1)
+        return q[valid] @ self._strides, valid
+
+    def add(self, pts: np.ndarray) -> None:
+        """
+        Incorpora um lote de pontos (N, 3) à grade.
+
+        Pontos fora de ``bounds`` são descartados e contabilizados em ``points_rejected``.
+        """
+        pts = np.asarray(pts).reshape(-1, 3)
+        pts = pts[np.isfinite(pts).all(axis=1)]
+        if len(pts) == 0:
+            return
+
+        keys, valid = self._keys(pts)
+        if not valid.all():
+            rejected = int(len(valid) - valid.sum())
+            self.points_rejected += rejected
+            logger.debug(f"VoxelGrid: {rejected} ponto(s) fora do volume da grade descartado(s)")
+            pts = pts[valid]
+            if len(pts) == 0:
+                return
+        self.points_added += len(pts)
+
+        uk, inv = np.unique(keys, return_inverse=True)
+        m = len(uk)
+        bsum = np.stack([np.bincount(inv, weights=pts[:, i], minlength=m) for i in range(3)], axis=1)
+        self._pending.append((uk, bsum, np.bincount(inv, minlength=m)))
+        self._pending_size += m
+        if self._pending_size >= max(len(self.keys), self.merge_min):
+            self._merge()
+
+    def _merge(self) -> None:
+        """ Funde os blocos pendentes à grade ordenada. """
+        if not self._pending:
+            return
+        keys = np.concatenate([self.keys, *(p[0] for p in self._pending)])
+        sums = np.concatenate([self.sums, *(p[1] for p in self._pending)])
+        counts = np.concatenate([self.counts, *(p[2] for p in self._pending)])
+        self._pending.clear()
+        self._pending_size = 0
+
+        self.keys, inv = np.unique(keys, return_inverse=True)
+        m = len(self.keys)
+        self.sums = np.stack([np.bincount(inv, weights=sums[:, i], minlength=m) for i in range(3)], axis=1)
+        self.counts = np.bincount(inv, weights=counts, minlength=m).astype(np.int64)
+
+    def centroids(self) -> np.ndarray:
+        """ Centroide (M, 3) float32 de cada voxel ocupado. """
+        self._merge()
+        return (self.sums / self.counts[:, None]).astype(np.float32)
@@ -0,0 +1,250 @@
+"""
+Reprocessamento offline, sem interface gráfica, de sessões gravadas ou pastas de imagens.
+
+Uso:
+    python -m app.offline SESSAO_OU_PASTA -o nuvem.ply --plane A B C D [opções]
+
+Os quadros são divididos em blocos e processados em um ``ProcessPoolExecutor``: cada
+processo retifica, extrai o laser, triangula com ``backproject`` e, se uma pose for
+informada, leva os pontos ao referencial do tabuleiro; com o eixo da mesa giratória
+(``--axis-origin``/``--axis-direction``), cada perfil é desfeito da rotação do seu passo
+(``TurntableMerger``). Os resultados são gravados em
+ordem em um arquivo ``.ply`` ou ``.pts`` (``PointStore``).
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from app.config.constants import FRAME_RESOLUTION, LASER_MIN_INTENSITY, LASER_SUBPIXEL_METHOD
+from app.config.logger import logger
+from app.core.export import PlyWriter
+from app.core.proc import precompute, rectify_gray, laser_peaks, laser_peaks_roi, backproject_batch
+from app.core.session import SessionReplay
+from app.core.storage import PointStore
+from app.core.turntable import TurntableMerger
+
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.bmp", "*.tif", "*.tiff")
+
+_ctx: dict = {}
+
+
+def _init_worker(settings: dict) -> None:
+    """ Prepara, uma vez por processo, os mapas de retificação e a fonte de quadros. """
+    _ctx.clear()
+    _ctx.update(settings)
+    k_opt, _, map1, map2 = precompute(
+        settings["camera_matrix"], settings["dist_coeffs"], settings["calibration_size"] or settings["size"]
+    )
+    _ctx["k_opt"], _ctx["map1"], _ctx["map2"] = k_opt, map1, map2
+    _ctx["replay"] = SessionReplay(settings["source"]) if settings["files"] is None else None
+    axis = settings["axis"]
+    _ctx["merger"] = TurntableMerger(*axis) if axis is not None else None
+    # fg/bg saem de rectify_gray em FRAME_RESOLUTION; só o rascunho da conversão para tons
+    # de cinza tem a resolução da fonte.
+    shape = (FRAME_RESOLUTION[1], FRAME_RESOLUTION[0])
+    _ctx["buffers"] = [
+        np.empty(shape, dtype=np.uint8),
+        np.empty(shape, dtype=np.uint8),
+        np.empty((settings["size"][1], settings["size"][0]), dtype=np.uint8),
+    ]
+
+
+def _load(index: int) -> np.ndarray:
+    if _ctx["replay"] is not None:
+        return _ctx["replay"].frame(index)[0]
+    img = cv2.imread(_ctx["files"][index], cv2.IMREAD_COLOR)
+    if img is None:
+        raise IOError(f"Não foi possível ler {_ctx['files'][index]}")
+    return img
+
+
+def process_chunk(pairs: np.ndarray) -> tuple:
+    """
+    Processa um bloco de pares (quadro com laser, quadro de fundo).
+
+    Args:
+        pairs (np.ndarray): Pares (M, 3) com índice do quadro com laser, índice do fundo e
+            posição do motor de passo.
+
+    Returns:
+        tuple: Pontos (N, 3) float32, índice do quadro (N,), passo (N,) e intensidade (N,).
+    """
+    fg, bg, scratch = _ctx["buffers"]
+    map1, map2 = _ctx["map1"], _ctx["map2"]
+    last_bg = -1
+
+    pts2d, counts, values = [], [], []
+    for fg_idx, bg_idx, _ in pairs:
+        if bg_idx != last_bg:
+            rectify_gray(map1, map2, _load(bg_idx), bg, scratch)
+            last_bg = bg_idx
+        rectify_gray(map1, map2, _load(fg_idx), fg, scratch)
+
+        if _ctx["roi"] is not None:
+            pts = laser_peaks_roi(bg, fg, _ctx["roi"], min_intensity=_ctx["min_intensity"], method=_ctx["method"])
+        else:
+            pts = laser_peaks(bg, fg, min_intensity=_ctx["min_intensity"], method=_ctx["method"])
+        pts2d.append(pts)
+        counts.append(len(pts))
+        values.append(fg[np.rint(pts[:, 1]).astype(np.intp), pts[:, 0].astype(np.intp)])
+
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    frames = len(pairs)
+    planes = np.broadcast_to(_ctx["plane"], (frames, 4))
+    rvecs = np.broadcast_to(_ctx["rvec"], (frames, 3)) if _ctx["rvec"] is not None else None
+    tvecs = np.broadcast_to(_ctx["tvec"], (frames, 3)) if _ctx["tvec"] is not None else None
+    xyz = backproject_batch(
+        np.concatenate(pts2d), offsets, planes, _ctx["k_opt"], rvecs, tvecs
+    )
+    if _ctx["merger"] is not None:
+        # Cada perfil volta ao referencial do objeto pelo passo da mesa em que foi medido.
+        xyz = _ctx["merger"].merge(xyz, offsets, pairs[:, 2])
+    frame_idx = np.repeat(pairs[:, 0], counts).astype(np.uint32)
+    steps = np.repeat(pairs[:, 2], counts).astype(np.int32)
+    intensity = np.concatenate(values).astype(np.float32)
+    valid = np.isfinite(xyz).all(axis=1)
+    return xyz[valid], frame_idx[valid], steps[valid], intensity[valid]
+
+
+def _session_pairs(replay: SessionReplay) -> np.ndarray:
+    """ Associa cada quadro com laser ao quadro sem laser mais recente. """
+    pairs, last_bg = [], -1
+    for i in range(replay.count):
+        _, meta = replay.frame(i)
+        if not meta["laser"]:
+            last_bg = i
+        elif last_bg >= 0:
+            pairs.append((i, last_bg, int(meta["step"])))
+    return np.array(pairs, dtype=np.int64).reshape(-1, 3)
+
+
+def _folder_pairs(files: list, background: int) -> np.ndarray:
+    """ Todos os quadros da pasta contra um único fundo. """
+    return np.array(
+        [(i, background, i) for i in range(len(files)) if i != background], dtype=np.int64
+    ).reshape(-1, 3)
+
+
+def _load_calibration(path: str) -> tuple:
+    data = np.load(path, allow_pickle=True)
+    calib = data.item() if hasattr(data, "item") else dict(data)
+    size = calib.get("image_size")
+    return (
+        np.asarray(calib["camera_matrix"], dtype=np.float64),
+        np.asarray(calib["dist_coeffs"]).ravel().astype(np.float64),
+        (int(size[0]), int(size[1])) if size is not None else None,
+    )
+
+
+def run(args: argparse.Namespace) -> int:
+    files, background = None, 0
+    if os.path.isdir(args.source) and os.path.exists(os.path.join(args.source, "session.npz")):
+        replay = SessionReplay(args.source)
+        pairs = _session_pairs(replay)
+        size = (replay.shape[1], replay.shape[0])
+        camera_matrix, dist_coeffs, calibration_size = replay.camera_matrix, replay.dist_coeffs, replay.image_size
+        replay.release()
+    elif os.path.isdir(args.source):
+        files = sorted(f for p in IMAGE_PATTERNS for f in glob.glob(os.path.join(args.source, p)))
+        if args.background is not None:
+            files = [f for f in files if os.path.abspath(f) != os.path.abspath(args.background)]
+            files.insert(0, args.background)
+        if not files:
+            logger.error(f"Nenhuma imagem encontrada em {args.source}")
+            return 1
+        first = cv2.imread(files[0], cv2.IMREAD_COLOR)
+        size = (first.shape[1], first.shape[0])
+        pairs = _folder_pairs(files, background)
+        camera_matrix, dist_coeffs, calibration_size = None, None, None
+    else:
+        logger.error(f"Origem inválida: {args.source}")
+        return 1
+
+    if args.calibration is not None:
+        camera_matrix, dist_coeffs, calibration_size = _load_calibration(args.calibration)
+    if camera_matrix is None or dist_coeffs is None:
+        logger.error("Calibração não encontrada: informe --calibration")
+        return 1
+    if len(pairs) == 0:
+        logger.error("Nenhum par de quadros (laser ligado/desligado) para processar")
+        return 1
+
+    settings = {
+        "source": args.source,
+        "files": files,
+        "size": size,
+        "calibration_size": calibration_size,
+        "camera_matrix": camera_matrix,
+        "dist_coeffs": dist_coeffs,
+        "plane": np.asarray(args.plane, dtype=np.float64),
+        "rvec": np.asarray(args.rvec, dtype=np.float64) if args.rvec else None,
+        "tvec": np.asarray(args.tvec, dtype=np.float64) if args.tvec else None,
+        "roi": tuple(args.roi) if args.roi else None,
+        "min_intensity": args.min_intensity,
+        "method": args.method,
+        "axis": (
+            (np.asarray(args.axis_origin, dtype=np.float64), np.asarray(args.axis_direction, dtype=np.float64))
+            if args.axis_origin and args.axis_direction else None
+        ),
+    }
+    chunks = [pairs[i:i + args.chunk] for i in range(0, len(pairs), args.chunk)]
+    workers = args.workers or os.cpu_count() or 1
+    logger.info(f"Processando {len(pairs)} quadro(s) em {len(chunks)} bloco(s) com {workers} processo(s)")
+
+    if args.output.lower().endswith(".ply"):
+        sink = PlyWriter(args.output, intensity=True)
+        write = lambda xyz, frame, step, value: sink.write(xyz, intensity=value)
+    else:
+        sink = PointStore(args.output)
+        write = sink.append
+
+    start, done, total = time.perf_counter(), 0, 0
+    with sink, ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,)) as pool:
+        for chunk, result in zip(chunks, pool.map(process_chunk, chunks)):
+            write(*result)
+            done += len(chunk)
+            total += len(result[0])
+            elapsed = time.perf_counter() - start
+            logger.info(f"{done}/{len(pairs)} quadros -- {done / elapsed:.1f} quadros/s -- {total} pontos")
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Concluído em {elapsed:.2f}s ({len(pairs) / elapsed:.1f} quadros/s): {total} pontos em {args.output}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.offline", description="Reprocessamento offline do SurfaceX")
+    parser.add_argument("source", help="Diretório de uma sessão gravada ou pasta de imagens")
+    parser.add_argument("-o", "--output", required=True, help="Arquivo de saída (.ply ou .pts)")
+    parser.add_argument("--plane", type=float, nargs=4, required=True, metavar=("A", "B", "C", "D"),
+                        help="Plano do laser no referencial da câmera")
+    parser.add_argument("--calibration", help="Arquivo .npy de calibração (sobrepõe o da sessão)")
+    parser.add_argument("--background", help="Imagem de fundo (laser desligado) para pastas de imagens")
+    parser.add_argument("--rvec", type=float, nargs=3, help="Rotação da pose do tabuleiro")
+    parser.add_argument("--tvec", type=float, nargs=3, help="Translação da pose do tabuleiro")
+    parser.add_argument("--roi", type=int, nargs=4, metavar=("X", "Y", "W", "H"), help="Retângulo da ROI")
+    parser.add_argument("--axis-origin", type=float, nargs=3, metavar=("X", "Y", "Z"),
+                        help="Ponto do eixo da mesa giratória (mesmo referencial dos pontos)")
+    parser.add_argument("--axis-direction", type=float, nargs=3, metavar=("X", "Y", "Z"),
+                        help="Direção do eixo da mesa; com --axis-origin junta as vistas no referencial do objeto")
+    parser.add_argument("--min-intensity", type=int, default=LASER_MIN_INTENSITY)
+    parser.add_argument("--method", choices=("com", "gaussian", "parabolic"), default=LASER_SUBPIXEL_METHOD)
+    parser.add_argument("--chunk", type=int, default=32, help="Quadros por bloco enviado a cada processo")
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos (padrão: todos os núcleos)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if (args.rvec is None) != (args.tvec is None):
+        logger.error("--rvec e --tvec devem ser informados juntos")
+        return 1
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,28 @@
+import os
 import threading
 import cv2
+import numpy as np
+from tkinter import filedialog, messagebox
 from PIL import ImageTk, Image
-import time
 from app.config import logger
-from app.config.constants import CAMERA_VIEWPORT_WIDTH, CAMERA_VIEWPORT_HEIGHT, BLACK_FRAME
+from app.config.constants import (
+    CAMERA_VIEWPORT_WIDTH, CAMERA_VIEWPORT_HEIGHT, BLACK_FRAME, FRAME_RESOLUTION, LSR_PIN_STR, PLANE_CALIB_POSES, PLANE_CALIB_MAX_ATTEMPTS,
+    ROI_EXTEND_MM, BACKGROUND_SPACING, SCAN_POSITIONS, SCAN_STEPS_PER_POSITION, AXIS_CALIB_POSITIONS, AXIS_CALIB_STEPS_PER_POSITION
+)
 from app.config.exceptions import CameraReadError
-from app.core.generator import frame_generator
+from app.core.background import BackgroundModel
+from app.core.calibration import LaserPlaneCalibrator
+from app.core.display import DisplayPipeline
+from app.core.export import export_ply
+from app.core.generator import frame_generator, ScanProcessor
+from app.core.live import LivePipeline
+from app.core.proc import rectify_gray
+from app.core.scheduler import ScanScheduler
+from app.core.session import SessionReplay
+from app.core.storage import PointStore
+from app.core.turntable import AxisCalibrator
+from app.core.utils import roi_polygon
+from app.core.voxel import VoxelGrid
 from app.view.scan_view import ScanGUI
 import tkinter as tk
 from app.config.logger import logger
@@ -19,9 +36,24 @@ class Scanner(ScanGUI):
         self.running               = False
         self.frame_gen             = None
         self.thread                = None
+        self.display               = DisplayPipeline()
+        self.display_job           = None
+        self.task_stop             = threading.Event()
+        self.point_store           = None
+        self.pose_request          = threading.Event()
+        self.live_stop             = threading.Event()
+
+        # Imagem única da viewport: os quadros são colados nela em vez de criar uma nova.
+        self.view_photo = ImageTk.PhotoImage(Image.fromarray(BLACK_FRAME))
+        self.label_view.config(image=self.view_photo) # type: ignore
+        self.label_view.image = self.view_photo
 
         self.button_connect.config(command=self.connect_devices)
         self.button_reference.config(command=self.set_references)
+        self.button_axis.config(command=self.calibrate_axis)
+        self.button_scan.config(command=self.start_scanning)
+        self.button_export.config(command=self.export_cloud)
+        self.button_record.config(command=self.toggle_recording)
 
 
     def connect_devices(self):
@@ -49,7 +81,7 @@ class Scanner(ScanGUI):
                 if self.hardware.camera_index is None:
                     self.set_status("Selecione uma câmera válida!")
                     raise CameraReadError("Índice da câmera não definido")
-                self.hardware.camera_instance = cv2.VideoCapture(self.hardware.camera_index)
+                self.hardware.camera_instance = cv2.VideoCapture(self.hardware.camera_index, self.hardware.camera_backend)
                 self.set_progress(20)
 
                 if not self.hardware.camera_instance.isOpened():
@@ -98,6 +130,9 @@ class Scanner(ScanGUI):
 
     def disconnect_all(self):
         self.hardware.lock = True
+        self.task_stop.set()
+        self._stop_recording()
+        self.stop_if_running()
         self._show_frame(BLACK_FRAME)
 
         self.datadisplay.btn_open_file.config(state=tk.NORMAL)
@@ -111,7 +146,8 @@ class Scanner(ScanGUI):
                 try:
                     if hasattr(self.hardware, "camera_running"):
                         self.hardware.camera_running = False
-                    cap.release()
+                    # Via release_camera: uma sessão reproduzida devolve a política de captura.
+                    self.hardware.release_camera()
                 except Exception as e:
                     logger.error("Erro ao liberar camera: %s", e)
         except Exception:
@@ -160,6 +196,8 @@ class Scanner(ScanGUI):
             pass
 
         self.hardware.plane_constants = None
+        self.hardware.axis_origin = self.hardware.axis_direction = None
+        self.hardware.set_roi(None)
 
         try:
             self.hardware.lock = False
@@ -177,37 +215,417 @@ class Scanner(ScanGUI):
         self.frame_gen = frame_generator(self.hardware, stop_event=self.stop_event)
         self.thread    = threading.Thread(target=self._capture_loop, daemon=True)
         self.thread.start()
+        self._start_display()
 
     def stop_stream(self):
         self.stop_event.set()
         self.running = False
+        self._stop_display()
+
+    def _start_display(self):
+        self.display.start()
+        if self.display_job is None:
+            # start_stream roda na thread de conexão: a colagem precisa acontecer na do Tk.
+            self.display_job = self.after(0, self._display_tick) # type: ignore
+
+    def _stop_display(self):
+        self.display.stop()
+        if self.display_job is not None:
+            self.after_cancel(self.display_job)
+            self.display_job = None
+
+    def _display_tick(self):
+        """ Cola na viewport o quadro mais recente preparado pelo DisplayPipeline. """
+        with self.display.frame() as rgb:
+            if rgb is not None:
+                self.view_photo.paste(Image.fromarray(rgb))
+        self.display_job = self.after(self.display.interval_ms, self._display_tick) # type: ignore
 
     def _capture_loop(self):
         try:
             for stream in self.frame_gen:
-                if self.stop_event.is_set():
-                    break
-                self.label_view.after(0, self._show_frame, stream.frame)
-                if (stream.progress_proc >= 1.0 and
-                        stream.progress_capt >= 1.0 and
-                        self.laser_plane_constants is None):
-                    self.laser_plane_constants = stream.resource
-                time.sleep(0.1)
+                with stream:
+                    if self.stop_event.is_set():
+                        break
+                    self.display.submit(stream.frame)
+                    if (stream.progress_proc >= 1.0 and
+                            stream.progress_capt >= 1.0 and
+                            self.laser_plane_constants is None):
+                        self.laser_plane_constants = stream.resource
         except Exception as err:
             logger.error(f"Capture error: {err}")
             # self.after(0, lambda: messagebox.showerror("Erro de Captura", str(err))) # type: ignore
         finally:
-            self.after(10, self.stop_stream) # type: ignore
+            # Parada externa já passou por stop_stream; reagendar aqui derrubaria a viewport
+            # que uma tarefa (_run_task) acabou de religar.
+            if not self.stop_event.is_set():
+                self.after(10, self.stop_stream) # type: ignore
 
     def _show_frame(self, frame):
+        """ Exibe um quadro diretamente (fora do streaming, ex.: tela preta ao desconectar). """
         img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img_pil = Image.fromarray(img_rgb).resize((CAMERA_VIEWPORT_WIDTH, CAMERA_VIEWPORT_HEIGHT))
-        photo   = ImageTk.PhotoImage(img_pil)
-        self.label_view.config(image=photo) # type: ignore
-        self.label_view.image = photo
+        if img_rgb.shape[:2] != (CAMERA_VIEWPORT_HEIGHT, CAMERA_VIEWPORT_WIDTH):
+            img_rgb = cv2.resize(img_rgb, (CAMERA_VIEWPORT_WIDTH, CAMERA_VIEWPORT_HEIGHT), interpolation=cv2.INTER_AREA)
+        self.view_photo.paste(Image.fromarray(img_rgb))
+
+    def _run_task(self, work):
+        """
+        Executa ``work`` em uma thread com a câmera livre: o ``ScanScheduler`` abre o seu
+        próprio FrameGrabber, então a pré-visualização para antes e volta ao final (a menos
+        que ``task_stop`` tenha sido acionado, ex.: ao desconectar).
+        """
+        self.stop_if_running()
+        capture_thread = self.thread
+        # Evento próprio: o stop_stream reagendado pelo _capture_loop não interrompe a tarefa.
+        self.task_stop = stop = threading.Event()
+
+        def target():
+            try:
+                if capture_thread is not None:
+                    capture_thread.join(timeout=2.0)
+                # A viewport segue ativa para as prévias da tarefa (DisplayPipeline.submit).
+                self.after(0, self._start_display) # type: ignore
+                work(stop)
+            finally:
+                self.reset_progress()
+                self.after(0, self._stop_display if stop.is_set() else self.start_stream) # type: ignore
+
+        threading.Thread(target=target, daemon=True).start()
 
     def set_references(self):
-        pass
+        """
+        Calibra o plano laser com o motor parado. Cada pose é confirmada pelo usuário: o
+        botão de referências vira "Capturar Pose" e a viewport segue ao vivo enquanto o
+        tabuleiro é reposicionado; só depois do clique o ``ScanScheduler`` captura o par
+        laser desligado/ligado já estabilizado e o ``LaserPlaneCalibrator`` acumula os pontos
+        (poses repetidas são descartadas). Com ``PLANE_CALIB_POSES`` poses aceitas o plano é
+        ajustado por RANSAC. A primeira pose aceita é a de referência: o retângulo da ROI do
+        marcador é calculado uma vez a partir dela e usado por toda a varredura.
+        """
+        if self.calibrating or self.scanning or self.hardware.k_opt is None:
+            return
+        self.calibrating = True
+
+        calibrator = LaserPlaneCalibrator(self.hardware.k_opt, self.hardware.map_one, self.hardware.map_two)
+        poses = PLANE_CALIB_POSES
+        finished = threading.Event()
+        mirror = None
+        prompted, note = None, ""
+
+        def update_button():
+            self.button_reference.config(
+                text=f"Capturar Pose ({calibrator.poses + 1}/{poses})", command=self.pose_request.set, state=tk.NORMAL
+            )
+
+        def gate(k, frame):
+            nonlocal mirror, prompted
+            if self.task_stop.is_set() or calibrator.poses >= poses:
+                finished.set()
+                return True
+            if prompted != calibrator.poses:
+                prompted = calibrator.poses
+                self.pose_request.clear()
+                self.after(0, update_button) # type: ignore
+                if calibrator.poses == 0:
+                    self.set_status(
+                        f"{note}Pose 1/{poses}: coloque o tabuleiro na posição de escaneamento (referência) "
+                        "e clique em Capturar Pose."
+                    )
+                else:
+                    self.set_status(
+                        f"{note}Pose {calibrator.poses + 1}/{poses}: mova o tabuleiro (altura/inclinação) "
+                        "e clique em Capturar Pose."
+                    )
+            if mirror is None or mirror.shape != frame.shape:
+                mirror = np.empty_like(frame)
+            self.display.submit(cv2.flip(frame, 1, dst=mirror))
+            if not self.pose_request.is_set():
+                return False
+            self.pose_request.clear()
+            self.after(0, lambda: self.button_reference.config(state=tk.DISABLED)) # type: ignore
+            return True
+
+        def on_result(position, accepted):
+            nonlocal prompted, note
+            self.set_progress(100 * calibrator.poses / poses)
+            note = "" if accepted else "Pose descartada (marcador não encontrado, linha curta ou tabuleiro parado). "
+            # Refaz o aviso da próxima pose mesmo se esta foi descartada.
+            prompted = None
+
+        def work(stop):
+            try:
+                self.set_progress(0)
+                scheduler = ScanScheduler(
+                    self.hardware, calibrator.add_pose, positions=PLANE_CALIB_MAX_ATTEMPTS,
+                    steps_per_position=0, on_result=on_result, max_inflight=1, gate=gate
+                )
+                scheduler.run(finished)
+                if stop.is_set():
+                    return
+                self.hardware.plane_constants = calibrator.fit()
+                rvec, tvec = calibrator.reference
+                self.hardware.set_roi(roi_polygon(
+                    rvec, tvec, calibrator.k_opt, np.zeros(5), ROI_EXTEND_MM, calibrator.marker_length
+                ))
+                self.set_status(f"Plano laser calibrado com {calibrator.poses} pose(s) (RMS {calibrator.rms:.3f} mm).")
+            except Exception as e:
+                logger.error(f"Falha na calibração do plano laser: {e}")
+                self.set_status("Falha na calibração do plano laser.")
+            finally:
+                self.calibrating = False
+                self.after(0, lambda: self.button_reference.config(text="Definir Referências")) # type: ignore
+
+        self._run_task(work)
+
+    def calibrate_axis(self):
+        """
+        Calibra o eixo da mesa giratória: com o marcador de referência preso à mesa, o
+        ``ScanScheduler`` gira ``AXIS_CALIB_STEPS_PER_POSITION`` passos por vista e o
+        ``AxisCalibrator`` registra a posição do marcador em cada passo; o círculo descrito
+        dá o eixo (``Scanner.axis_origin``/``axis_direction``), usado pelo ``ScanProcessor``
+        para juntar as vistas da varredura no referencial do objeto.
+        """
+        if self.calibrating or self.scanning or self.hardware.k_opt is None:
+            return
+        self.calibrating = True
+        self.button_axis.config(state=tk.DISABLED)
+        calibrator = AxisCalibrator(self.hardware.k_opt, self.hardware.map_one, self.hardware.map_two)
+
+        def on_result(position, found):
+            self.set_progress(100 * (len(calibrator.centers) + calibrator.rejected) / AXIS_CALIB_POSITIONS)
+            self.set_status(f"Calibrando eixo: marcador em {len(calibrator.centers)} vista(s)")
+
+        def work(stop):
+            try:
+                self.set_status("Calibrando eixo da mesa: prenda o marcador de referência à mesa.")
+                self.set_progress(0)
+                scheduler = ScanScheduler(
+                    self.hardware, calibrator.add_view, positions=AXIS_CALIB_POSITIONS,
+                    steps_per_position=AXIS_CALIB_STEPS_PER_POSITION, on_result=on_result,
+                    require_change_on_move=False
+                )
+                scheduler.run(stop)
+                if stop.is_set():
+                    return
+                origin, direction, rms = calibrator.fit()
+                self.hardware.axis_origin, self.hardware.axis_direction = origin, direction
+                self.set_status(f"Eixo da mesa calibrado (RMS {rms:.3f} mm).")
+            except Exception as e:
+                logger.error(f"Falha na calibração do eixo: {e}")
+                self.set_status("Falha na calibração do eixo.")
+            finally:
+                self.calibrating = False
+
+        self._run_task(work)
 
     def start_scanning(self):
-        pass
\ No newline at end of file
+        """
+        Varredura com o ``ScanScheduler``: o motor avança ``SCAN_STEPS_PER_POSITION`` passos
+        por posição e o ``ScanProcessor`` extrai o laser na ROI de referência e triangula
+        cada par; o fundo com laser desligado vem de um ``BackgroundModel`` capturado a cada
+        ``BACKGROUND_SPACING`` posições. Os pontos ficam em um ``PointStore`` com o passo de cada perfil e em um
+        ``VoxelGrid``, que alimenta a prévia na viewport e a exportação.
+        """
+        if self.scanning or self.calibrating or self.hardware.plane_constants is None:
+            return
+        if self.live_mode.get():
+            self._scan_live()
+            return
+        try:
+            processor = ScanProcessor(self.hardware, grid=VoxelGrid(), on_preview=self.display.submit)
+        except RuntimeError as e:
+            self.set_status(str(e))
+            return
+        self.scanning = True
+        self.button_scan.config(state=tk.DISABLED)
+        if self.point_store is not None:
+            self.point_store.close()
+        self.point_store = processor.store = PointStore()
+        self.voxel_grid = processor.grid
+        self.scan_mesh = processor.mesher
+
+        def on_result(position, count):
+            self.set_progress(100 * processor.profiles / SCAN_POSITIONS)
+            self.set_status(f"Escaneando: {processor.profiles}/{SCAN_POSITIONS} perfil(s), {processor.points} ponto(s)")
+
+        def work(stop):
+            try:
+                self.set_status("Escaneando...")
+                self.set_progress(0)
+                scheduler = ScanScheduler(
+                    self.hardware, processor, positions=SCAN_POSITIONS,
+                    steps_per_position=SCAN_STEPS_PER_POSITION, on_result=on_result,
+                    background=BackgroundModel(spacing=BACKGROUND_SPACING * SCAN_STEPS_PER_POSITION)
+                )
+                scheduler.run(stop)
+                self.point_store.flush()
+                self.set_status(f"Escaneamento concluído: {processor.points} ponto(s) em {processor.profiles} perfil(s).")
+            except Exception as e:
+                logger.error(f"Falha no escaneamento: {e}")
+                self.set_status("Falha no escaneamento.")
+            finally:
+                self.scanning = False
+
+        self._run_task(work)
+
+    def _scan_live(self):
+        """
+        Modo ao vivo: o ``LivePipeline`` lê a câmera em um processo próprio e divide
+        retificação, extração e triangulação entre vários processos, com o laser ligado e a
+        mesa parada. Os pontos vão para um ``PointStore`` e um ``VoxelGrid`` novos, no
+        referencial da câmera: os quadros não trazem o passo do motor, então não há junção
+        das vistas nem malha. O fundo é um quadro com laser desligado capturado antes pelo
+        ``ScanScheduler`` ou, em uma sessão reproduzida, o primeiro quadro gravado com o laser
+        desligado. Roda até "Parar Escaneamento" ou até o fim da sessão.
+        """
+        hw = self.hardware
+        replay = hw.camera_instance if isinstance(hw.camera_instance, SessionReplay) else None
+        self.scanning = True
+        self.button_scan.config(state=tk.DISABLED)
+        if self.point_store is not None:
+            self.point_store.close()
+        store = self.point_store = PointStore()
+        self.voxel_grid = VoxelGrid()
+        self.scan_mesh = None
+        self.live_stop = halt = threading.Event()
+
+        def show_progress():
+            pipeline = self.live_pipeline
+            if pipeline is None:
+                return
+            if replay is not None and replay.count:
+                self.set_progress(100 * pipeline.frames_processed / replay.count)
+            self.set_status(
+                f"Ao vivo: {pipeline.frames_processed} quadro(s), {pipeline.frames_dropped} descartado(s), "
+                f"{pipeline.points_total} ponto(s)"
+            )
+
+        def on_points(seq, xyz):
+            # Chamado na thread coletora do LivePipeline: a interface é atualizada na do Tk.
+            self.after(0, show_progress) # type: ignore
+
+        def work(stop):
+            background = np.empty((FRAME_RESOLUTION[1], FRAME_RESOLUTION[0]), dtype=np.uint8)
+            try:
+                self.set_status("Capturando o fundo...")
+                if replay is None:
+                    ScanScheduler(
+                        hw, lambda bg, fg, position: rectify_gray(hw.map_one, hw.map_two, bg, background),
+                        positions=1, steps_per_position=0
+                    ).run(stop)
+                    source = hw.camera_index
+                else:
+                    source = replay.path
+                    session = SessionReplay(source)
+                    try:
+                        off = next((i for i in range(session.count) if not session.frame(i)[1]["laser"]), None)
+                        if off is None:
+                            raise RuntimeError("Sessão sem quadro com laser desligado para o fundo.")
+                        rectify_gray(hw.map_one, hw.map_two, session.frame(off)[0], background)
+                    finally:
+                        session.release()
+                if stop.is_set() or halt.is_set():
+                    return
+
+                pipeline = LivePipeline(
+                    source, hw.k_opt, hw.map_one, hw.map_two, hw.plane_constants,
+                    roi=hw.roi_rect, roi_mask=hw.roi_mask, backend=hw.camera_backend,
+                    store=store, grid=self.voxel_grid, on_points=on_points
+                )
+                laser = None
+                if replay is None:
+                    # O processo de captura abre a câmera por índice: o dispositivo precisa estar livre.
+                    hw.camera_instance.release()
+                    laser = hw.firmata_instance.get_pin(LSR_PIN_STR)
+                    laser.write(1)
+                    hw.laser_on = True
+                try:
+                    pipeline.start(background)
+                    self.live_pipeline = pipeline
+                    while pipeline.running and not stop.is_set() and not halt.wait(0.1):
+                        pass
+                    if not pipeline.running:
+                        pipeline.wait()
+                finally:
+                    self.live_pipeline = None
+                    if laser is not None:
+                        laser.write(0)
+                        hw.laser_on = False
+                    pipeline.stop()
+                    if replay is None and not stop.is_set():
+                        hw.camera_instance.open(hw.camera_index, hw.camera_backend)
+                        hw.camera_instance.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+                        hw.camera_instance.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+                store.flush()
+                self.set_status(
+                    f"Modo ao vivo encerrado: {pipeline.points_total} ponto(s) em {pipeline.frames_processed} quadro(s)."
+                )
+            except Exception as e:
+                logger.error(f"Falha no modo ao vivo: {e}")
+                self.set_status("Falha no modo ao vivo.")
+            finally:
+                self.scanning = False
+
+        self._run_task(work)
+
+    def stop_scanning(self):
+        """ Encerra o modo ao vivo; a câmera volta à pré-visualização. """
+        self.live_stop.set()
+
+    def export_cloud(self):
+        """
+        Grava em PLY a nuvem subamostrada (centroides do ``VoxelGrid``) do último
+        escaneamento e, se houver triângulos, a malha do ``ProfileMesher`` em
+        ``<nome>_malha.ply``.
+        """
+        if self.scanning or self.voxel_grid is None:
+            return
+        path = filedialog.asksaveasfilename(
+            title="Exportar nuvem",
+            defaultextension=".ply",
+            filetypes=[("PLY", "*.ply"), ("Todos", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            count = export_ply(path, self.voxel_grid.centroids())
+            faces = 0
+            if self.scan_mesh is not None and self.scan_mesh.face_count:
+                faces = self.scan_mesh.export(f"{os.path.splitext(path)[0]}_malha.ply")
+        except OSError as e:
+            logger.exception("Falha ao exportar a nuvem")
+            messagebox.showerror("Erro", f"Não foi possível exportar a nuvem:\n{e}")
+            return
+        self.set_status(f"Nuvem exportada: {count} ponto(s) em {path}" + (f", malha com {faces} triângulo(s)" if faces else ""))
+
+    def toggle_recording(self):
+        """
+        Liga/desliga a gravação dos quadros brutos em uma sessão. Os pares laser
+        desligado/ligado do ``ScanScheduler`` (e os quadros da pré-visualização) vão para a
+        pasta escolhida e podem ser reprocessados com ``python -m app.offline``.
+        """
+        if self.hardware.recorder is not None:
+            self._stop_recording()
+            return
+        path = filedialog.askdirectory(title="Pasta da sessão gravada", mustexist=False)
+        if not path:
+            return
+        try:
+            self.hardware.start_recording(path)
+        except OSError as e:
+            logger.exception("Falha ao iniciar a gravação")
+            messagebox.showerror("Erro", f"Não foi possível gravar a sessão:\n{e}")
+            return
+        self.button_record.config(text="Parar Gravação")
+        self.set_status(f"Gravando sessão em {path}")
+
+    def _stop_recording(self):
+        recorder = self.hardware.recorder
+        if recorder is None:
+            return
+        try:
+            self.hardware.stop_recording()
+        except Exception:
+            logger.exception("Falha ao encerrar a gravação")
+        self.button_record.config(text="Gravar Sessão")
+        self.set_status(f"Sessão gravada em {recorder.path}: {recorder.count} quadro(s)")
@@ -0,0 +1,267 @@
+"""
+Benchmark ponta a ponta sobre a bancada virtual.
+
+Uso:
+    python -m app.sim.bench [--frames N] [--positions N] [--noise SIGMA] [--json arquivo]
+
+Mede a vazão de ``frame_generator`` e ``scan`` com a ``VirtualCamera``, a latência de
+cada etapa da cadeia de ``proc.py`` (captura, retificação, extração do laser,
+triangulação e malha por perfis) em uma varredura liga/desliga controlada pela
+``FakeBoard``, o erro dos pontos triangulados em relação à superfície de referência e o
+tempo total de uma varredura com o ``ScanScheduler`` (com e sem ``BackgroundModel``)
+comparado à espera fixa de ``LASER_TOGGLE_DELAY``, a exatidão de ``backproject_batch``
+contra ``backproject``/``camera_to_board`` em float64 e a junção de uma volta completa de
+mesa giratória com o ``TurntableMerger``.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import numpy as np
+from app.config.constants import LSR_PIN_STR, DIR_PIN_STR, STP_PIN_STR, LASER_TOGGLE_DELAY, TURNTABLE_STEPS_PER_REV
+from app.config.logger import logger
+from app.core.background import BackgroundModel
+from app.core.mesh import ProfileMesher
+from app.core.generator import frame_generator, scan
+from app.core.proc import (
+    precompute, rectify_gray, laser_peaks, backproject, backproject_batch, camera_to_board, rodrigues_batch
+)
+from app.core.scanner_config import Scanner
+from app.core.scheduler import ScanScheduler
+from app.core.turntable import TurntableMerger
+from app.sim.rig import FakeBoard, VirtualCamera
+
+# Desvio máximo aceito entre o caminho float32 em lote e backproject/camera_to_board em float64.
+TRIANGULATION_TOLERANCE_MM = 1e-2
+
+
+def make_scanner(noise: float = 2.0, fps: float | None = None) -> Scanner:
+    """ ``Scanner`` conectado à bancada virtual, com calibração e mapas prontos. """
+    board = FakeBoard()
+    camera = VirtualCamera(board, noise=noise, fps=fps)
+    scanner = Scanner()
+    scanner.camera_index, scanner.camera_name, scanner.firmata_port = 0, "VirtualCamera", board.port
+    scanner.camera_instance, scanner.firmata_instance = camera, board
+    scanner.camera_matrix, scanner.dist_coeffs = camera.camera_matrix, camera.dist_coeffs
+    return scanner
+
+
+def _summary(samples: list) -> dict:
+    arr = np.asarray(samples) * 1e3
+    return {
+        "mean_ms": float(arr.mean()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+    }
+
+
+def bench_generator(factory, scanner: Scanner, frames: int) -> dict:
+    stop_event = threading.Event()
+    gen = factory(scanner, stop_event)
+    next(gen).release()
+    start = time.perf_counter()
+    for _ in range(frames):
+        next(gen).release()
+    elapsed = time.perf_counter() - start
+    stop_event.set()
+    gen.close()
+    return {"frames": frames, "fps": frames / elapsed, **scanner.grabber.stats()}
+
+
+def bench_chain(scanner: Scanner, positions: int) -> dict:
+    camera, board = scanner.camera_instance, scanner.firmata_instance
+    laser, direction, step = (board.get_pin(p) for p in (LSR_PIN_STR, DIR_PIN_STR, STP_PIN_STR))
+    direction.write(1)
+
+    k_opt, _, map1, map2 = precompute(camera.camera_matrix, camera.dist_coeffs, (camera.width, camera.height))
+    bg = np.empty((camera.height, camera.width), dtype=np.uint8)
+    fg = np.empty_like(bg)
+    scratch = np.empty_like(bg)
+    raw = np.empty((camera.height, camera.width, 3), dtype=np.uint8)
+    offsets = np.zeros(2, dtype=np.int64)
+    times = {"capture": [], "rectify": [], "extraction": [], "triangulation": [], "meshing": []}
+    mesher = ProfileMesher(camera.width)
+    errors, points = [], 0
+
+    start = time.perf_counter()
+    for _ in range(positions):
+        step.write(1)
+        step.write(0)
+        position = board.position
+
+        for on, dst in ((False, bg), (True, fg)):
+            laser.write(on)
+            t0 = time.perf_counter()
+            camera.read(raw)
+            t1 = time.perf_counter()
+            rectify_gray(map1, map2, raw, dst, scratch)
+            t2 = time.perf_counter()
+            times["capture"].append(t1 - t0)
+            times["rectify"].append(t2 - t1)
+
+        t0 = time.perf_counter()
+        pts = laser_peaks(bg, fg)
+        t1 = time.perf_counter()
+        offsets[1] = len(pts)
+        xyz = backproject_batch(
+            pts, offsets, camera.laser_plane_camera(position)[None], k_opt,
+            camera.rvec[None], camera.tvec[None]
+        )
+        t2 = time.perf_counter()
+        mesher.add_profile(xyz, pts[:, 0])
+        t3 = time.perf_counter()
+        times["extraction"].append(t1 - t0)
+        times["triangulation"].append(t2 - t1)
+        times["meshing"].append(t3 - t2)
+
+        # Erro em relação à superfície conhecida (altura do hemisfério/tabuleiro).
+        expected = camera.scene.height(xyz[:, 0], xyz[:, 1])
+        errors.append(xyz[:, 2] - expected)
+        points += len(xyz)
+    elapsed = time.perf_counter() - start
+    laser.write(0)
+
+    err = np.abs(np.concatenate(errors)) if errors else np.zeros(0)
+    return {
+        "positions": positions,
+        "positions_per_s": positions / elapsed,
+        "points": points,
+        "faces": mesher.face_count,
+        "stages": {name: _summary(samples) for name, samples in times.items()},
+        "accuracy_mm": {
+            "rmse": float(np.sqrt((err ** 2).mean())) if err.size else float("nan"),
+            "p95": float(np.percentile(err, 95)) if err.size else float("nan"),
+            "max": float(err.max()) if err.size else float("nan"),
+        },
+    }
+
+
+def bench_scheduler(scanner: Scanner, positions: int, background: BackgroundModel | None = None) -> dict:
+    def process(bg, fg, position):
+        return len(laser_peaks(bg[..., 2], fg[..., 2]))
+
+    scheduler = ScanScheduler(scanner, process, positions, background=background)
+    points = sum(scheduler.run())
+    legacy = positions * 2 * LASER_TOGGLE_DELAY
+    return {
+        "positions": positions,
+        "points": points,
+        "total_s": scheduler.elapsed,
+        "per_position_ms": scheduler.elapsed / positions * 1e3,
+        "captures_per_position": scheduler.captures / positions,
+        "settle_timeouts": scheduler.settle_timeouts,
+        "legacy_total_s": legacy,
+        "speedup": legacy / scheduler.elapsed,
+    }
+
+
+def bench_triangulation(frames: int = 2000, points_per_frame: int = 1000) -> dict:
+    """
+    ``backproject_batch`` (float32, lote) contra ``backproject`` + ``camera_to_board``
+    (float64, quadro a quadro) na geometria da bancada virtual; falha se o desvio máximo
+    passar de ``TRIANGULATION_TOLERANCE_MM``.
+    """
+    rng = np.random.default_rng(0)
+    camera = VirtualCamera(noise=0.0)
+    k = camera.camera_matrix
+    counts = rng.integers(points_per_frame // 2, points_per_frame + 1, frames)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    pts2d = np.column_stack((
+        rng.uniform(0, camera.width, offsets[-1]), rng.uniform(camera.height * 0.3, camera.height, offsets[-1])
+    ))
+    planes = np.stack([camera.laser_plane_camera(f % 200) for f in range(frames)])
+    rvecs = camera.rvec + rng.normal(0.0, 0.01, (frames, 3))
+    tvecs = camera.tvec + rng.normal(0.0, 5.0, (frames, 3))
+
+    start = time.perf_counter()
+    reference = np.concatenate([
+        camera_to_board(backproject(pts2d[offsets[f]:offsets[f + 1]], planes[f], k), rvecs[f], tvecs[f])
+        for f in range(frames)
+    ])
+    t_reference = time.perf_counter() - start
+
+    out = np.empty((offsets[-1], 3), dtype=np.float32)
+    pts32 = pts2d.astype(np.float32)
+    start = time.perf_counter()
+    backproject_batch(pts32, offsets, planes, k, rvecs, tvecs, out=out)
+    t_batch = time.perf_counter() - start
+
+    deviation = float(np.abs(out - reference).max())
+    assert deviation <= TRIANGULATION_TOLERANCE_MM, (
+        f"backproject_batch desvia {deviation:.2e} mm do caminho float64 (limite {TRIANGULATION_TOLERANCE_MM} mm)"
+    )
+    return {
+        "frames": frames,
+        "points": int(offsets[-1]),
+        "float64_ms": t_reference * 1e3,
+        "batch_ms": t_batch * 1e3,
+        "speedup": t_reference / t_batch,
+        "max_deviation_mm": deviation,
+    }
+
+
+def bench_turntable(points_per_profile: int = 1000, steps_per_rev: int = TURNTABLE_STEPS_PER_REV) -> dict:
+    """ Volta completa com um perfil por passo: erro e tempo da junção no referencial do objeto. """
+    rng = np.random.default_rng(0)
+    axis = np.array([0.0, -0.87, 0.5])
+    axis /= np.linalg.norm(axis)
+    origin = np.array([0.0, -20.0, 650.0])
+    counts = rng.integers(points_per_profile // 2, points_per_profile + 1, steps_per_rev)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    steps = np.arange(steps_per_rev)
+
+    # Objeto conhecido girado de cada passo, como a câmera o veria.
+    obj = rng.normal(0.0, 50.0, (int(offsets[-1]), 3)) + origin
+    turn = rodrigues_batch((2 * np.pi * steps / steps_per_rev)[:, None] * axis)
+    seen = np.empty_like(obj)
+    for f in steps:
+        seg = slice(offsets[f], offsets[f + 1])
+        seen[seg] = (obj[seg] - origin) @ turn[f].T + origin
+    seen = seen.astype(np.float32)
+
+    merger = TurntableMerger(origin, axis, steps_per_rev)
+    out = merger.merge(seen, offsets, steps)
+    start = time.perf_counter()
+    merger.merge(seen, offsets, steps, out=out)
+    elapsed = time.perf_counter() - start
+    return {
+        "profiles": steps_per_rev,
+        "points": len(out),
+        "merge_ms": elapsed * 1e3,
+        "max_error_mm": float(np.abs(out - obj).max()),
+    }
+
+
+def run(frames: int, positions: int, noise: float) -> dict:
+    return {
+        "frame_generator": bench_generator(frame_generator, make_scanner(noise), frames),
+        "scan": bench_generator(scan, make_scanner(noise), frames),
+        "chain": bench_chain(make_scanner(noise), positions),
+        # Câmera a 60 fps: o escalonador depende do ritmo real de quadros.
+        "scheduler": bench_scheduler(make_scanner(noise, fps=60), positions),
+        "scheduler_background": bench_scheduler(make_scanner(noise, fps=60), positions, BackgroundModel()),
+        "triangulation": bench_triangulation(),
+        "turntable": bench_turntable(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.sim.bench", description="Benchmark da bancada virtual")
+    parser.add_argument("--frames", type=int, default=200, help="Quadros medidos por gerador")
+    parser.add_argument("--positions", type=int, default=200, help="Posições do motor na varredura")
+    parser.add_argument("--noise", type=float, default=2.0, help="Desvio padrão do ruído da câmera")
+    parser.add_argument("--json", help="Grava o relatório neste arquivo")
+    args = parser.parse_args(argv)
+
+    report = run(args.frames, args.positions, args.noise)
+    text = json.dumps(report, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    logger.info(f"Relatório do benchmark:\n{text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Bancada virtual para testes e benchmarks sem câmera, Arduino ou laser.
+
+``VirtualCamera`` renderiza uma cena conhecida (tabuleiro com os marcadores 42/43 e um
+hemisfério sobre ele) iluminada por um plano laser cuja posição e estado vêm de uma
+``FakeBoard`` com a mesma interface de pinos do pyFirmata2. A geometria da cena serve de
+referência para medir a exatidão dos pontos triangulados.
+"""
+import threading
+import time
+import cv2
+import numpy as np
+from app.config.constants import (
+    CAMERA_WIDTH, CAMERA_HEIGHT, LSR_PIN_STR, DIR_PIN_STR, STP_PIN_STR,
+    TARGET_MARKER_ID_42, TARGET_MARKER_ID_43
+)
+
+
+class FakePin:
+    """ Pino digital com ``write``/``read`` como ``pyfirmata2.Pin``. """
+
+    def __init__(self, board: "FakeBoard", spec: str):
+        self.board = board
+        self.spec = spec
+        self.value = 0
+
+    def write(self, value) -> None:
+        previous, self.value = self.value, int(bool(value))
+        self.board._on_write(self.spec, previous, self.value)
+
+    def read(self):
+        return self.value
+
+
+class FakeBoard:
+    """
+    Substituto do ``pyfirmata2.Arduino`` que aceita os pinos ``LSR_PIN_STR``,
+    ``DIR_PIN_STR`` e ``STP_PIN_STR``.
+
+    Cada borda de subida no pino de passo move o motor uma posição no sentido dado pelo pino
+    de direção; o estado do laser e a posição ficam disponíveis para a ``VirtualCamera``.
+    """
+
+    PINS = (LSR_PIN_STR, DIR_PIN_STR, STP_PIN_STR)
+
+    def __init__(self, port: str = "SIM"):
+        self.port = port
+        self.position = 0
+        self.writes = 0
+        self._pins: dict = {}
+        self._lock = threading.Lock()
+
+    def get_pin(self, spec: str) -> FakePin:
+        if spec not in self.PINS:
+            raise ValueError(f"Pino não suportado pela bancada virtual: {spec}")
+        if spec not in self._pins:
+            self._pins[spec] = FakePin(self, spec)
+        return self._pins[spec]
+
+    @property
+    def laser_on(self) -> bool:
+        pin = self._pins.get(LSR_PIN_STR)
+        return bool(pin and pin.value)
+
+    def _on_write(self, spec: str, previous: int, value: int) -> None:
+        with self._lock:
+            self.writes += 1
+            if spec == STP_PIN_STR and value and not previous:
+                direction = self._pins.get(DIR_PIN_STR)
+                self.position += 1 if direction is None or direction.value else -1
+
+    def exit(self) -> None:
+        self._pins.clear()
+
+
+class VirtualScene:
+    """
+    Cena de referência no referencial do tabuleiro (milímetros, z para cima).
+
+    O objeto é um hemisfério de raio ``radius`` centrado em ``center``; o laser é o plano
+    vertical ``y = y_start + posição * step_mm``, varrendo o tabuleiro ao longo de y.
+    """
+
+    def __init__(
+            self,
+            radius: float = 60.0,
+            center: tuple = (0.0, 0.0),
+            y_start: float = -100.0,
+            step_mm: float = 1.0
+    ):
+        self.radius = radius
+        self.center = np.asarray(center, dtype=np.float64)
+        self.y_start = y_start
+        self.step_mm = step_mm
+
+    def height(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        r2 = (x - self.center[0]) ** 2 + (y - self.center[1]) ** 2
+        return np.sqrt(np.clip(self.radius ** 2 - r2, 0.0, None))
+
+    def laser_y(self, position: int) -> float:
+        return self.y_start + position * self.step_mm
+
+    def laser_plane(self, position: int) -> np.ndarray:
+        """ Plano do laser (a, b, c, d) no referencial do tabuleiro. """
+        return np.array([0.0, 1.0, 0.0, -self.laser_y(position)])
+
+    def laser_curve(self, position: int, x_range: tuple, samples: int) -> np.ndarray:
+        x = np.linspace(x_range[0], x_range[1], samples)
+        y = np.full_like(x, self.laser_y(position))
+        return np.column_stack((x, y, self.height(x, y)))
+
+
+class VirtualCamera:
+    """
+    Câmera simulada com a interface de ``cv2.VideoCapture`` (``read``, ``isOpened``,
+    ``get``, ``set``, ``release``).
+
+    A imagem estática (tabuleiro texturizado e marcadores) é renderizada uma vez; a cada
+    ``read()`` somam-se a linha laser, se o laser da ``board`` estiver ligado, e um ruído
+    gaussiano tirado de um pequeno banco pré-gerado.
+    """
+
+    def __init__(
+            self,
+            board: FakeBoard | None = None,
+            scene: VirtualScene | None = None,
+            noise: float = 2.0,
+            laser_gain: float = 180.0,
+            laser_sigma: float = 1.2,
+            fps: float | None = None,
+            seed: int = 0
+    ):
+        self.board = board if board is not None else FakeBoard()
+        self.scene = scene if scene is not None else VirtualScene()
+        self.width, self.height = CAMERA_WIDTH, CAMERA_HEIGHT
+        self.camera_matrix = np.array([
+            [1000.0,    0.0, self.width / 2],
+            [   0.0, 1000.0, self.height / 2],
+            [   0.0,    0.0, 1.0]
+        ])
+        self.dist_coeffs = np.zeros(5)
+        # Câmera a ~650 mm, olhando para o tabuleiro com 30° de inclinação.
+        self.rvec = np.array([np.pi - np.radians(30.0), 0.0, 0.0])
+        self.tvec = np.array([0.0, -20.0, 650.0])
+        self.rotation, _ = cv2.Rodrigues(self.rvec)
+
+        self.laser_gain = laser_gain
+        self.laser_sigma = laser_sigma
+        self.frame_interval = 1.0 / fps if fps else 0.0
+        self.frames_read = 0
+        self._opened = True
+        self._last_read = 0.0
+
+        rng = np.random.default_rng(seed)
+        base = self._render_board(rng).astype(np.int16)
+        # Banco de quadros-base já com ruído: cada leitura é uma única cópia.
+        self._bases = [
+            np.clip(base + rng.normal(0.0, noise, (self.height, self.width, 1)), 0, 255).astype(np.uint8)
+            for _ in range(4 if noise > 0 else 1)
+        ]
+        self._layer = np.zeros((self.height, self.width), dtype=np.float32)
+
+    def _render_board(self, rng: np.random.Generator) -> np.ndarray:
+        px_per_mm, size = 2.0, np.array([400.0, 300.0])
+        tex_w, tex_h = (size * px_per_mm).astype(int)
+        texture = rng.integers(90, 130, (tex_h, tex_w), dtype=np.uint8)
+        texture = cv2.GaussianBlur(texture, (0, 0), 2.0)
+
+        dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
+        for marker_id, side_mm, center_mm in (
+                (TARGET_MARKER_ID_43, 144.0, (-110.0, 60.0)),
+                (TARGET_MARKER_ID_42, 80.0, (140.0, -90.0))
+        ):
+            side = int(side_mm * px_per_mm)
+            marker = cv2.aruco.generateImageMarker(dictionary, marker_id, side, borderBits=1)
+            cx, cy = (np.array(center_mm) + size / 2) * px_per_mm
+            x0, y0 = int(cx - side / 2), int(tex_h - cy - side / 2)
+            texture[y0:y0 + side, x0:x0 + side] = marker
+
+        # Pixel da textura -> ponto do tabuleiro (mm, y para cima) -> imagem.
+        tex_to_board = np.array([
+            [1.0 / px_per_mm, 0.0, -size[0] / 2],
+            [0.0, -1.0 / px_per_mm, size[1] / 2],
+            [0.0, 0.0, 1.0]
+        ])
+        board_to_img = self.camera_matrix @ np.column_stack(
+            (self.rotation[:, 0], self.rotation[:, 1], self.tvec)
+        )
+        gray = cv2.warpPerspective(
+            texture, board_to_img @ tex_to_board, (self.width, self.height),
+            flags=cv2.INTER_LINEAR, borderValue=40
+        )
+        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+    def board_to_camera_plane(self, plane: np.ndarray) -> np.ndarray:
+        """ Converte um plano do referencial do tabuleiro para o da câmera. """
+        n_c = self.rotation @ plane[:3]
+        return np.hstack((n_c, plane[3] - n_c @ self.tvec))
+
+    def laser_plane_camera(self, position: int | None = None) -> np.ndarray:
+        """ Plano do laser na posição dada (ou na posição atual da placa), no referencial da câmera. """
+        position = self.board.position if position is None else position
+        return self.board_to_camera_plane(self.scene.laser_plane(position))
+
+    def _draw_laser(self, frame: np.ndarray, position: int) -> None:
+        curve = self.scene.laser_curve(position, (-200.0, 200.0), 800)
+        img_pts, _ = cv2.projectPoints(curve, self.rvec, self.tvec, self.camera_matrix, self.dist_coeffs)
+        img_pts = img_pts.reshape(-1, 2)
+
+        # Renderiza só a faixa de linhas ocupada pela linha laser.
+        pad = int(np.ceil(4 * self.laser_sigma)) + 2
+        y0 = max(int(img_pts[:, 1].min()) - pad, 0)
+        y1 = min(int(img_pts[:, 1].max()) + pad + 1, self.height)
+        if y1 <= y0:
+            return
+        layer = self._layer[y0:y1]
+        layer.fill(0.0)
+        shift = 4
+        pts = np.round((img_pts - (0, y0)) * (1 << shift)).astype(np.int32).reshape(-1, 1, 2)
+        cv2.polylines(layer, [pts], False, 1.0, 1, cv2.LINE_AA, shift)
+        cv2.GaussianBlur(layer, (0, 0), self.laser_sigma, dst=layer)
+        peak = layer.max()
+        if peak <= 0:
+            return
+        layer *= self.laser_gain / peak
+
+        band = frame[y0:y1]
+        for channel, gain in ((2, 1.0), (1, 0.25)):
+            value = band[..., channel] + gain * layer
+            np.clip(value, 0, 255, out=value)
+            band[..., channel] = value
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def read(self, image: np.ndarray | None = None):
+        if not self._opened:
+            return False, None
+        if self.frame_interval:
+            wait = self._last_read + self.frame_interval - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_read = time.perf_counter()
+
+        base = self._bases[self.frames_read % len(self._bases)]
+        frame = image if image is not None and image.shape == base.shape else np.empty_like(base)
+        np.copyto(frame, base)
+        if self.board.laser_on:
+            self._draw_laser(frame, self.board.position)
+        self.frames_read += 1
+        return True, frame
+
+    def get(self, prop_id: int) -> float:
+        return {
+            cv2.CAP_PROP_FRAME_WIDTH: self.width,
+            cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+            cv2.CAP_PROP_FPS: 1.0 / self.frame_interval if self.frame_interval else 0.0,
+        }.get(prop_id, 0.0)
+
+    def set(self, prop_id: int, value: float) -> bool:
+        return prop_id in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT)
+
+    def release(self) -> None:
+        self._opened = False
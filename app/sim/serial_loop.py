@@ -0,0 +1,117 @@
+"""
+Dublês da camada serial para testar a descoberta de portas sem hardware.
+
+``LoopbackSerial`` tem a interface de ``serial.Serial`` usada por ``firmata_handshake``;
+``FakePortInfo`` e ``FakeSerialBus`` fazem o papel de ``serial.tools.list_ports``. Cada
+porta simulada pode responder como Firmata, apenas ecoar o que recebe (um laço físico TX/RX)
+ou ficar em silêncio, com um atraso de inicialização configurável.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+FIRMATA = "firmata"
+ECHO = "echo"
+SILENT = "silent"
+
+# REPORT_FIRMWARE do StandardFirmata 2.5: F0 79 maior menor "StandardFirmata.ino" (7 bits) F7.
+_FIRMWARE_NAME = "StandardFirmata.ino".encode("ascii")
+FIRMATA_VERSION_REPLY = bytes([0xF0, 0x79, 2, 5]) + bytes(b for c in _FIRMWARE_NAME for b in (c, 0)) + bytes([0xF7])
+
+
+@dataclass
+class FakePortInfo:
+    """ Mesmos campos de ``serial.tools.list_ports_common.ListPortInfo`` usados pela descoberta. """
+    device: str
+    description: str = "Dispositivo serial simulado"
+    vid: int | None = 0x2341
+    pid: int | None = 0x0043
+    serial_number: str | None = None
+
+
+class LoopbackSerial:
+    """ Porta serial simulada com ``write``, ``read``, ``read_until`` e gerenciador de contexto. """
+
+    def __init__(self, port: str, baudrate: int = 57600, timeout: float | None = None, mode: str = FIRMATA):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.mode = mode
+        self.is_open = True
+        self._rx = bytearray()
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        self.is_open = False
+
+    def write(self, data: bytes) -> int:
+        if not self.is_open:
+            raise OSError(f"Porta {self.port} fechada")
+        with self._cond:
+            if self.mode == ECHO:
+                self._rx += data
+            elif self.mode == FIRMATA and data == bytes([0xF0, 0x79, 0xF7]):
+                self._rx += FIRMATA_VERSION_REPLY
+            self._cond.notify_all()
+        return len(data)
+
+    def read_until(self, expected: bytes = b"\n", size: int | None = None) -> bytes:
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        with self._cond:
+            while True:
+                end = self._rx.find(expected) if expected else -1
+                if end >= 0:
+                    n = end + len(expected)
+                    break
+                if size is not None and len(self._rx) >= size:
+                    n = size
+                    break
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    n = len(self._rx)
+                    break
+                self._cond.wait(remaining)
+            if size is not None:
+                n = min(n, size)
+            data = bytes(self._rx[:n])
+            del self._rx[:n]
+            return data
+
+    def read(self, size: int = 1) -> bytes:
+        return self.read_until(b"", size) if size else b""
+
+
+class FakeSerialBus:
+    """
+    Conjunto de portas simuladas.
+
+    ``list_ports`` substitui ``serial.tools.list_ports.comports`` e ``open`` substitui
+    ``serial.Serial``; ``opened`` conta as aberturas por porta.
+    """
+
+    def __init__(self, ports: dict[str, str] | None = None, boot_delay: float = 0.0):
+        self.ports = dict(ports or {})
+        self.boot_delay = boot_delay
+        self.opened: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def list_ports(self) -> list[FakePortInfo]:
+        return [
+            FakePortInfo(device, serial_number=f"SIM{i:04d}")
+            for i, device in enumerate(self.ports)
+        ]
+
+    def open(self, port: str, baudrate: int = 57600, timeout: float | None = None) -> LoopbackSerial:
+        if port not in self.ports:
+            raise OSError(f"Porta inexistente: {port}")
+        with self._lock:
+            self.opened[port] = self.opened.get(port, 0) + 1
+        if self.boot_delay:
+            time.sleep(self.boot_delay)
+        return LoopbackSerial(port, baudrate, timeout, self.ports[port])
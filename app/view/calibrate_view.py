@@ -1,20 +1,138 @@
-from tkinter import ttk, messagebox
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from app.config.constants import CALIB_KEYFRAMES
+from app.config.logger import logger
+from app.core.intrinsics import calibrate_from_source
 
 
 class CalibrateGUI(ttk.Frame):
+    """
+    Calibração intrínseca da câmera a partir de uma pasta de imagens (ou sessão gravada) do
+    tabuleiro ChArUco. A calibração roda em uma thread; a detecção, em processos separados.
+    """
+
     def __init__(self, parent, controller):
         super().__init__(parent, padding=20)
         self.controller = controller
+        self.source_var = tk.StringVar()
+        self.output_var = tk.StringVar()
+        self.keyframes_var = tk.IntVar(value=CALIB_KEYFRAMES)
+        self.status_var = tk.StringVar(value="Selecione as imagens do tabuleiro ChArUco.")
+        self.result: dict | None = None
+        self.saved_path: str | None = None
+        self.running = False
         self._build_ui()
 
     def _build_ui(self):
-        ttk.Label(self, text="Tela Inicial - Novo Projeto", font=("Arial", 16)) \
-            .pack(pady=20)
-        ttk.Label(self, text="Aqui você pode iniciar um novo projeto.") \
-            .pack(pady=10)
-        ttk.Button(
-            self, text="Criar Projeto",
-            command=lambda: messagebox.showinfo("Novo", "Projeto criado!")
-        ).pack(pady=10)
+        ttk.Label(self, text="Calibração da Câmera", font=("Arial", 16)) \
+            .grid(row=0, column=0, columnspan=3, pady=(0, 20), sticky="w")
+
+        ttk.Label(self, text="Imagens / sessão:").grid(row=1, column=0, sticky="w", pady=2)
+        ttk.Entry(self, textvariable=self.source_var, width=70).grid(row=1, column=1, sticky="ew", padx=5)
+        self.btn_source = ttk.Button(self, text="Escolher…", command=self._choose_source)
+        self.btn_source.grid(row=1, column=2, sticky="ew")
+
+        ttk.Label(self, text="Arquivo de saída:").grid(row=2, column=0, sticky="w", pady=2)
+        ttk.Entry(self, textvariable=self.output_var, width=70).grid(row=2, column=1, sticky="ew", padx=5)
+        self.btn_output = ttk.Button(self, text="Salvar como…", command=self._choose_output)
+        self.btn_output.grid(row=2, column=2, sticky="ew")
+
+        ttk.Label(self, text="Vistas usadas:").grid(row=3, column=0, sticky="w", pady=2)
+        ttk.Spinbox(self, from_=5, to=200, textvariable=self.keyframes_var, width=6) \
+            .grid(row=3, column=1, sticky="w", padx=5)
+
+        self.btn_run = ttk.Button(self, text="Calibrar", command=self.run_calibration)
+        self.btn_run.grid(row=4, column=0, sticky="ew", pady=(15, 5))
+        self.btn_apply = ttk.Button(self, text="Usar no scanner", command=self.apply_to_scanner, state=tk.DISABLED)
+        self.btn_apply.grid(row=4, column=2, sticky="ew", pady=(15, 5))
+
+        self.progress = ttk.Progressbar(self, orient="horizontal", mode="determinate", maximum=100)
+        self.progress.grid(row=5, column=0, columnspan=3, sticky="ew", pady=5)
+        ttk.Label(self, textvariable=self.status_var, anchor="w", justify="left") \
+            .grid(row=6, column=0, columnspan=3, sticky="ew")
+        self.columnconfigure(1, weight=1)
+
+    def _choose_source(self):
+        path = filedialog.askdirectory(title="Pasta com as imagens do tabuleiro ou sessão gravada")
+        if path:
+            self.source_var.set(path)
+
+    def _choose_output(self):
+        path = filedialog.asksaveasfilename(
+            title="Salvar calibração",
+            defaultextension=".npy",
+            filetypes=[("NumPy", "*.npy"), ("Todos", "*.*")]
+        )
+        if path:
+            self.output_var.set(path)
+
+    def _set_status(self, text: str):
+        self.after(0, self.status_var.set, text) # type: ignore
+
+    def _set_progress(self, done: int, total: int):
+        self.after(0, lambda: self.progress.config(value=100 * done / max(total, 1))) # type: ignore
+        self._set_status(f"Detectando cantos ChArUco: {done}/{total} imagem(ns)")
+
+    def run_calibration(self):
+        source, output = self.source_var.get(), self.output_var.get()
+        if self.running:
+            return
+        if not source or not output:
+            messagebox.showwarning("Atenção", "Informe a pasta de imagens e o arquivo de saída.")
+            return
+        try:
+            keyframes = int(self.keyframes_var.get())
+        except (tk.TclError, ValueError):
+            keyframes = CALIB_KEYFRAMES
+
+        self.running = True
+        self.btn_run.config(state=tk.DISABLED)
+        self.btn_apply.config(state=tk.DISABLED)
+        self.progress.config(value=0)
+
+        def target():
+            try:
+                result = calibrate_from_source(source, output, keyframes, progress=self._set_progress)
+            except Exception as e:
+                logger.exception("Falha na calibração da câmera")
+                self.after(0, self._on_failed, str(e)) # type: ignore
+            else:
+                self.after(0, self._on_finished, result) # type: ignore
+
+        threading.Thread(target=target, daemon=True).start()
+
+    def _on_finished(self, result: dict):
+        self.running = False
+        self.result = result
+        self.saved_path = result["path"]
+        m = result["camera_matrix"]
+        self.status_var.set(
+            f"RMS de reprojeção: {result['rms']:.3f} px -- {len(result['keyframes'])} de "
+            f"{result['detected']} vista(s) válidas ({result['images']} imagem(ns))\n"
+            f"fx={m[0, 0]:.2f} fy={m[1, 1]:.2f} cx={m[0, 2]:.2f} cy={m[1, 2]:.2f}\n"
+            f"Gravado em {self.saved_path}"
+        )
+        self.btn_run.config(state=tk.NORMAL)
+        self.btn_apply.config(state=tk.NORMAL)
 
+    def _on_failed(self, message: str):
+        self.running = False
+        self.status_var.set(f"Falha na calibração: {message}")
+        self.btn_run.config(state=tk.NORMAL)
+        messagebox.showerror("Erro", f"Falha na calibração:\n{message}")
 
+    def apply_to_scanner(self):
+        """ Carrega a calibração gravada na tela do scanner, como o botão de abrir arquivo. """
+        scanner = self.controller.frames.get("Scanner")
+        if scanner is None or self.saved_path is None:
+            return
+        try:
+            # O arquivo gravado por esta calibração, mesmo que o campo de saída tenha mudado depois.
+            scanner.hardware.set_calibration(self.saved_path)
+            scanner.datadisplay.update_params()
+        except Exception as e:
+            logger.exception("Falha ao carregar a calibração no scanner")
+            messagebox.showerror("Erro", f"Não foi possível carregar o arquivo:\n{e}")
+            return
+        self.controller.show_frame("Scanner")
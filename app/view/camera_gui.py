@@ -1,7 +1,7 @@
 import logging
 import tkinter as tk
 from tkinter import ttk
-from app.core.discovery import get_camera_list
+from app.core.discovery import get_camera_enumerator
 
 class CameraModule(ttk.Frame):
     def __init__(self, parent, application, callback):
@@ -9,6 +9,7 @@ class CameraModule(ttk.Frame):
         self.app = application
 
         self.display_callback = callback
+        self.enumerator = get_camera_enumerator()
 
         self.camera_dict = {}
         self.combo_var = tk.StringVar()
@@ -31,11 +32,12 @@ class CameraModule(ttk.Frame):
             return
 
         selected_name = self.combo_box.get()
-        selected_index = self.combo_box.current()
-        if self.app.hardware.camera_index == selected_index and selected_name in self.camera_dict:
+        selected_index = self.camera_dict.get(selected_name, self.combo_box.current())
+        if self.app.hardware.camera_index == selected_index and self.app.hardware.camera_name == selected_name:
             return
 
         self.app.hardware.release_camera()
+        self.app.hardware.camera_backend = self.enumerator.backend
         self.app.hardware.camera_index = selected_index
         self.app.hardware.camera_name = selected_name
         logging.info(f"Selected camera: {self.app.hardware.camera_name} :: ID {self.app.hardware.camera_index}")
@@ -43,15 +45,26 @@ class CameraModule(ttk.Frame):
             self.display_callback()
 
     def update_camera_list(self):
+        """ Mostra a última lista conhecida e atualiza em segundo plano, sem bloquear o Tk. """
         self.app.hardware.release_camera()
-        lista = get_camera_list()
+        self.btn_refresh.configure(state=tk.DISABLED)
+        self._fill(self.enumerator.refresh(lambda lista: self.after(0, self._on_enumerated, lista)))
+
+    def _on_enumerated(self, lista):
+        self._fill(lista)
+        self.btn_refresh.configure(state=tk.NORMAL)
+
+    def _fill(self, lista):
         if len(lista) == 0:
             return
         self.camera_dict = {desc: idx for idx, desc in lista}
         descricoes = list(self.camera_dict.keys())
+        atual = self.combo_box.get()
 
         self.combo_box["values"] = descricoes
-        if descricoes:
+        if atual in self.camera_dict:
+            self.combo_box.set(atual)
+        elif descricoes:
             self.combo_box.current(0)
             self.combo_box.event_generate("<<ComboboxSelected>>")
 
@@ -1,13 +1,15 @@
 import threading
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import tkinter as tk
 from PIL import Image, ImageTk
 from app.config.constants import CAMERA_VIEWPORT_WIDTH, CAMERA_VIEWPORT_HEIGHT, BLACK_FRAME
 from app.config.logger import logger
-from app.core.discovery import get_device_list, get_camera_list
+from app.core.discovery import get_device_list, get_cached_device_list, get_camera_list
+from app.core.metrics import metrics
 from app.view.datadisplay_gui import DataDisplay
 from app.view.camera_gui import CameraModule
 from app.core.scanner_config import Scanner
+from app.core.session import SessionReplay
 
 
 class ScanGUI(ttk.Frame):
@@ -16,6 +18,12 @@ class ScanGUI(ttk.Frame):
         # region Define os elementos de conteiner.
         self.hardware = Scanner()
         self.controller = controller
+        self.calibrating = False
+        self.scanning = False
+        self.voxel_grid = None
+        self.scan_mesh = None
+        self.live_pipeline = None
+        self.live_mode = tk.BooleanVar(value=False)
 
         self.main_frame = ttk.Frame(self)
         self.main_frame.pack(fill="both", expand=True)
@@ -32,6 +40,11 @@ class ScanGUI(ttk.Frame):
         self.status_label = ttk.Label(self.status_bar, text="", anchor="w")
         self.status_label.pack(side="left", fill="x", expand=True)
 
+        self.button_metrics = ttk.Button(self.status_bar, text="Exportar métricas", command=self.export_metrics)
+        self.button_metrics.pack(side="right", padx=(6, 0))
+        self.metrics_label = ttk.Label(self.status_bar, text="", anchor="e")
+        self.metrics_label.pack(side="right", padx=(6, 6))
+
         self.progress_container = ttk.Frame(self.status_bar)
         self.progress_container.pack(side="right", padx=(6, 6))
 
@@ -100,8 +113,20 @@ class ScanGUI(ttk.Frame):
         self.button_reference = ttk.Button(self.side, text="Definir Referências")
         self.button_reference.pack(fill="x", pady=(0, 5))
 
+        self.button_axis = ttk.Button(self.side, text="Calibrar Eixo")
+        self.button_axis.pack(fill="x", pady=(0, 5))
+
         self.button_scan = ttk.Button(self.side, text="Iniciar Escaneamento")
         self.button_scan.pack(fill="x", pady=(0, 5))
+
+        self.check_live = ttk.Checkbutton(self.side, text="Modo ao vivo", variable=self.live_mode)
+        self.check_live.pack(anchor="w", pady=(0, 5))
+
+        self.button_export = ttk.Button(self.side, text="Exportar Nuvem", state=tk.DISABLED)
+        self.button_export.pack(fill="x", pady=(0, 5))
+
+        self.button_record = ttk.Button(self.side, text="Gravar Sessão", state=tk.DISABLED)
+        self.button_record.pack(fill="x", pady=(0, 5))
         # endregion
 
         # region Define os elementos da viewport
@@ -123,6 +148,8 @@ class ScanGUI(ttk.Frame):
         self.disable_control_buttons()
         self.loop_check_conditions_enable_connect()
         self.loop_check_conditions_enable_ref()
+        self.loop_check_conditions_enable_scan()
+        self.loop_update_metrics()
         self._update_firmata_devices_list()
 
     def loop_check_conditions_enable_connect(self):
@@ -142,23 +169,85 @@ class ScanGUI(ttk.Frame):
         self.after(1000, self.loop_check_conditions_enable_connect)  # type: ignore
 
     def loop_check_conditions_enable_ref(self):
+        if self.calibrating:
+            # Durante a calibração o botão captura as poses (ver Scanner.set_references).
+            self.after(1000, self.loop_check_conditions_enable_ref) # type: ignore
+            return
         conditions = [
             self.hardware.map_one is None,
             self.hardware.map_two is None,
             self.hardware.camera_instance is None,
             self.hardware.firmata_instance is None,
             self.hardware.camera_matrix is None,
-            self.hardware.plane_constants is None
+            self.scanning
         ]
 
         logger.debug(f"Loop check conditions (all False enables Reference button): {conditions}")
         if any(conditions):
             self.button_reference.config(state=tk.DISABLED)
+            self.button_axis.config(state=tk.DISABLED)
         else:
             self.button_reference.config(state=tk.NORMAL)
             self.button_reference.config(command=self.set_references)
+            self.button_axis.config(state=tk.NORMAL)
+            self.button_axis.config(command=self.calibrate_axis)
         self.after(1000, self.loop_check_conditions_enable_ref) # type: ignore
 
+    def loop_check_conditions_enable_scan(self):
+        conditions = [
+            self.hardware.camera_instance is None,
+            self.hardware.firmata_instance is None,
+            self.hardware.plane_constants is None,
+            self.calibrating,
+            self.scanning
+        ]
+
+        logger.debug(f"Loop check conditions (all False enables Scan button): {conditions}")
+        if self.live_pipeline is not None:
+            # O modo ao vivo só termina pelo botão (ou no fim de uma sessão reproduzida).
+            self.button_scan.config(state=tk.NORMAL, text="Parar Escaneamento")
+            self.button_scan.config(command=self.stop_scanning)
+        elif any(conditions):
+            self.button_scan.config(state=tk.DISABLED, text="Iniciar Escaneamento")
+        else:
+            self.button_scan.config(state=tk.NORMAL, text="Iniciar Escaneamento")
+            self.button_scan.config(command=self.start_scanning)
+        self.check_live.config(state=tk.DISABLED if self.scanning else tk.NORMAL)
+
+        if self.scanning or self.voxel_grid is None or self.voxel_grid.points_added == 0:
+            self.button_export.config(state=tk.DISABLED)
+        else:
+            self.button_export.config(state=tk.NORMAL)
+            self.button_export.config(command=self.export_cloud)
+
+        recording = self.hardware.recorder is not None
+        self.button_record.config(text="Parar Gravação" if recording else "Gravar Sessão")
+        if self.hardware.camera_instance is None or isinstance(self.hardware.camera_instance, SessionReplay):
+            self.button_record.config(state=tk.DISABLED)
+        else:
+            self.button_record.config(state=tk.NORMAL)
+            self.button_record.config(command=self.toggle_recording)
+        self.after(1000, self.loop_check_conditions_enable_scan) # type: ignore
+
+    def loop_update_metrics(self):
+        self.metrics_label.config(text=metrics.summary())
+        self.after(1000, self.loop_update_metrics) # type: ignore
+
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(
+            title="Salvar métricas",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("Todos", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            metrics.dump(path)
+            self.set_status(text=f"Métricas salvas em {path}")
+        except OSError as e:
+            logger.exception("Falha ao salvar métricas")
+            messagebox.showerror("Erro", f"Não foi possível salvar as métricas:\n{e}")
+
     def set_status(self, text: str):
         self.after(0, lambda: self.status_label.config(text=text)) # type: ignore
 
@@ -181,28 +270,45 @@ class ScanGUI(ttk.Frame):
         self.button_firmata_refresh.configure(state=tk.DISABLED)
         self.button_connect.configure(state=tk.DISABLED)
 
+        def preencher(portas, verificado):
+            atual = self.combo_box.get()
+            self.combo_box["values"] = portas
+
+            if atual in portas:
+                self.combo_box.set(atual)
+            elif portas:
+                self.combo_box.current(0)
+                self.combo_box.event_generate("<<ComboboxSelected>>")
+            else:
+                self.combo_box.set("")
+            self.combo_box.configure(state=tk.NORMAL)
+
+            if not verificado:
+                self.set_status(text=f"{len(portas)} porta(s) em cache, verificando...")
+                return
+            if portas:
+                self.set_status(text=f"{len(portas)} porta(s) encontrada(s)")
+            else:
+                self.set_status(text="Nenhuma porta disponível!")
+            self.button_firmata_refresh.configure(state=tk.NORMAL)
+
         def worker():
+            # Portas que já responderam como Firmata aparecem antes dos handshakes.
+            try:
+                em_cache = get_cached_device_list()
+            except Exception as e:
+                em_cache = []
+                logger.error(f"Erro ao ler o cache de dispositivos: {e}")
+            if em_cache:
+                self.after(0, lambda: preencher(em_cache, False)) # type: ignore
+
             try:
                 portas = get_device_list()
             except Exception as e:
                 portas = []
                 logger.error(f"Erro ao buscar dispositivos: {e}")
 
-            def atualizar_ui():
-                self.combo_box.set("")
-                self.combo_box["values"] = portas
-
-                if portas:
-                    self.combo_box.current(0)
-                    self.combo_box.event_generate("<<ComboboxSelected>>")
-                    self.set_status(text=f"{len(portas)} porta(s) encontrada(s)")
-                else:
-                    self.set_status(text="Nenhuma porta disponível!")
-
-                self.combo_box.configure(state=tk.NORMAL)
-                self.button_firmata_refresh.configure(state=tk.NORMAL)
-
-            self.after(0, atualizar_ui) # type: ignore
+            self.after(0, lambda: preencher(portas, True)) # type: ignore
 
         threading.Thread(target=worker, daemon=True).start()
 
@@ -269,6 +375,11 @@ class ScanGUI(ttk.Frame):
         self.status_label = ttk.Label(self.status_bar, text="", anchor="w")
         self.status_label.pack(side="left", fill="x", expand=True)
 
+        self.button_metrics = ttk.Button(self.status_bar, text="Exportar métricas", command=self.export_metrics)
+        self.button_metrics.pack(side="right", padx=(6, 0))
+        self.metrics_label = ttk.Label(self.status_bar, text="", anchor="e")
+        self.metrics_label.pack(side="right", padx=(6, 6))
+
         # Frame para agrupar label percentual + progressbar (lado direito)
         self.progress_container = ttk.Frame(self.status_bar)
         self.progress_container.pack(side="right", padx=(6, 6))
@@ -297,5 +408,17 @@ class ScanGUI(ttk.Frame):
     def set_references(self):
         pass
 
+    def calibrate_axis(self):
+        pass
+
     def start_scanning(self):
         pass
+
+    def stop_scanning(self):
+        pass
+
+    def export_cloud(self):
+        pass
+
+    def toggle_recording(self):
+        pass